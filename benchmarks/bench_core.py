@@ -0,0 +1,282 @@
+"""
+编辑核心的基准测试
+在 1 KB ~ 1 GB 的合成文件上测量 load / 随机编辑 / 撤销重做链 / show 范围 / save / 开日志编辑，
+结果输出为 JSON，可与保存的基线比较，发现性能回退。
+
+    python benchmarks/bench_core.py --output result.json
+    python benchmarks/bench_core.py --baseline result.json          # 与基线比较，回退时退出码为 1
+    python benchmarks/bench_core.py --sizes 1KB,1MB,1GB --ops 500   # 1 GB 只在显式指定时运行
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.commands import DeleteCommand, InsertCommand, ReplaceCommand  # noqa: E402
+from core.logger import Logger  # noqa: E402
+from core.workspace import Workspace  # noqa: E402
+
+UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+DEFAULT_SIZES = "1KB,64KB,1MB,16MB"
+SCENARIOS = ("load", "edits", "undo_redo", "show", "save", "logged_edits")
+_WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "editor", "buffer", "undo", "redo", "piece",
+          "table", "rope", "line", "column", "save", "load", "insert", "delete", "replace", "show")
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def format_size(n: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if n >= UNITS[unit] and n % UNITS[unit] == 0:
+            return f"{n // UNITS[unit]}{unit}"
+    return f"{n}B"
+
+
+def make_file(path: str, size: int, seed: int):
+    """生成约 size 字节的合成文本：先随机生成一个最多 1 MB 的块，再重复写到目标大小"""
+    rng = random.Random(seed)
+    lines, block_size = [], 0
+    while block_size < min(size, UNITS["MB"]):
+        line = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 14)))
+        lines.append(line)
+        block_size += len(line) + 1
+    block = ("\n".join(lines) + "\n").encode("ascii")
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:remaining]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def _random_command(rng: random.Random, editor):
+    lines = editor.lines
+    line = rng.randrange(len(lines))
+    length = lines.line_length(line)
+    kind = rng.randrange(3)
+    if kind == 0 or length == 0:
+        return InsertCommand(editor, line + 1, rng.randint(1, length + 1), "bench")
+    col = rng.randrange(length)
+    count = min(5, length - col)
+    if kind == 1:
+        return DeleteCommand(editor, line + 1, col + 1, count)
+    return ReplaceCommand(editor, line + 1, col + 1, count, "BENCH")
+
+
+class Session:
+    """一次运行用到的工作区与已加载的文件"""
+
+    def __init__(self, path: str, logging: bool = False):
+        self.workspace = Workspace()
+        if logging:
+            self.workspace.attach(Logger())
+        self.workspace.load_file(path)
+        self.path = path
+        self.editor = self.workspace.active_editor
+        self.editor.coalesce_window = None
+        if logging:
+            self.workspace.notify("log_on", {"filename": path})
+
+    def edit(self, rng: random.Random, ops: int, notify: bool = False):
+        for _ in range(ops):
+            cmd = _random_command(rng, self.editor)
+            if self.editor.execute_command(cmd) and notify:
+                self.workspace.notify("command", {"filename": self.path, "command_str": "edit"})
+
+    def close(self):
+        self.workspace.flush_observers()
+        self.editor.lines.close()
+
+
+def run_scenarios(path: str, ops: int, seed: int) -> Dict[str, Callable[[], float]]:
+    """每个场景返回一次运行中被计时部分的耗时 (秒)；准备工作不计入"""
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    def load():
+        return timed(lambda: Session(path).close())
+
+    def edits():
+        session = Session(path)
+        elapsed = timed(lambda: session.edit(random.Random(seed), ops))
+        session.close()
+        return elapsed
+
+    def undo_redo():
+        session = Session(path)
+        session.edit(random.Random(seed), ops)
+
+        def chain():
+            for _ in range(ops):
+                session.editor.undo()
+            for _ in range(ops):
+                session.editor.redo()
+        elapsed = timed(chain)
+        session.close()
+        return elapsed
+
+    def show():
+        session = Session(path)
+        rng = random.Random(seed)
+        total = len(session.editor.lines)
+
+        def ranges():
+            for _ in range(ops):
+                start = rng.randrange(total)
+                rows = session.editor.lines.iter_lines(start, min(total, start + 50))
+                _ = [f"{i}: {line}" for i, line in enumerate(rows, start + 1)]
+        elapsed = timed(ranges)
+        session.close()
+        return elapsed
+
+    def save():
+        session = Session(path)
+        session.edit(random.Random(seed), ops)
+        elapsed = timed(lambda: session.workspace.save_file(path))
+        session.close()
+        return elapsed
+
+    def logged_edits():
+        session = Session(path, logging=True)
+        # 计入日志落盘 (close 中的 flush)
+        return timed(lambda: (session.edit(random.Random(seed), ops, notify=True), session.close()))
+
+    return {
+        "load": load,
+        "edits": edits,
+        "undo_redo": undo_redo,
+        "show": show,
+        "save": save,
+        "logged_edits": logged_edits,
+    }
+
+
+def run(sizes: List[int], ops: int, repeat: int, seed: int, scenarios: Optional[List[str]] = None,
+        workdir: Optional[str] = None) -> dict:
+    results = {}
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_core_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        for size in sizes:
+            label = format_size(size)
+            source = f"source_{label}.txt"
+            make_file(source, size, seed)
+            for name in scenarios or SCENARIOS:
+                samples = []
+                for _ in range(repeat):
+                    # 每次运行使用源文件的新副本 (save 会改写文件)
+                    path = f"bench_{label}.txt"
+                    shutil.copyfile(source, path)
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        samples.append(run_scenarios(path, ops, seed)[name]())
+                    for leftover in (path, f".{path}.log", f".{path}.log.idx"):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+                median = statistics.median(samples)
+                count = 1 if name == "load" else ops * (2 if name == "undo_redo" else 1)
+                results[f"{name}@{label}"] = {
+                    "scenario": name,
+                    "size": size,
+                    "ops": count,
+                    "median_s": median,
+                    "min_s": min(samples),
+                    "ops_per_s": count / median if median else None,
+                }
+                print(f"{name + '@' + label:<24}{median * 1000:>12.3f} ms", file=sys.stderr)
+            os.remove(source)
+    finally:
+        os.chdir(cwd)
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "ops": ops,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """返回比基线慢超过 threshold (比例) 的场景；同时打印对比表"""
+    regressions = []
+    print(f"{'benchmark':<24}{'baseline ms':>14}{'current ms':>14}{'ratio':>9}", file=sys.stderr)
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            print(f"{key:<24}{'-':>14}{result['median_s'] * 1000:>14.3f}{'new':>9}", file=sys.stderr)
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<24}{base['median_s'] * 1000:>14.3f}{result['median_s'] * 1000:>14.3f}{ratio:>9.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Lab1 editing core")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"comma separated file sizes, e.g. 1KB,1MB,1GB (default: {DEFAULT_SIZES})")
+    parser.add_argument("--ops", type=int, default=2000, help="edit/undo/show operations per run (default: 2000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the median is reported")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for file contents and edit positions")
+    parser.add_argument("--only", help="comma separated scenarios to run "
+                                       "(load, edits, undo_redo, show, save, logged_edits)")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON results to FILE instead of stdout")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a stored JSON result")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown ratio counted as a regression when comparing (default: 0.10)")
+    options = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in options.sizes.split(",") if s]
+    scenarios = options.only.split(",") if options.only else None
+    unknown = set(scenarios or ()) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    result = run(sizes, options.ops, options.repeat, options.seed, scenarios)
+
+    text = json.dumps(result, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if options.baseline:
+        with open(options.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, options.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
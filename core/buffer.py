@@ -0,0 +1,463 @@
+"""文本缓冲区抽象：TextEditor 通过它访问行数据，具体存储结构可替换"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain, islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .writer import DEFAULT_CHUNK_SIZE, iter_line_chunks
+
+
+class TextBuffer(ABC):
+    """
+    行缓冲区接口
+    对外表现为一个"行列表"(支持 len / 下标 / 迭代 / append / insert / pop)，
+    另外提供按 (行, 列) 的字符级编辑，供 core/commands.py 中的命令使用。
+    行号、列号均为 0-based。
+    """
+
+    @classmethod
+    def from_text(cls, text: str) -> "TextBuffer":
+        """从文件文本构造，行切分规则与 readlines() + rstrip('\\n') 一致"""
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        return cls(lines)
+
+    @classmethod
+    def from_file(cls, path: str) -> "TextBuffer":
+        # 按通用换行模式读取，行内容不含 '\r'；文件原来的换行符由 Workspace 记录在编辑器上，保存时写回
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_text(f.read())
+
+    def close(self):
+        """释放缓冲区占用的外部资源 (如文件映射)，默认无需处理"""
+        pass
+
+    # --- 行级操作 (子类必须实现) ---
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_line(self, index: int) -> str:
+        pass
+
+    @abstractmethod
+    def set_line(self, index: int, text: str):
+        pass
+
+    @abstractmethod
+    def insert(self, index: int, text: str):
+        """在 index 行之前插入一整行 (index >= len 时等同 append)"""
+        pass
+
+    @abstractmethod
+    def delete_line(self, index: int):
+        pass
+
+    # --- 列表风格的便捷接口 ---
+    def _normalize(self, index: int) -> int:
+        n = len(self)
+        if index < 0:
+            index += n
+        if not (0 <= index < n):
+            raise IndexError("line index out of range")
+        return index
+
+    def __getitem__(self, index: int) -> str:
+        return self.get_line(self._normalize(index))
+
+    def __setitem__(self, index: int, text: str):
+        self.set_line(self._normalize(index), text)
+
+    def __delitem__(self, index: int):
+        self.delete_line(self._normalize(index))
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_lines()
+
+    def append(self, text: str):
+        self.insert(len(self), text)
+
+    def pop(self, index: int = -1) -> str:
+        index = self._normalize(index)
+        text = self.get_line(index)
+        self.delete_line(index)
+        return text
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """按顺序产出 [start, end) 范围内的行"""
+        end = len(self) if end is None else min(end, len(self))
+        for i in range(max(0, start), end):
+            yield self.get_line(i)
+
+    # --- 字符级编辑 (子类可覆盖以避免整行重建) ---
+    def line_length(self, index: int) -> int:
+        return len(self.get_line(index))
+
+    def insert_text(self, index: int, col: int, text: str):
+        line = self.get_line(index)
+        self.set_line(index, line[:col] + text + line[col:])
+
+    def delete_text(self, index: int, col: int, length: int) -> str:
+        """删除并返回被删除的文本"""
+        line = self.get_line(index)
+        self.set_line(index, line[:col] + line[col + length:])
+        return line[col:col + length]
+
+    def replace_text(self, index: int, col: int, length: int, text: str) -> str:
+        """替换并返回被替换掉的文本"""
+        line = self.get_line(index)
+        self.set_line(index, line[:col] + text + line[col + length:])
+        return line[col:col + length]
+
+    def get_text(self) -> str:
+        """用换行符连接所有行 (与旧版 "\\n".join(lines) 一致)"""
+        return "\n".join(self.iter_lines())
+
+    def iter_encoded(self, chunk_size: int = DEFAULT_CHUNK_SIZE, newline: str = "\n") -> Iterator[bytes]:
+        """按保存格式 (newline 连接各行) 逐行编码，产出约 chunk_size 字节的块"""
+        return iter_line_chunks(self.iter_lines(), chunk_size, newline=newline)
+
+
+class ListBuffer(TextBuffer):
+    """默认实现：直接使用 List[str] 存储，行为与原先的 editor.lines 相同"""
+
+    def __init__(self, lines: Optional[Iterable[str]] = None):
+        self._lines: List[str] = list(lines) if lines is not None else []
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def get_line(self, index: int) -> str:
+        return self._lines[index]
+
+    def set_line(self, index: int, text: str):
+        self._lines[index] = text
+
+    def insert(self, index: int, text: str):
+        self._lines.insert(index, text)
+
+    def delete_line(self, index: int):
+        del self._lines[index]
+
+    def append(self, text: str):
+        self._lines.append(text)
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        return iter(self._lines[start:end])
+
+    def get_text(self) -> str:
+        return "\n".join(self._lines)
+
+
+class _Piece:
+    """piece table 中的一段：指向某个缓冲区的 [start, start + length)"""
+    __slots__ = ("buf", "start", "length", "lf")
+
+    def __init__(self, buf: int, start: int, length: int, lf: int):
+        self.buf = buf        # 0 为原始缓冲区，>0 为追加缓冲区中的块
+        self.start = start
+        self.length = length
+        self.lf = lf          # 该段包含的换行符个数
+
+
+class PieceTableBuffer(TextBuffer):
+    """
+    Piece table 实现
+    - 原始缓冲区: 加载时的完整文本 (只读)，换行符位置预先建立索引
+    - 追加缓冲区: 每次插入的文本作为一个不可变块追加进去，旧文本从不复制
+    - piece 列表: 按文档顺序引用上述缓冲区的片段，分成若干个不超过 2 * BLOCK_SIZE 段的块
+    每个块记录自己的字符数与换行符数，按行/偏移定位时先在块的前缀和上二分查找，再在块内顺序查找；
+    编辑只修改涉及到的块，块的前缀和在下一次查找时从第一个变动的块补算 (只涉及块数，不涉及 piece 数)。
+    """
+
+    BLOCK_SIZE = 64
+    # 大量编辑后 piece 碎片过多，超过该值时把当前内容压实成新的原始缓冲区 (回收已删除的文本)
+    MAX_PIECES = 4096
+
+    def __init__(self, lines: Optional[Iterable[str]] = None):
+        lines = list(lines) if lines is not None else []
+        self._reset("\n".join(lines), has_lines=bool(lines))
+
+    @classmethod
+    def from_text(cls, text: str) -> "PieceTableBuffer":
+        """直接从文件文本构造，省去先拆成行列表的中间拷贝"""
+        buf = cls.__new__(cls)
+        if text.endswith("\n"):
+            # 与 readlines + rstrip 的行为保持一致：末尾换行不产生额外空行
+            text = text[:-1]
+            buf._reset(text, has_lines=True)
+        else:
+            buf._reset(text, has_lines=bool(text))
+        return buf
+
+    def _reset(self, text: str, has_lines: bool):
+        self._buffers: List[str] = [text]
+        self._orig_lf: List[int] = []
+        pos = text.find("\n")
+        while pos != -1:
+            self._orig_lf.append(pos)
+            pos = text.find("\n", pos + 1)
+        self._blocks: List[List[_Piece]] = []
+        self._block_len: List[int] = []
+        self._block_lf: List[int] = []
+        if text:
+            self._blocks.append([_Piece(0, 0, len(text), len(self._orig_lf))])
+            self._block_len.append(len(text))
+            self._block_lf.append(len(self._orig_lf))
+        self._piece_count = len(self._blocks)
+        self._length = len(text)
+        self._lf = len(self._orig_lf)
+        self._has_lines = has_lines
+        # 块的前缀和：_offsets[b] / _lf_before[b] 为第 b 块之前的字符数 / 换行符数，只有前 _valid + 1 项有效
+        self._offsets: List[int] = [0]
+        self._lf_before: List[int] = [0]
+        self._valid = 0
+
+    # --- 缓冲区内部辅助 ---
+    def _count_lf(self, buf: int, start: int, end: int) -> int:
+        if buf == 0:
+            return bisect_left(self._orig_lf, end) - bisect_left(self._orig_lf, start)
+        return self._buffers[buf].count("\n", start, end)
+
+    def _find_lf(self, buf: int, start: int, n: int) -> int:
+        """返回缓冲区中 start 之后第 n 个 (0-based) 换行符的位置"""
+        if buf == 0:
+            return self._orig_lf[bisect_left(self._orig_lf, start) + n]
+        data = self._buffers[buf]
+        pos = data.find("\n", start)
+        for _ in range(n):
+            pos = data.find("\n", pos + 1)
+        return pos
+
+    def _iter_pieces(self) -> Iterator[_Piece]:
+        return chain.from_iterable(self._blocks)
+
+    def _prefix(self):
+        """补算失效部分的块前缀和，返回 (_offsets, _lf_before)"""
+        valid = self._valid
+        if valid < len(self._blocks):
+            del self._offsets[valid + 1:]
+            del self._lf_before[valid + 1:]
+            self._offsets.extend(islice(accumulate(self._block_len[valid:], initial=self._offsets[valid]), 1, None))
+            self._lf_before.extend(islice(accumulate(self._block_lf[valid:], initial=self._lf_before[valid]), 1, None))
+            self._valid = len(self._blocks)
+        return self._offsets, self._lf_before
+
+    def _block_changed(self, b: int):
+        """第 b 块的内容变了：重算它的合计，过大时一分为二，空块删除"""
+        block = self._blocks[b]
+        if not block:
+            del self._blocks[b], self._block_len[b], self._block_lf[b]
+        elif len(block) > 2 * self.BLOCK_SIZE:
+            half = len(block) // 2
+            self._blocks[b:b + 1] = [block[:half], block[half:]]
+            self._block_len[b:b + 1] = [sum(p.length for p in block[:half]), sum(p.length for p in block[half:])]
+            self._block_lf[b:b + 1] = [sum(p.lf for p in block[:half]), sum(p.lf for p in block[half:])]
+        else:
+            self._block_len[b] = sum(p.length for p in block)
+            self._block_lf[b] = sum(p.lf for p in block)
+        if b < self._valid:
+            self._valid = b
+
+    def _line_start(self, index: int) -> int:
+        """第 index 行的起始偏移 (文档坐标)"""
+        if index == 0:
+            return 0
+        offsets, lf_before = self._prefix()
+        b = bisect_left(lf_before, index, 1) - 1
+        if b >= len(self._blocks):
+            raise IndexError("line index out of range")
+        remaining = index - lf_before[b]  # 块内还需要跨过的换行符个数
+        offset = offsets[b]
+        for p in self._blocks[b]:
+            if p.lf >= remaining:
+                pos = self._find_lf(p.buf, p.start, remaining - 1)
+                return offset + (pos - p.start) + 1
+            remaining -= p.lf
+            offset += p.length
+        raise IndexError("line index out of range")
+
+    def _line_span(self, index: int):
+        """第 index 行的 [start, end) 偏移，end 不包含换行符"""
+        start = self._line_start(index)
+        if index >= self._lf:
+            return start, self._length
+        return start, self._line_start(index + 1) - 1
+
+    def _split(self, offset: int) -> Tuple[int, int]:
+        """保证 offset 处是 piece 边界，返回该边界右侧 piece 的位置 (块下标, 块内下标)"""
+        offsets, _ = self._prefix()
+        b = bisect_right(offsets, offset) - 1
+        if b >= len(self._blocks):
+            # 文档末尾：最后一块的末尾
+            if not self._blocks:
+                return 0, 0
+            b = len(self._blocks) - 1
+            return b, len(self._blocks[b])
+        block = self._blocks[b]
+        pos = offsets[b]
+        for i, p in enumerate(block):
+            if offset == pos:
+                return b, i
+            if offset < pos + p.length:
+                k = offset - pos
+                left_lf = self._count_lf(p.buf, p.start, p.start + k)
+                right = _Piece(p.buf, p.start + k, p.length - k, p.lf - left_lf)
+                p.length = k
+                p.lf = left_lf
+                # 拆分不改变块的合计，块过大留给调用方在编辑完成后处理
+                block.insert(i + 1, right)
+                self._piece_count += 1
+                return b, i + 1
+            pos += p.length
+        return b, len(block)
+
+    def _insert_at(self, offset: int, text: str):
+        if not text:
+            return
+        self._buffers.append(text)
+        lf = text.count("\n")
+        piece = _Piece(len(self._buffers) - 1, 0, len(text), lf)
+        b, i = self._split(offset)
+        if not self._blocks:
+            self._blocks.append([])
+            self._block_len.append(0)
+            self._block_lf.append(0)
+        self._blocks[b].insert(i, piece)
+        self._piece_count += 1
+        self._length += len(text)
+        self._lf += lf
+        self._block_changed(b)
+        self._maybe_compact()
+
+    def _delete_range(self, start: int, end: int):
+        if end <= start:
+            return
+        first_block, first = self._split(start)
+        last_block, last = self._split(end)
+        if first_block == last_block:
+            removed = self._blocks[first_block][first:last]
+            del self._blocks[first_block][first:last]
+        else:
+            removed = self._blocks[first_block][first:] + self._blocks[last_block][:last]
+            del self._blocks[first_block][first:]
+            del self._blocks[last_block][:last]
+            for block in self._blocks[first_block + 1:last_block]:
+                removed.extend(block)
+            del self._blocks[first_block + 1:last_block]
+            del self._block_len[first_block + 1:last_block]
+            del self._block_lf[first_block + 1:last_block]
+            self._block_changed(first_block + 1)
+        for p in removed:
+            self._length -= p.length
+            self._lf -= p.lf
+        self._piece_count -= len(removed)
+        self._block_changed(first_block)
+        self._maybe_compact()
+
+    def _read(self, start: int, end: int) -> str:
+        parts = []
+        offsets, _ = self._prefix()
+        b = max(0, bisect_right(offsets, start) - 1)
+        offset = offsets[b]
+        for block in islice(self._blocks, b, None):
+            for p in block:
+                piece_end = offset + p.length
+                if piece_end > start and offset < end:
+                    lo = max(start, offset) - offset + p.start
+                    hi = min(end, piece_end) - offset + p.start
+                    parts.append(self._buffers[p.buf][lo:hi])
+                if piece_end >= end:
+                    return "".join(parts)
+                offset = piece_end
+        return "".join(parts)
+
+    def _maybe_compact(self):
+        if self._piece_count > self.MAX_PIECES:
+            self._reset(self.get_text(), self._has_lines)
+
+    # --- TextBuffer 接口 ---
+    def __len__(self) -> int:
+        return self._lf + 1 if self._has_lines else 0
+
+    def get_line(self, index: int) -> str:
+        return self._read(*self._line_span(index))
+
+    def line_length(self, index: int) -> int:
+        start, end = self._line_span(index)
+        return end - start
+
+    def set_line(self, index: int, text: str):
+        start, end = self._line_span(index)
+        self._delete_range(start, end)
+        self._insert_at(start, text)
+
+    def insert(self, index: int, text: str):
+        if not self._has_lines:
+            self._has_lines = True
+            self._insert_at(0, text)
+        elif index >= len(self):
+            self._insert_at(self._length, "\n" + text)
+        else:
+            self._insert_at(self._line_start(index), text + "\n")
+
+    def delete_line(self, index: int):
+        count = len(self)
+        if count == 1:
+            self._delete_range(0, self._length)
+            self._has_lines = False
+            return
+        start, end = self._line_span(index)
+        if index == count - 1:
+            # 最后一行：连同前面的换行符一起删除
+            self._delete_range(start - 1, end)
+        else:
+            self._delete_range(start, end + 1)
+
+    def insert_text(self, index: int, col: int, text: str):
+        self._insert_at(self._line_start(index) + col, text)
+
+    def delete_text(self, index: int, col: int, length: int) -> str:
+        start = self._line_start(index) + col
+        removed = self._read(start, start + length)
+        self._delete_range(start, start + length)
+        return removed
+
+    def replace_text(self, index: int, col: int, length: int, text: str) -> str:
+        start = self._line_start(index) + col
+        removed = self._read(start, start + length)
+        self._delete_range(start, start + length)
+        self._insert_at(start, text)
+        return removed
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """按 piece 顺序流式切分行，不需要逐行重新定位"""
+        total = len(self)
+        end = total if end is None else min(end, total)
+        start = max(0, start)
+        if start >= end:
+            return
+        line_no = 0
+        pending: List[str] = []
+        for p in self._iter_pieces():
+            data = self._buffers[p.buf]
+            pos, stop = p.start, p.start + p.length
+            while True:
+                nl = data.find("\n", pos, stop) if p.lf else -1
+                if nl == -1:
+                    if line_no >= start:
+                        pending.append(data[pos:stop])
+                    break
+                if line_no >= start:
+                    pending.append(data[pos:nl])
+                    yield "".join(pending)
+                pending = []
+                line_no += 1
+                if line_no >= end:
+                    return
+                pos = nl + 1
+        yield "".join(pending)
+
+    def get_text(self) -> str:
+        return "".join(self._buffers[p.buf][p.start:p.start + p.length] for p in self._iter_pieces())
@@ -1,3 +1,4 @@
+import sys
 from typing import TYPE_CHECKING
 from .interfaces import Command
 
@@ -9,21 +10,40 @@ class AppendCommand(Command):
     """
     功能: 在文件末尾追加一行文本
     命令: append "text"
+    连续的 append 会合并为一个撤销单元，此时 extra_texts 保存其后追加的各行
     """
     def __init__(self, editor: 'TextEditor', text: str):
         self.editor = editor
         self.text = text
+        self.extra_texts = []
         self.added_index = -1  # 用于记录追加在哪一行
 
     def execute(self) -> bool:
+        self.added_index = len(self.editor.lines)
         self.editor.lines.append(self.text)
-        self.added_index = len(self.editor.lines) - 1
+        for text in self.extra_texts:
+            self.editor.lines.append(text)
+        self.editor.mark_dirty(self.added_index, structural=True)
         return True
 
     def undo(self):
         # 只有当确实追加了行才执行删除
-        if self.added_index != -1 and self.added_index < len(self.editor.lines):
-            self.editor.lines.pop(self.added_index)
+        count = 1 + len(self.extra_texts)
+        if self.added_index != -1 and self.added_index + count <= len(self.editor.lines):
+            for i in range(self.added_index + count - 1, self.added_index - 1, -1):
+                self.editor.lines.pop(i)
+            self.editor.mark_dirty(self.added_index, structural=True)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.text) + sum(sys.getsizeof(t) for t in self.extra_texts)
+
+    def can_merge(self, other: Command) -> bool:
+        return (isinstance(other, AppendCommand) and other.editor is self.editor
+                and other.added_index == self.added_index + 1 + len(self.extra_texts))
+
+    def merge(self, other: Command):
+        self.extra_texts.append(other.text)
+        self.extra_texts.extend(other.extra_texts)
 
 class InsertCommand(Command):
     """
@@ -35,32 +55,44 @@ class InsertCommand(Command):
         self.line_idx = line - 1  # 转为 0-based
         self.col_idx = col - 1    # 转为 0-based
         self.text = text
-        self.old_line_content = None # 备份修改前的行内容
+        self.inserted = False # 记录是否真正执行了插入
 
     def execute(self) -> bool:
+        lines = self.editor.lines
         # 1. 边界检查
-        if not (0 <= self.line_idx < len(self.editor.lines)):
+        if not (0 <= self.line_idx < len(lines)):
             print(f"Error: Line number {self.line_idx + 1} out of range.")
             return False
         
-        current_line = self.editor.lines[self.line_idx]
-        
         # 2. 列越界检查 (允许插在行尾，即 col_idx == len)
-        if self.col_idx < 0 or self.col_idx > len(current_line):
+        if self.col_idx < 0 or self.col_idx > lines.line_length(self.line_idx):
             print(f"Error: Column number {self.col_idx + 1} out of range.")
             return False
 
-        # 3. 备份并执行插入
-        self.old_line_content = current_line
-        
-        # 简单的字符串切片插入
-        new_line = current_line[:self.col_idx] + self.text + current_line[self.col_idx:]
-        self.editor.lines[self.line_idx] = new_line
+        # 3. 交给缓冲区做原地插入，撤销时只需删掉插入的这段文本
+        lines.insert_text(self.line_idx, self.col_idx, self.text)
+        self.inserted = True
+        self.editor.mark_dirty(self.line_idx, structural="\n" in self.text)
         return True
 
     def undo(self):
-        if self.old_line_content is not None:
-            self.editor.lines[self.line_idx] = self.old_line_content
+        if self.inserted:
+            self.editor.lines.delete_text(self.line_idx, self.col_idx, len(self.text))
+            self.editor.mark_dirty(self.line_idx, structural="\n" in self.text)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+    def can_merge(self, other: Command) -> bool:
+        # 同一行上紧接着上次插入末尾的插入 (连续输入)；跨行文本不合并
+        return (isinstance(other, InsertCommand) and other.editor is self.editor
+                and self.inserted and other.inserted
+                and other.line_idx == self.line_idx
+                and other.col_idx == self.col_idx + len(self.text)
+                and "\n" not in self.text and "\n" not in other.text)
+
+    def merge(self, other: Command):
+        self.text += other.text
 
 class DeleteCommand(Command):
     """
@@ -72,33 +104,37 @@ class DeleteCommand(Command):
         self.line_idx = line - 1
         self.col_idx = col - 1
         self.length = length
-        self.old_line_content = None
+        self.removed_text = None # 备份被删除的文本
 
     def execute(self) -> bool:
-        if not (0 <= self.line_idx < len(self.editor.lines)):
+        lines = self.editor.lines
+        if not (0 <= self.line_idx < len(lines)):
             print("Error: Line number out of range.")
             return False
             
-        current_line = self.editor.lines[self.line_idx]
+        line_len = lines.line_length(self.line_idx)
         
-        if self.col_idx < 0 or self.col_idx >= len(current_line):
+        if self.col_idx < 0 or self.col_idx >= line_len:
             print("Error: Column start position out of range.")
             return False
 
         # 检查删除长度是否超出该行
-        if self.col_idx + self.length > len(current_line):
+        if self.col_idx + self.length > line_len:
             print("Error: Delete length exceeds line end.")
             return False
 
         # 备份并执行删除
-        self.old_line_content = current_line
-        new_line = current_line[:self.col_idx] + current_line[self.col_idx + self.length:]
-        self.editor.lines[self.line_idx] = new_line
+        self.removed_text = lines.delete_text(self.line_idx, self.col_idx, self.length)
+        self.editor.mark_dirty(self.line_idx)
         return True
 
     def undo(self):
-        if self.old_line_content is not None:
-            self.editor.lines[self.line_idx] = self.old_line_content
+        if self.removed_text is not None:
+            self.editor.lines.insert_text(self.line_idx, self.col_idx, self.removed_text)
+            self.editor.mark_dirty(self.line_idx)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.removed_text or "")
 
 class ReplaceCommand(Command):
     """
@@ -111,30 +147,51 @@ class ReplaceCommand(Command):
         self.col_idx = col - 1
         self.length = length
         self.text = text
-        self.old_line_content = None
+        self.removed_text = None # 备份被替换掉的文本
 
     def execute(self) -> bool:
-        if not (0 <= self.line_idx < len(self.editor.lines)):
+        lines = self.editor.lines
+        if not (0 <= self.line_idx < len(lines)):
             print("Error: Line number out of range.")
             return False
             
-        current_line = self.editor.lines[self.line_idx]
-        
         # 检查范围
-        if self.col_idx < 0 or self.col_idx + self.length > len(current_line):
+        if self.col_idx < 0 or self.col_idx + self.length > lines.line_length(self.line_idx):
             print("Error: Replace range out of bounds.")
             return False
 
         # 备份并执行替换
-        self.old_line_content = current_line
-        # 先删掉中间一段，再拼接新文本
-        prefix = current_line[:self.col_idx]
-        suffix = current_line[self.col_idx + self.length:]
-        new_line = prefix + self.text + suffix
-        
-        self.editor.lines[self.line_idx] = new_line
+        self.removed_text = lines.replace_text(self.line_idx, self.col_idx, self.length, self.text)
+        self.editor.mark_dirty(self.line_idx, structural="\n" in self.text)
         return True
 
     def undo(self):
-        if self.old_line_content is not None:
-            self.editor.lines[self.line_idx] = self.old_line_content
+        if self.removed_text is not None:
+            self.editor.lines.replace_text(self.line_idx, self.col_idx, len(self.text), self.removed_text)
+            self.editor.mark_dirty(self.line_idx, structural="\n" in self.text)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.text) + sys.getsizeof(self.removed_text or "")
+
+class CompositeCommand(Command):
+    """
+    功能: 把一组已执行的命令组合为一个撤销单元 (事务提交时生成)
+    撤销时按相反顺序逐个撤销；重做时按原顺序执行，任何一步失败都会把已执行的部分撤销回去
+    """
+    def __init__(self, commands):
+        self.commands = list(commands)
+
+    def execute(self) -> bool:
+        for i, cmd in enumerate(self.commands):
+            if not cmd.execute():
+                for done in reversed(self.commands[:i]):
+                    done.undo()
+                return False
+        return True
+
+    def undo(self):
+        for cmd in reversed(self.commands):
+            cmd.undo()
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.commands) + sum(c.memory_size() for c in self.commands)
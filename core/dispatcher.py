@@ -0,0 +1,224 @@
+"""
+表驱动的命令分发
+命令在注册时声明参数模式 (schema)，模式只编译一次；分发时按命令名 O(1) 查表，
+参数在进入处理函数之前统一转换好，新命令只需注册，不必修改输入循环。
+"""
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_POSITION = re.compile(r"([+-]?\d+):([+-]?\d+)")
+_RANGE = re.compile(r"([+-]?\d*):([+-]?\d*)")
+
+
+class DispatchError(ValueError):
+    """参数不符合命令的模式；消息直接展示给用户"""
+
+
+def _position(value: str) -> Tuple[int, int]:
+    """line:col -> (line, col)"""
+    m = _POSITION.fullmatch(value)
+    if m is None:
+        raise ValueError(value)
+    return int(m.group(1)), int(m.group(2))
+
+
+def _range(value: str) -> Tuple[int, int]:
+    """start:end -> (start, end)，两端都可省略 (默认 1 和 -1)；不含 ':' 时视为整个范围"""
+    if ":" not in value:
+        return 1, -1
+    m = _RANGE.fullmatch(value)
+    if m is None:
+        raise ValueError(value)
+    start, end = m.groups()
+    return int(start) if start else 1, int(end) if end else -1
+
+
+# schema 中可用的参数类型
+ARG_TYPES: Dict[str, Callable[[str], Any]] = {
+    "str": str,
+    "int": int,
+    "pos": _position,
+    "range": _range,
+}
+
+
+class Arg:
+    """参数模式中的一项"""
+    __slots__ = ("name", "convert", "required", "rest", "option")
+
+    def __init__(self, name: str, convert: Callable[[str], Any], required: bool = True, rest: bool = False,
+                 option: bool = False):
+        self.name = name
+        self.convert = convert
+        self.required = required
+        self.rest = rest
+        self.option = option
+
+
+def compile_schema(schema: str) -> Tuple[Arg, ...]:
+    """
+    编译参数模式，例如 "pos:pos text [count:int] *flags"
+    - name[:type]   必填参数，type 见 ARG_TYPES，默认 str
+    - [name[:type]] 可选参数，缺省为 None
+    - *name         收集剩余的全部参数 (列表)，只能放在最后
+    - --name[:type] 带值的选项，可以出现在任意位置，缺省为 None；其值排在所有位置参数之后
+    未声明 *name 时，多余的参数被忽略 (strict 的 CommandSpec 报错)
+    """
+    args: List[Arg] = []
+    options: List[Arg] = []
+    for token in schema.split():
+        if token.startswith("--"):
+            name, _, kind = token[2:].partition(":")
+            if kind and kind not in ARG_TYPES:
+                raise ValueError(f"unknown argument type '{kind}' in schema '{schema}'")
+            options.append(Arg(name, ARG_TYPES[kind or "str"], required=False, option=True))
+            continue
+        rest = token.startswith("*")
+        optional = token.startswith("[") and token.endswith("]")
+        token = token.strip("[]*")
+        name, _, kind = token.partition(":")
+        if kind and kind not in ARG_TYPES:
+            raise ValueError(f"unknown argument type '{kind}' in schema '{schema}'")
+        if args and args[-1].rest:
+            raise ValueError(f"'*{args[-1].name}' must be the last item in schema '{schema}'")
+        if not optional and not rest and args and not args[-1].required:
+            raise ValueError(f"required argument '{name}' follows an optional one in schema '{schema}'")
+        args.append(Arg(name, ARG_TYPES[kind or "str"], required=not (optional or rest), rest=rest))
+    return tuple(args + options)
+
+
+class CommandSpec:
+    """一条注册的命令：名称、预编译的参数模式与处理函数"""
+    __slots__ = ("name", "handler", "args", "usage", "format_error", "requires_editor", "strict", "_min_args",
+                 "_max_args", "_positional", "_options")
+
+    def __init__(self, name: str, handler: Callable, schema: str = "", usage: Optional[str] = None,
+                 format_error: Optional[str] = None, requires_editor: bool = False, strict: bool = False):
+        self.name = name
+        self.handler = handler
+        self.args = compile_schema(schema)
+        self.usage = usage or f"Usage: {name} {schema}".rstrip()
+        self.format_error = format_error
+        self.requires_editor = requires_editor
+        self.strict = strict
+        self._min_args = sum(1 for a in self.args if a.required)
+        self._positional = tuple(a for a in self.args if not a.option)
+        self._max_args = None if any(a.rest for a in self._positional) else len(self._positional)
+        self._options = {"--" + a.name: a for a in self.args if a.option}
+
+    def _convert(self, arg: Arg, token: str):
+        try:
+            return arg.convert(token)
+        except ValueError:
+            raise DispatchError(self.format_error or self.usage)
+
+    def parse(self, tokens: Sequence[str]) -> List[Any]:
+        """按模式转换参数，返回处理函数的位置参数列表；参数不足或格式错误时抛出 DispatchError"""
+        option_values: Dict[str, Any] = {}
+        if self._options:
+            positional = []
+            it = iter(tokens)
+            for token in it:
+                arg = self._options.get(token)
+                if arg is None:
+                    if token.startswith("--"):
+                        raise DispatchError(self.usage)
+                    positional.append(token)
+                    continue
+                value = next(it, None)
+                if value is None:
+                    raise DispatchError(self.usage)
+                option_values[arg.name] = self._convert(arg, value)
+            tokens = positional
+        if len(tokens) < self._min_args:
+            raise DispatchError(self.usage)
+        if self.strict and self._max_args is not None and len(tokens) > self._max_args:
+            raise DispatchError(self.usage)
+        values: List[Any] = []
+        for i, arg in enumerate(self._positional):
+            if arg.rest:
+                values.append(list(tokens[i:]))
+                break
+            if i >= len(tokens):
+                values.append(None)
+                continue
+            values.append(self._convert(arg, tokens[i]))
+        values.extend(option_values.get(arg.name) for arg in self._options.values())
+        return values
+
+
+class Dispatcher:
+    """
+    命令注册表
+    has_editor(context) 判断是否有活动文件，requires_editor 的命令在没有活动文件时按未知命令处理；
+    unknown(name, context) 返回未知命令的提示
+    注册时指定 kind 的命令只作用于该类型的编辑器 (editor_kind(context) 返回活动编辑器的类型)，
+    同名命令可以按类型分别注册 (例如文本与 XML 各自的 delete)；
+    strict 为 True 时，参数多于模式声明的命令按参数错误处理
+    """
+
+    def __init__(self, has_editor: Optional[Callable[[Any], bool]] = None,
+                 unknown: Optional[Callable[[str, Any], str]] = None,
+                 editor_kind: Optional[Callable[[Any], str]] = None, strict: bool = False):
+        self._commands: Dict[str, CommandSpec] = {}
+        self._variants: Dict[str, Dict[str, CommandSpec]] = {}
+        self.has_editor = has_editor or (lambda context: True)
+        self.unknown = unknown or (lambda name, context: f"Unknown command: {name}")
+        self.editor_kind = editor_kind or (lambda context: "")
+        self.strict = strict
+
+    def register(self, name: str, handler: Callable, schema: str = "", usage: Optional[str] = None,
+                 format_error: Optional[str] = None, requires_editor: bool = False,
+                 kind: Optional[str] = None) -> CommandSpec:
+        taken = name in self._commands or (name in self._variants and (kind is None or kind in self._variants[name]))
+        if taken:
+            raise ValueError(f"command '{name}' is already registered")
+        spec = CommandSpec(name, handler, schema, usage, format_error, requires_editor or kind is not None,
+                           strict=self.strict)
+        if kind is None:
+            self._commands[name] = spec
+        else:
+            self._variants.setdefault(name, {})[kind] = spec
+        return spec
+
+    def command(self, name: str, schema: str = "", **options):
+        """装饰器形式的 register"""
+        def decorator(handler):
+            self.register(name, handler, schema, **options)
+            return handler
+        return decorator
+
+    def get(self, name: str, kind: Optional[str] = None) -> Optional[CommandSpec]:
+        if kind is not None and name in self._variants:
+            return self._variants[name].get(kind)
+        return self._commands.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._commands or name in self._variants
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._commands
+        yield from (name for name in self._variants if name not in self._commands)
+
+    def dispatch(self, context, tokens: Sequence[str], raw: Optional[str] = None) -> bool:
+        """
+        执行一条已切分的命令：handler(context, raw, *参数)
+        处理函数返回 False 表示失败，其它返回值视为成功
+        """
+        spec = self._commands.get(tokens[0])
+        variants = self._variants.get(tokens[0]) if spec is None else None
+        if variants is not None and self.has_editor(context):
+            kind = self.editor_kind(context)
+            spec = variants.get(kind)
+            if spec is None:
+                print(f"Error: '{tokens[0]}' is not supported for {kind} files")
+                return False
+        if spec is None or (spec.requires_editor and not self.has_editor(context)):
+            print(self.unknown(tokens[0], context))
+            return False
+        try:
+            values = spec.parse(tokens[1:])
+        except DispatchError as e:
+            print(e)
+            return False
+        return spec.handler(context, raw, *values) is not False
@@ -1,45 +1,341 @@
-from typing import List
+import itertools
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple, Type, Union
 from .interfaces import Command
+from .commands import CompositeCommand
+from .buffer import TextBuffer, ListBuffer, PieceTableBuffer
+from .rope import RopeBuffer
+from .mmap_buffer import MmapLineBuffer
 
-class TextEditor:
-    def __init__(self, filename: str, content: List[str] = None):
+# 可选的行缓冲区实现，load/init 时按名称选择
+BUFFER_BACKENDS: Dict[str, Type[TextBuffer]] = {
+    "list": ListBuffer,
+    "piece": PieceTableBuffer,
+    "rope": RopeBuffer,
+    "lazy": MmapLineBuffer,
+}
+
+# 撤销记录的全局序号，跨编辑器比较新旧，用于按 "最旧优先" 回收
+_history_seq = itertools.count()
+
+
+class UndoMemoryPool:
+    """
+    多个编辑器共享的撤销历史内存预算
+    总占用超过 budget 时，在所有编辑器中按记录的新旧顺序从最旧的开始丢弃
+    只统计撤销栈：重做栈不会被回收，执行新命令时整体清空，不计入预算
+    used 由各编辑器在压入/合并/弹出/回收撤销记录时增量维护
+    """
+    def __init__(self, budget: Optional[int] = 256 * 1024 * 1024):
+        self.budget = budget
+        self.editors: List["Editor"] = []
+        self.used = 0
+
+    def register(self, editor: "Editor"):
+        if editor not in self.editors:
+            self.editors.append(editor)
+            editor.undo_pool = self
+            self.used += editor.undo_bytes
+            self.enforce()
+
+    def unregister(self, editor: "Editor"):
+        if editor in self.editors:
+            self.editors.remove(editor)
+            editor.undo_pool = None
+            self.used -= editor.undo_bytes
+
+    def enforce(self):
+        if self.budget is None:
+            return
+        while self.used > self.budget:
+            # 与单编辑器预算一致，每个编辑器至少保留最近一条
+            candidates = [e for e in self.editors if e.undo_depth > 1]
+            if not candidates:
+                break
+            oldest = min(candidates, key=lambda e: e.oldest_undo_seq())
+            oldest.evict_oldest_undo()
+
+
+class Editor:
+    """
+    编辑器公共部分：撤销/重做历史 (含内存预算与连续输入合并)、事务
+    TextEditor 与 XmlEditor 在此基础上各自实现内容的存储与序列化
+    """
+    # 编辑器类型，命令按类型分派 ("text" / "xml")
+    kind = ""
+
+    def __init__(self, filename: str):
         self.filename = filename
-        self.lines: List[str] = content if content is not None else []
         self.is_modified = False
-        
-        self._undo_stack: List[Command] = []
-        self._redo_stack: List[Command] = []
 
-    def get_content_str(self) -> str:
-        """获取用于保存的完整文本内容"""
-        return "\n".join(self.lines)
+        # 撤销栈元素为 (全局序号, 占用字节, 命令)，命令只保存增量 (位置 + 删除/插入的文本)
+        self._undo_stack: Deque[Tuple[int, int, Command]] = deque()
+        self._redo_stack: List[Tuple[int, Command]] = []  # (占用字节, 命令)
+        self._undo_bytes = 0
+        self._redo_bytes = 0
+        # 单个编辑器的撤销内存上限 (字节)，None 表示不限制
+        self.undo_budget: Optional[int] = 64 * 1024 * 1024
+        # 工作区级共享预算，由 Workspace 注册
+        self.undo_pool: Optional[UndoMemoryPool] = None
+        # 连续输入合并：距上一条命令不超过 coalesce_window 秒、合并后不超过
+        # coalesce_max_bytes 的相邻兼容命令并入同一个撤销单元；窗口为 None 时关闭 (默认关闭，
+        # 交互模式下由 Workspace.coalesce_window 开启)
+        self.coalesce_window: Optional[float] = None
+        self.coalesce_max_bytes = 4096
+        self._last_command_time: Optional[float] = None
+        # 进行中的事务：已执行的命令与推迟到提交时才发出的通知
+        self._transaction: Optional[List[Command]] = None
+        self._deferred: List[tuple] = []
+        # 首行每被修改一次加一，日志过滤头据此判断是否需要重新编译
+        self.header_version = 0
+
+    @property
+    def first_line(self) -> Optional[str]:
+        """文件首行 (日志过滤头所在的行)，没有内容时为 None"""
+        return None
+
+    def close(self):
+        """释放编辑器持有的资源 (关闭文件时调用)"""
+
+    # --- 撤销历史内存 ---
+    @property
+    def undo_memory(self) -> int:
+        """撤销 + 重做历史占用的字节数估计"""
+        return self._undo_bytes + self._redo_bytes
+
+    @property
+    def undo_bytes(self) -> int:
+        """撤销栈占用的字节数 (计入共享预算的部分)"""
+        return self._undo_bytes
+
+    def _add_undo_bytes(self, delta: int):
+        self._undo_bytes += delta
+        if self.undo_pool is not None:
+            self.undo_pool.used += delta
+
+    @property
+    def undo_depth(self) -> int:
+        return len(self._undo_stack)
+
+    def oldest_undo_seq(self) -> Optional[int]:
+        return self._undo_stack[0][0] if self._undo_stack else None
+
+    def evict_oldest_undo(self) -> int:
+        """丢弃最旧的一条撤销记录，返回释放的字节数"""
+        if not self._undo_stack:
+            return 0
+        _, size, _ = self._undo_stack.popleft()
+        self._add_undo_bytes(-size)
+        return size
+
+    def _push_undo(self, cmd: Command):
+        size = cmd.memory_size()
+        self._undo_stack.append((next(_history_seq), size, cmd))
+        self._add_undo_bytes(size)
+        self._enforce_undo_budget()
+
+    def _enforce_undo_budget(self):
+        if self.undo_budget is not None:
+            # 至少保留最近一条，保证刚执行的操作总能撤销
+            while self._undo_bytes > self.undo_budget and len(self._undo_stack) > 1:
+                self.evict_oldest_undo()
+        if self.undo_pool is not None:
+            self.undo_pool.enforce()
+
+    def break_coalescing(self):
+        """结束当前的合并窗口，下一条命令单独成为撤销单元 (撤销/重做/保存时调用)"""
+        self._last_command_time = None
+
+    def _try_coalesce(self, command: Command, now: float) -> bool:
+        if (self.coalesce_window is None or self._last_command_time is None
+                or now - self._last_command_time > self.coalesce_window or not self._undo_stack):
+            return False
+        seq, size, top = self._undo_stack[-1]
+        if not top.can_merge(command):
+            return False
+        if size + command.memory_size() > self.coalesce_max_bytes:
+            return False
+        top.merge(command)
+        new_size = top.memory_size()
+        self._undo_stack[-1] = (seq, new_size, top)
+        self._add_undo_bytes(new_size - size)
+        self._enforce_undo_budget()
+        return True
+
+    # --- 事务 ---
+    @property
+    def in_transaction(self) -> bool:
+        return self._transaction is not None
+
+    @property
+    def transaction_size(self) -> int:
+        """当前事务中已执行的命令数，没有事务时为 0"""
+        return len(self._transaction) if self._transaction is not None else 0
+
+    def begin(self) -> bool:
+        """开始事务：之后执行的命令在 commit 时合并为一个撤销单元"""
+        if self._transaction is not None:
+            print("Error: A transaction is already in progress.")
+            return False
+        self._transaction = []
+        self._deferred = []
+        self.break_coalescing()
+        return True
+
+    def defer(self, item):
+        """记录一条推迟到提交时处理的通知 (回滚时丢弃)"""
+        self._deferred.append(item)
+
+    def commit(self) -> List[tuple]:
+        """提交事务，把事务中的命令作为一个 CompositeCommand 压入撤销栈，返回推迟的通知"""
+        if self._transaction is None:
+            print("Error: No transaction in progress.")
+            return []
+        commands, deferred = self._transaction, self._deferred
+        self._transaction, self._deferred = None, []
+        if commands:
+            self._redo_stack.clear()
+            self._redo_bytes = 0
+            self._push_undo(commands[0] if len(commands) == 1 else CompositeCommand(commands))
+        return deferred
+
+    def rollback(self) -> bool:
+        """回滚事务：按相反顺序撤销事务中已执行的命令，丢弃推迟的通知"""
+        if self._transaction is None:
+            print("Error: No transaction in progress.")
+            return False
+        commands = self._transaction
+        self._transaction, self._deferred = None, []
+        for cmd in reversed(commands):
+            cmd.undo()
+        return True
 
     def execute_command(self, command: Command) -> bool:
-        """执行命令并压入撤销栈"""
+        """执行命令并压入撤销栈；与栈顶命令相邻且兼容时合并进栈顶"""
+        if self._transaction is not None:
+            if command.execute():
+                self._transaction.append(command)
+                return True
+            # 事务中任何一条命令失败，整个事务回滚
+            count = len(self._transaction)
+            self.rollback()
+            print(f"Transaction rolled back ({count} command(s) undone).")
+            return False
         if command.execute():
-            self._undo_stack.append(command)
             self._redo_stack.clear()  # 新操作会清空重做栈
+            self._redo_bytes = 0
+            now = time.monotonic()
+            if not self._try_coalesce(command, now):
+                self._push_undo(command)
+            self._last_command_time = now
             # self.is_modified = True
             return True
         return False
 
-    def undo(self):
-        """执行撤销"""
-        if self._undo_stack:
-            cmd = self._undo_stack.pop()
-            cmd.undo()
-            self._redo_stack.append(cmd)
-            # 注意：简单的 undo 后通常认为文件仍是被修改过的，
-            # 除非我们实现更复杂的 hash 对比，这里暂定为 True
-            # self.is_modified = True
+    def undo(self) -> bool:
+        """执行撤销；事务中拒绝或没有可撤销的命令时返回 False"""
+        if self._transaction is not None:
+            print("Error: Cannot undo inside a transaction, use rollback.")
+            return False
+        self.break_coalescing()
+        if not self._undo_stack:
+            print("Nothing to undo.")
+            return False
+        _, size, cmd = self._undo_stack.pop()
+        self._add_undo_bytes(-size)
+        cmd.undo()
+        self._redo_stack.append((size, cmd))
+        self._redo_bytes += size
+        # 注意：简单的 undo 后通常认为文件仍是被修改过的，
+        # 除非我们实现更复杂的 hash 对比，这里暂定为 True
+        # self.is_modified = True
+        return True
+
+    def redo(self) -> bool:
+        """执行重做；事务中拒绝、没有可重做的命令或重做失败时返回 False"""
+        if self._transaction is not None:
+            print("Error: Cannot redo inside a transaction.")
+            return False
+        self.break_coalescing()
+        if not self._redo_stack:
+            print("Nothing to redo.")
+            return False
+        size, cmd = self._redo_stack.pop()
+        self._redo_bytes -= size
+        if not cmd.execute():
+            return False
+        self._push_undo(cmd)
+        # self.is_modified = True
+        return True
+
+
+class TextEditor(Editor):
+    kind = "text"
+
+    def __init__(self, filename: str, content: Union[List[str], TextBuffer] = None,
+                 backend: str = "list"):
+        super().__init__(filename)
+        if isinstance(content, TextBuffer):
+            self.lines: TextBuffer = content
+        else:
+            self.lines = BUFFER_BACKENDS[backend](content)
+
+        # 自上次保存以来被修改的行 (用于增量保存)
+        self._dirty_lines: Optional[Set[int]] = set()
+        self._dirty_from: Optional[int] = None
+        # 上次加载/保存时磁盘文件的行偏移索引与 (size, mtime_ns)，由 Workspace 维护
+        self.disk_index = None
+        self.disk_stat = None
+        # 加载的文件是否以换行结尾；整体保存与增量保存都按它补回结尾换行
+        self.final_newline = False
+        # 文件的换行符 ("\n" 或 "\r\n")；行内容里不含换行符，保存时按它连接各行
+        self.newline = "\n"
+
+    # 单独记录的脏行数上限，超过后只保留最小脏行号，按尾部重写处理
+    MAX_TRACKED_DIRTY_LINES = 4096
+
+    def mark_dirty(self, line_idx: int, structural: bool = False):
+        """
+        记录被修改的行，由各编辑命令在 execute/undo 时调用
+        structural: 行数发生变化 (插入/删除整行)，其后所有行的位置都会移动
+        """
+        if line_idx == 0:
+            self.header_version += 1
+        if self._dirty_from is None or line_idx < self._dirty_from:
+            self._dirty_from = line_idx
+        if structural:
+            self._dirty_lines = None
+        elif self._dirty_lines is not None:
+            self._dirty_lines.add(line_idx)
+            if len(self._dirty_lines) > self.MAX_TRACKED_DIRTY_LINES:
+                self._dirty_lines = None
+
+    def clear_dirty(self):
+        self._dirty_lines = set()
+        self._dirty_from = None
+
+    @property
+    def dirty_from(self) -> Optional[int]:
+        """最小的脏行号 (0-based)，没有修改时为 None"""
+        return self._dirty_from
+
+    @property
+    def dirty_lines(self) -> Optional[Set[int]]:
+        """原地修改过的行号集合；发生过行数变化或数量过多时为 None"""
+        return self._dirty_lines
+
+    def get_content_str(self) -> str:
+        """获取用于保存的完整文本内容"""
+        return self.lines.get_text()
+
+    @property
+    def first_line(self) -> Optional[str]:
+        return self.lines[0] if len(self.lines) else None
+
+    def close(self):
+        self.lines.close()
 
-    def redo(self):
-        """执行重做"""
-        if self._redo_stack:
-            cmd = self._redo_stack.pop()
-            if cmd.execute():
-                self._undo_stack.append(cmd)
-                # self.is_modified = True
     # --- 辅助方法：处理显示范围 ---
     def get_lines_view(self, start: int = 1, end: int = -1):
         """获取指定范围的行（带行号），start从1开始"""
@@ -54,32 +350,48 @@ class TextEditor:
             end_idx = end
             
         result = []
-        for i in range(start_idx, end_idx):
-            result.append(f"{i + 1}: {self.lines[i]}")
+        for i, line in enumerate(self.lines.iter_lines(start_idx, end_idx), start_idx + 1):
+            result.append(f"{i}: {line}")
         return result
     
 """装饰器基类，保持与 TextEditor 相同接口"""
 class EditorDecorator:
-    def __init__(self, editor: TextEditor):
-        self._editor = editor
+    def __init__(self, editor: Editor):
+        object.__setattr__(self, "_editor", editor)
 
     # 代理属性访问
     def __getattr__(self, name):
         return getattr(self._editor, name)
+
+    # 属性赋值同样转发给被装饰对象，避免在装饰器上留下遮蔽的副本
+    # (例如 editor.is_modified = False 之后，内部再置 True 却读不到)
+    def __setattr__(self, name, value):
+        setattr(self._editor, name, value)
         
 class AutoModifiedDecorator(EditorDecorator):
-    """在执行任何命令后自动标记文件为已修改"""
+    """在执行任何命令后自动标记文件为已修改 (事务中推迟到提交时)"""
 
     def execute_command(self, command) -> bool:
         result = self._editor.execute_command(command)
-        if result:
+        if result and not self._editor.in_transaction:
             self._editor.is_modified = True
         return result
 
-    def undo(self):
-        self._editor.undo()
+    def undo(self) -> bool:
+        if not self._editor.undo():
+            return False
         self._editor.is_modified = True
+        return True
 
-    def redo(self):
-        self._editor.redo()
+    def redo(self) -> bool:
+        if not self._editor.redo():
+            return False
         self._editor.is_modified = True
+        return True
+
+    def commit(self) -> List[tuple]:
+        changed = self._editor.transaction_size > 0
+        deferred = self._editor.commit()
+        if changed:
+            self._editor.is_modified = True
+        return deferred
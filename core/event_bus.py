@@ -0,0 +1,182 @@
+"""
+异步观察者总线
+Workspace.notify 只把事件放进各观察者自己的队列，由每个观察者专属的后台线程按顺序调用 update，
+慢观察者 (写盘的日志、统计等) 不再拖慢编辑命令。
+队列满时按观察者各自的策略处理：
+- block:       等待队列腾出空间 (不丢事件，默认)
+- drop-oldest: 丢弃队列中最旧的事件
+- coalesce:    同一键 (默认 事件类型 + 文件名) 的事件在队列中只保留最新的一条；没有可合并的事件时等待
+               每个事件都必须送达的观察者 (类属性 coalescable = False，如日志) 订阅时退回 block
+"""
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .interfaces import Observer
+
+POLICIES = ("block", "drop-oldest", "coalesce")
+
+
+def default_coalesce_key(event_type: str, data: dict):
+    return event_type, data.get("filename")
+
+
+class ObserverChannel:
+    """一个观察者的事件队列与投递线程"""
+
+    def __init__(self, observer: Observer, policy: str = "block", max_queue: int = 1024,
+                 coalesce_key: Callable[[str, dict], Any] = default_coalesce_key):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown back-pressure policy '{policy}', choose from: {', '.join(POLICIES)}")
+        self.observer = observer
+        self.policy = policy
+        self.max_queue = max_queue
+        self.coalesce_key = coalesce_key
+        # 队列元素为 [事件类型, 数据]；合并时原地替换数据，保持它在队列中的位置
+        self._queue: Deque[list] = deque()
+        self._keys: Dict[Any, list] = {}
+        self._cond = threading.Condition()
+        self._busy = False
+        self._stopped = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name=f"observer-{type(observer).__name__}", daemon=True)
+        self._thread.start()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def publish(self, event_type: str, data: dict):
+        with self._cond:
+            self.published += 1
+            if self.policy == "coalesce":
+                key = self.coalesce_key(event_type, data)
+                pending = self._keys.get(key)
+                if pending is not None:
+                    pending[1] = data
+                    self.coalesced += 1
+                    return
+            while len(self._queue) >= self.max_queue and not self._stopped:
+                if self.policy == "drop-oldest":
+                    self._forget(self._queue.popleft())
+                    self.dropped += 1
+                else:
+                    self._cond.wait()
+            item = [event_type, data]
+            self._queue.append(item)
+            if self.policy == "coalesce":
+                self._keys[self.coalesce_key(event_type, data)] = item
+            self._cond.notify_all()
+
+    def _forget(self, item: list):
+        if self.policy == "coalesce":
+            key = self.coalesce_key(item[0], item[1])
+            if self._keys.get(key) is item:
+                del self._keys[key]
+
+    def drain(self):
+        """阻塞直到此前发布的事件全部投递完毕"""
+        with self._cond:
+            while (self._queue or self._busy) and not self._stopped:
+                self._cond.wait()
+
+    def stop(self):
+        self.drain()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+                self._forget(item)
+                self._busy = True
+                self._cond.notify_all()
+            try:
+                self.observer.update(item[0], item[1])
+            except Exception as e:
+                # 观察者出错不能让投递线程退出，否则之后的事件都会积压
+                self.failed += 1
+                print(f"Warning: observer {type(self.observer).__name__} failed on '{item[0]}': {e}")
+            with self._cond:
+                self._busy = False
+                self.delivered += 1
+                self._cond.notify_all()
+
+
+class EventBus:
+    """按观察者分队列的异步事件总线；同一观察者收到的事件顺序与发布顺序一致"""
+
+    def __init__(self, default_policy: str = "block", max_queue: int = 1024):
+        if default_policy not in POLICIES:
+            raise ValueError(f"unknown back-pressure policy '{default_policy}', choose from: {', '.join(POLICIES)}")
+        self.default_policy = default_policy
+        self.max_queue = max_queue
+        self._channels: Dict[int, ObserverChannel] = {}
+        self._closed = False
+
+    def subscribe(self, observer: Observer, policy: Optional[str] = None, max_queue: Optional[int] = None,
+                  **options) -> ObserverChannel:
+        channel = self._channels.get(id(observer))
+        if channel is None:
+            policy = policy or self.default_policy
+            if policy == "coalesce" and not getattr(observer, "coalescable", True):
+                policy = "block"
+            channel = ObserverChannel(observer, policy, max_queue or self.max_queue, **options)
+            self._channels[id(observer)] = channel
+        return channel
+
+    def unsubscribe(self, observer: Observer):
+        channel = self._channels.pop(id(observer), None)
+        if channel is not None:
+            channel.stop()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, observers: List[Observer], event_type: str, data: dict):
+        """把事件投给给定的观察者 (尚未订阅的按默认策略订阅)"""
+        for observer in observers:
+            self.subscribe(observer).publish(event_type, data)
+
+    def flush(self):
+        """屏障：等待所有已发布的事件投递完毕"""
+        for channel in list(self._channels.values()):
+            channel.drain()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for channel in list(self._channels.values()):
+            channel.stop()
+        self._channels.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各观察者的计数：已发布、排队中、已投递、丢弃、合并、出错"""
+        result = {}
+        for c in self._channels.values():
+            name = type(c.observer).__name__
+            if name in result:
+                name = f"{name}#{len(result)}"
+            result[name] = {
+                "policy": c.policy,
+                "published": c.published,
+                "queued": c.queued,
+                "delivered": c.delivered,
+                "dropped": c.dropped,
+                "coalesced": c.coalesced,
+                "failed": c.failed,
+            }
+        return result
@@ -0,0 +1,180 @@
+"""
+热路径计时 (可选)
+enable() 时把被测方法替换为计时包装，disable() 时还原；未启用时没有任何包装，不产生开销。
+每个被测点记录调用次数、耗时直方图 (p50/p95/p99) 以及读写的字节数。
+"""
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 直方图桶：每个 2 的幂之间再细分 _SUB_BUCKETS 份，相对误差约 19%
+_SUB_BUCKETS = 4
+
+
+class Histogram:
+    """对数分桶的耗时直方图 (纳秒)，内存占用与样本数无关"""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns: int):
+        bucket = int(math.log2(ns) * _SUB_BUCKETS) if ns > 1 else 0
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p: float) -> int:
+        """第 p 百分位的耗时 (取所在桶的上界，不超过最大值)"""
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(int(2 ** ((bucket + 1) / _SUB_BUCKETS)), self.max)
+        return self.max
+
+
+class Probe:
+    """一个被测点的统计"""
+    __slots__ = ("latency", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def to_dict(self) -> dict:
+        h = self.latency
+        return {
+            "count": h.count,
+            "total_ms": h.total / 1e6,
+            "p50_ms": h.percentile(50) / 1e6,
+            "p95_ms": h.percentile(95) / 1e6,
+            "p99_ms": h.percentile(99) / 1e6,
+            "max_ms": h.max / 1e6,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+class Instrumentation:
+    """
+    把计时包装安装到 (类, 方法名) 上
+    sizes 中的函数 (self, args, kwargs, result) -> (读字节, 写字节) 用于统计 I/O 量
+    """
+
+    def __init__(self):
+        self.probes: Dict[str, Probe] = {}
+        self._originals: List[Tuple[type, str, Callable]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def wrap(self, owner: type, attr: str, name: Optional[str] = None,
+             size: Optional[Callable[..., Tuple[int, int]]] = None):
+        original = owner.__dict__[attr]
+        probe = self.probes.setdefault(name or f"{owner.__name__}.{attr}", Probe())
+        lock = self._lock
+        clock = time.perf_counter_ns
+
+        def timed(self_, *args, **kwargs):
+            start = clock()
+            try:
+                result = original(self_, *args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                with lock:
+                    probe.latency.add(elapsed)
+            if size is not None:
+                read, written = size(self_, args, kwargs, result)
+                with lock:
+                    probe.bytes_read += read
+                    probe.bytes_written += written
+            return result
+
+        timed.__wrapped__ = original
+        timed.__name__ = getattr(original, "__name__", attr)
+        timed.__doc__ = getattr(original, "__doc__", None)
+        setattr(owner, attr, timed)
+        self._originals.append((owner, attr, original))
+
+    def enable(self):
+        """在编辑器的热路径上安装计时包装 (重复调用无效果)"""
+        if self.enabled:
+            return
+        from .editor import Editor
+        from .logger import Logger
+        from .workspace import Workspace
+
+        self.wrap(Editor, "execute_command", "editor.execute_command")
+        self.wrap(Editor, "undo", "editor.undo")
+        self.wrap(Editor, "redo", "editor.redo")
+        # 只统计真正读文件的路径：load 已打开的文件只是切换活动编辑器，不计入
+        for loader in ("_load_text", "_load_xml"):
+            self.wrap(Workspace, loader, "workspace.load_file",
+                      size=lambda ws, args, kwargs, result:
+                      (_file_size(args[0] if args else kwargs.get("filename")) if result is not None else 0, 0))
+        self.wrap(Workspace, "_write_to_disk", "workspace.write_to_disk")
+        # _save_editor 返回实际写出的字节数 (单个保存与并行 save all 都经过这里)
+        self.wrap(Workspace, "_save_editor", "workspace.save_editor",
+                  size=lambda ws, args, kwargs, result: (0, result or 0))
+        # 同步调用观察者与发布到事件总线都经过 _deliver (事务提交时补发的通知也在内)
+        self.wrap(Workspace, "_deliver", "workspace.notify")
+        self.wrap(Logger, "_write_log", "logger.write_log",
+                  size=lambda lg, args, kwargs, result: (0, len(args[1].encode("utf-8")) + 19 if len(args) > 1 else 0))
+
+    def disable(self):
+        """还原所有被替换的方法"""
+        while self._originals:
+            owner, attr, original = self._originals.pop()
+            setattr(owner, attr, original)
+
+    def reset(self):
+        with self._lock:
+            self.probes = {name: Probe() for name in self.probes}
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: probe.to_dict() for name, probe in self.probes.items()}
+
+    def report(self):
+        stats = self.snapshot()
+        if not self.enabled:
+            print("Instrumentation disabled (start with --stats to enable).")
+            return
+        print(f"  {'probe':<26}{'count':>8}{'total ms':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'read':>12}{'written':>12}")
+        for name, s in stats.items():
+            print(f"  {name:<26}{s['count']:>8}{s['total_ms']:>11.2f}{s['p50_ms']:>9.3f}{s['p95_ms']:>9.3f}"
+                  f"{s['p99_ms']:>9.3f}{s['bytes_read']:>12}{s['bytes_written']:>12}")
+
+    def dump_json(self, path: str):
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2)
+        except OSError as e:
+            print(f"Warning: Failed to write stats to {path}: {e}")
+
+
+# 进程内唯一的计时实例，由 main 按命令行参数启用
+INSTRUMENTATION = Instrumentation()
@@ -1,3 +1,4 @@
+import sys
 from abc import ABC, abstractmethod
 
 # === Command Pattern ===
@@ -11,6 +12,18 @@ class Command(ABC):
     def undo(self):
         pass
 
+    def memory_size(self) -> int:
+        """撤销历史中该命令占用的内存估计 (字节)，用于撤销内存预算"""
+        return sys.getsizeof(self)
+
+    def can_merge(self, other: "Command") -> bool:
+        """
+        other 紧接在本命令之后执行时，能否合并为一个撤销单元 (连续输入合并)
+        返回 True 的子类必须同时实现 merge(other)：把已经执行过的 other 并入本命令，
+        之后撤销/重做按一个整体进行；编辑器只在 can_merge 为 True 时调用 merge
+        """
+        return False
+
 # === Observer Pattern ===
 class Observer(ABC):
     """base observer interface"""
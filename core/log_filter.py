@@ -0,0 +1,48 @@
+"""
+文件首行的日志过滤头
+"# log" 表示打开文件时自动启用日志；"# log -e append -e delete" 另外排除指定命令不写入日志。
+过滤头只在 load/init 以及首行被修改时编译一次，之后每条命令只做一次集合查找。
+"""
+from typing import FrozenSet, List, Optional, Tuple
+
+# 会产生日志条目的命令，-e 后面出现其它名称时给出警告
+LOGGED_COMMANDS = frozenset({
+    "load", "init", "save", "close", "append", "insert", "delete", "replace", "undo", "redo",
+    # XML 编辑命令 (delete 与文本共用)
+    "insert-before", "append-child", "edit-id", "edit-text",
+})
+
+
+def is_log_header(line: Optional[str]) -> bool:
+    """首行是否为日志头 ("# log" 开头，后面可以跟过滤选项)"""
+    if not line:
+        return False
+    tokens = line.split(None, 2)
+    return tokens[:2] == ["#", "log"]
+
+
+def compile_log_filter(line: Optional[str]) -> Tuple[FrozenSet[str], List[str]]:
+    """
+    把首行编译为被排除的命令集合
+    返回 (排除集合, 问题列表)；首行不是日志头时排除集合为空
+    """
+    if not is_log_header(line):
+        return frozenset(), []
+    excluded = set()
+    problems = []
+    tokens = line.split()[2:]
+    i = 0
+    while i < len(tokens):
+        if tokens[i] != "-e":
+            problems.append(f"unknown option '{tokens[i]}'")
+            i += 1
+            continue
+        if i + 1 >= len(tokens):
+            problems.append("'-e' requires a command name")
+            break
+        name = tokens[i + 1]
+        if name not in LOGGED_COMMANDS:
+            problems.append(f"unknown command '{name}'")
+        excluded.add(name)
+        i += 2
+    return frozenset(excluded), problems
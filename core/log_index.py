@@ -0,0 +1,270 @@
+"""
+日志的旁路偏移索引
+.{file}.log.idx 中每条日志对应一项 (字节偏移, 时间戳秒)，由写日志时同步追加；
+tail / since 查询据此直接 seek 到目标位置，不必从头扫描整个日志文件。
+轮转出的历史段 (.{file}.log.1, .{file}.log.2.gz, ...) 各自带索引 .{file}.log.N.idx，
+偏移均指未压缩的内容，查询时按时间顺序跨段读取。
+"""
+import datetime
+import gzip
+import mmap
+import os
+import struct
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+RECORD = struct.Struct("<qq")
+TIMESTAMP_FORMAT = "%Y%m%d %H:%M:%S"
+# 日志行开头时间戳的长度 ("20250101 12:00:00")
+_STAMP_LEN = 17
+# 一致性检查时，最后一条索引项之后最多还允许剩余的字节数 (超过则认为索引落后，重建)
+_MAX_TAIL_CHECK = 1024 * 1024
+
+# --since 接受的时间格式
+SINCE_FORMATS = ("%Y%m%d %H:%M:%S", "%Y%m%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S",
+                 "%Y%m%d", "%Y-%m-%d")
+
+
+def index_path(log_path: str) -> str:
+    """日志段对应的索引文件 (压缩段与未压缩时共用同一个索引名)"""
+    if log_path.endswith(".gz"):
+        log_path = log_path[:-3]
+    return log_path + ".idx"
+
+
+def segment_path(log_path: str, n: int) -> str:
+    """第 n 个轮转段的未压缩文件名 (n 从 1 开始，越大越旧)"""
+    return f"{log_path}.{n}"
+
+
+def rotated_segments(log_path: str) -> List[str]:
+    """已存在的轮转段，从新到旧；同一段的压缩与未压缩文件同时存在时取未压缩的"""
+    segments = []
+    n = 1
+    while True:
+        plain = segment_path(log_path, n)
+        if os.path.exists(plain):
+            segments.append(plain)
+        elif os.path.exists(plain + ".gz"):
+            segments.append(plain + ".gz")
+        else:
+            return segments
+        n += 1
+
+
+def _open_data(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def parse_since(text: str) -> int:
+    """把 --since 参数解析为时间戳秒，格式不对时抛出 ValueError"""
+    for fmt in SINCE_FORMATS:
+        try:
+            return int(datetime.datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized time '{text}'")
+
+
+def _line_stamp(line: bytes, default: int) -> int:
+    """从日志行开头的时间戳得到秒数，没有时间戳的行 (如会话头) 沿用 default"""
+    try:
+        return int(datetime.datetime.strptime(line[:_STAMP_LEN].decode("ascii"), TIMESTAMP_FORMAT).timestamp())
+    except (UnicodeDecodeError, ValueError):
+        return default
+
+
+def append_entries(log_path: str, entries: Iterable[Tuple[str, int]]):
+    """把若干条 (日志行, 时间戳秒) 追加到日志文件，并同步追加对应的索引项"""
+    idx_path = index_path(log_path)
+    with open(log_path, "ab") as f:
+        offset = f.tell()
+        if offset and not os.path.exists(idx_path):
+            # 没有索引的旧日志：先补建一次
+            rebuild_index(log_path)
+        records = []
+        chunks = []
+        for entry, stamp in entries:
+            data = entry.encode("utf-8")
+            records.append(RECORD.pack(offset, stamp))
+            chunks.append(data)
+            offset += len(data)
+        f.write(b"".join(chunks))
+    with open(idx_path, "ab") as f:
+        f.write(b"".join(records))
+
+
+def rebuild_index(log_path: str):
+    """顺序扫描日志文件 (或压缩段) 重建索引，用于索引缺失或与日志不一致的情况"""
+    idx_path = index_path(log_path)
+    tmp = idx_path + ".tmp"
+    stamp = 0
+    with _open_data(log_path) as log, open(tmp, "wb") as out:
+        offset = 0
+        batch = []
+        for line in log:
+            stamp = _line_stamp(line, stamp)
+            batch.append(RECORD.pack(offset, stamp))
+            offset += len(line)
+            if len(batch) >= 4096:
+                out.write(b"".join(batch))
+                batch = []
+        out.write(b"".join(batch))
+    os.replace(tmp, idx_path)
+
+
+class LogIndex:
+    """只读打开的索引，支持按下标随机访问 (mmap，不整体读入内存)"""
+
+    def __init__(self, idx_path: str):
+        self._file = open(idx_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._count = size // RECORD.size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, i: int) -> Tuple[int, int]:
+        return RECORD.unpack_from(self._mm, i * RECORD.size)
+
+    def offset(self, i: int) -> int:
+        return self.record(i)[0]
+
+    def last_stamp(self) -> int:
+        return self.record(self._count - 1)[1]
+
+    def first_since(self, stamp: int) -> int:
+        """第一条时间戳 >= stamp 的日志下标 (二分查找)"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.record(mid)[1] < stamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+
+def _index_is_consistent(log_path: str, idx_path: str) -> bool:
+    log_size = os.path.getsize(log_path)
+    if not os.path.exists(idx_path):
+        return log_size == 0
+    idx_size = os.path.getsize(idx_path)
+    if idx_size % RECORD.size:
+        return False
+    if idx_size == 0:
+        return log_size == 0
+    with open(idx_path, "rb") as f:
+        first = RECORD.unpack(f.read(RECORD.size))[0]
+        f.seek(idx_size - RECORD.size)
+        last = RECORD.unpack(f.read(RECORD.size))[0]
+    if first != 0 or not (0 <= last < log_size) or log_size - last > _MAX_TAIL_CHECK:
+        return False
+    # 最后一条索引项之后应当恰好是一整行
+    with open(log_path, "rb") as f:
+        f.seek(last)
+        tail = f.read()
+    return tail.endswith(b"\n") and tail.count(b"\n") == 1
+
+
+def open_index(log_path: str, check: bool = True) -> LogIndex:
+    """
+    打开日志对应的索引，缺失或不一致时先重建
+    check=False 用于轮转出的历史段：内容不再变化，只在索引缺失时重建
+    """
+    idx_path = index_path(log_path)
+    if check:
+        consistent = _index_is_consistent(log_path, idx_path)
+    else:
+        consistent = os.path.exists(idx_path)
+    if not consistent:
+        rebuild_index(log_path)
+    return LogIndex(idx_path)
+
+
+def _iter_from(log_path: str, offset: int) -> Iterator[str]:
+    with _open_data(log_path) as f:
+        f.seek(offset)
+        for line in f:
+            yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def _matches(line: str, grep: str) -> bool:
+    """--grep 只匹配时间戳之后的命令部分"""
+    message = line[_STAMP_LEN + 1:] if line[:8].isdigit() else line
+    return grep in message
+
+
+def query_log(log_path: str, tail: Optional[int] = None, since: Optional[int] = None,
+              grep: Optional[str] = None) -> Iterator[str]:
+    """
+    按条件读取日志行 (不含换行符)，结果按时间顺序产出，透明地跨越轮转出的历史段
+    - since: 只看时间戳 >= since 的日志，按段的最后时间戳跳过整段，段内二分查找索引定位起点
+    - grep:  只保留命令中包含该子串的日志
+    - tail:  只取最后 N 条 (与 grep 同时使用时为最后 N 条匹配)
+    """
+    paths = list(reversed(rotated_segments(log_path)))
+    if os.path.exists(log_path):
+        paths.append(log_path)
+    # 每段的 (路径, 条数, 起始条目, 起始偏移)；起始条目之前的内容不必读取
+    plan: List[Tuple[str, int, int, int]] = []
+    for path in paths:
+        index = open_index(path, check=path == log_path)
+        try:
+            count = len(index)
+            if not count:
+                continue
+            start = 0
+            if since is not None:
+                start = count if index.last_stamp() < since else index.first_since(since)
+            plan.append((path, count, start, index.offset(start) if start < count else 0))
+        finally:
+            index.close()
+    if grep is None and tail is not None:
+        # 从最新的段往回数出最后 tail 条
+        remaining = tail
+        for k in range(len(plan) - 1, -1, -1):
+            path, count, start, _ = plan[k]
+            if remaining < count - start:
+                start = count - remaining
+                plan = [(path, count, start, _entry_offset(path, start) if start < count else 0)] + plan[k + 1:]
+                break
+            remaining -= count - start
+    lines = _iter_plan(plan)
+    if grep is None:
+        yield from lines
+        return
+    matched = (line for line in lines if _matches(line, grep))
+    if tail is None:
+        yield from matched
+    else:
+        yield from deque(matched, maxlen=tail)
+
+
+def _entry_offset(path: str, i: int) -> int:
+    index = LogIndex(index_path(path))
+    try:
+        return index.offset(i)
+    finally:
+        index.close()
+
+
+def _iter_plan(plan) -> Iterator[str]:
+    for path, count, start, offset in plan:
+        if start < count:
+            yield from _iter_from(path, offset)
+
+
+def remove_log(log_path: str):
+    """删除日志文件、各轮转段及其索引"""
+    paths = [log_path] + rotated_segments(log_path)
+    for path in paths:
+        for p in (path, index_path(path)):
+            if os.path.exists(p):
+                os.remove(p)
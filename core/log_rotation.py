@@ -0,0 +1,124 @@
+"""
+命令日志的轮转
+当前日志 .{file}.log 超过 max_bytes，或本进程第一次写入一个已有内容的日志 (per_session) 时，
+把它移为 .{file}.log.1，原有的 .1 / .2 ... 依次后移，只保留 keep 个历史段。
+.2 及更旧的段在后台线程中压缩为 .gz，不阻塞编辑；索引 .N.idx 随段一起移动。
+"""
+import gzip
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Set
+
+from .log_index import index_path, rotated_segments, segment_path
+
+
+def _move(src: str, dst: str):
+    if os.path.exists(src):
+        os.replace(src, dst)
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class LogRotation:
+    """
+    日志轮转策略，由日志写入端 (FileLogSink / BufferedLogSink) 在每次追加前调用 maybe_rotate
+    - max_bytes:   当前日志超过该大小时轮转，None 表示不按大小轮转
+    - keep:        保留的历史段个数，更旧的直接删除
+    - compress:    是否在后台把 .2 及更旧的段压缩为 gzip
+    - per_session: 每次启动后第一次写入已有日志时先轮转，让每个会话从新段开始
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024, keep: int = 5, compress: bool = True,
+                 per_session: bool = False):
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.compress = compress
+        self.per_session = per_session
+        self._seen: Set[str] = set()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-gzip")
+
+    def maybe_rotate(self, log_path: str, incoming: int = 0) -> bool:
+        """即将向 log_path 追加 incoming 字节，需要时先轮转；返回是否发生了轮转"""
+        first = log_path not in self._seen
+        self._seen.add(log_path)
+        try:
+            size = os.path.getsize(log_path)
+        except OSError:
+            return False
+        if not size:
+            return False
+        if (first and self.per_session) or (self.max_bytes is not None and size + incoming > self.max_bytes):
+            self.rotate(log_path)
+            return True
+        return False
+
+    def rotate(self, log_path: str):
+        """把当前日志移为 .1，其余历史段后移一位，超出 keep 的删除"""
+        # 正在压缩的段也要参与后移，先等它完成
+        self.wait(log_path)
+        for n in range(len(rotated_segments(log_path)), max(self.keep, 1) - 1, -1):
+            self._remove_segment(log_path, n)
+        if self.keep < 1:
+            self._remove_segment(log_path, 0)
+            return
+        for n in range(self.keep - 1, 0, -1):
+            src, dst = segment_path(log_path, n), segment_path(log_path, n + 1)
+            _move(src, dst)
+            _move(src + ".gz", dst + ".gz")
+            _move(index_path(src), index_path(dst))
+        first = segment_path(log_path, 1)
+        _move(log_path, first)
+        _move(index_path(log_path), index_path(first))
+        if self.compress and self.keep >= 2 and os.path.exists(segment_path(log_path, 2)):
+            with self._lock:
+                if self._closed:
+                    # 退出阶段不再有后台线程，直接压缩
+                    self._compress(segment_path(log_path, 2))
+                else:
+                    self._pending[log_path] = self._executor.submit(self._compress, segment_path(log_path, 2))
+
+    @staticmethod
+    def _remove_segment(log_path: str, n: int):
+        path = segment_path(log_path, n) if n else log_path
+        _remove(path)
+        _remove(path + ".gz")
+        _remove(index_path(path))
+
+    @staticmethod
+    def _compress(path: str):
+        """压缩为 path.gz：先写临时文件再改名，最后删除原文件 (期间读取方仍使用未压缩的段)"""
+        tmp = path + ".gz.tmp"
+        try:
+            with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, path + ".gz")
+            os.remove(path)
+        except OSError as e:
+            _remove(tmp)
+            print(f"Warning: Failed to compress log {path}: {e}")
+
+    def wait(self, log_path: str = None):
+        """等待后台压缩完成 (log_path 为 None 时等待全部)"""
+        with self._lock:
+            if log_path is None:
+                futures = list(self._pending.values())
+                self._pending.clear()
+            else:
+                future = self._pending.pop(log_path, None)
+                futures = [future] if future is not None else []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
@@ -1,14 +1,158 @@
 import os  # 新增引入
+import atexit
 import datetime
-from typing import Set
+import queue
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from .interfaces import Observer
+from .log_index import append_entries, remove_log, rotated_segments
+from .log_rotation import LogRotation
+from .log_filter import compile_log_filter
+
+
+class FileLogSink:
+    """
+    同步写入：每条日志都打开文件追加一行后关闭 (原有行为)；同时维护偏移索引
+    传入 rotation 时每次追加前检查是否需要轮转
+    """
+
+    def __init__(self, rotation: Optional[LogRotation] = None):
+        self.rotation = rotation
+
+    def write(self, log_filename: str, entry: str, filename: str, stamp: Optional[int] = None):
+        if stamp is None:
+            stamp = int(time.time())
+        try:
+            if self.rotation is not None:
+                self.rotation.maybe_rotate(log_filename, len(entry))
+            append_entries(log_filename, [(entry, stamp)])
+        except IOError as e:
+            print(f"Warning: Failed to write log for {filename}: {e}")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.rotation is not None:
+            self.rotation.close()
+
+
+class BufferedLogSink:
+    """
+    缓冲异步写入：日志条目先放入有界队列，由后台线程攒批后按文件一次性追加。
+    满足任一条件即落盘：累计字节数达到 flush_bytes / 最早的未写条目超过 flush_interval 秒 / 显式 flush()。
+    队列满时 write 会阻塞，保证不丢日志。
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, max_queue: int = 10000, flush_bytes: int = 64 * 1024, flush_interval: float = 1.0,
+                 rotation: Optional[LogRotation] = None):
+        self.rotation = rotation
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, log_filename: str, entry: str, filename: str, stamp: Optional[int] = None):
+        if stamp is None:
+            stamp = int(time.time())
+        if self._closed:
+            FileLogSink(self.rotation).write(log_filename, entry, filename, stamp)
+            return
+        self._queue.put((log_filename, (entry, stamp), filename))
+
+    def flush(self):
+        """阻塞直到此前写入的所有条目都已落盘"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put((self._STOP, None))
+        self._thread.join()
+        if self.rotation is not None:
+            self.rotation.close()
+
+    def _run(self):
+        pending: Dict[str, List[Tuple[str, int]]] = {}
+        owners: Dict[str, str] = {}
+        pending_bytes = 0
+        first_at = None
+        while True:
+            timeout = None
+            if first_at is not None:
+                timeout = max(0.0, first_at + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] is not self._FLUSH and item[0] is not self._STOP:
+                log_filename, entry, filename = item
+                pending.setdefault(log_filename, []).append(entry)
+                owners[log_filename] = filename
+                pending_bytes += len(entry[0])
+                if first_at is None:
+                    first_at = time.monotonic()
+                if pending_bytes < self.flush_bytes and time.monotonic() - first_at < self.flush_interval:
+                    continue
+            try:
+                if pending:
+                    self._write_batch(pending, owners)
+            except Exception as e:
+                # 写线程不能退出，否则之后的 flush() 会永远等待；这一批丢弃并报告
+                print(f"Warning: Failed to write log batch: {e}")
+            finally:
+                pending, owners = {}, {}
+                pending_bytes = 0
+                first_at = None
+                if item is not None and item[0] is self._FLUSH:
+                    item[1].set()
+            if item is not None and item[0] is self._STOP:
+                return
+
+    def _write_batch(self, pending: Dict[str, List[Tuple[str, int]]], owners: Dict[str, str]):
+        for log_filename, entries in pending.items():
+            try:
+                if self.rotation is not None:
+                    self.rotation.maybe_rotate(log_filename, sum(len(entry) for entry, _ in entries))
+                append_entries(log_filename, entries)
+            except Exception as e:
+                print(f"Warning: Failed to write log for {owners[log_filename]}: {e}")
+
 
 class Logger(Observer):
     """
     日志观察者
     """
-    def __init__(self):
+    # 每条命令事件都要写一行日志，事件总线不能按 (事件类型, 文件名) 合并
+    coalescable = False
+
+    def __init__(self, sink=None):
         self.enabled_files: Set[str] = set()
+        # 日志写入方式，默认每条同步写入；传入 BufferedLogSink 可改为后台批量写入
+        self._sink = sink if sink is not None else FileLogSink()
+        # 各文件首行 "# log -e ..." 编译出的排除命令集合 (收到 log_header 事件时才重新编译)
+        self._filters: Dict[str, FrozenSet[str]] = {}
+        # 已经警告过的 (文件, 问题)，同一问题只提示一次
+        self._warned: Set[Tuple[str, str]] = set()
+
+    def flush(self):
+        """确保已记录的日志全部写入磁盘 (save / close / 退出时调用)"""
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
 
     def enable_log(self, filename: str):
         self.enabled_files.add(filename)
@@ -22,32 +166,51 @@ class Logger(Observer):
         """获取当前开启日志的文件列表 (用于持久化保存)"""
         return list(self.enabled_files)
 
+    def excluded_commands(self, filename: str) -> FrozenSet[str]:
+        return self._filters.get(filename, frozenset())
+
+    def _set_header(self, filename: str, header: Optional[str]):
+        excluded, problems = compile_log_filter(header)
+        if excluded:
+            self._filters[filename] = excluded
+        else:
+            self._filters.pop(filename, None)
+        for problem in problems:
+            if (filename, problem) not in self._warned:
+                self._warned.add((filename, problem))
+                print(f"Warning: log filter in {filename}: {problem}")
+
     def delete_log_file(self, filename: str):
         """Bug2修复: 删除指定文件的日志(用于废弃新文件时清理)"""
         log_filename = f".{filename}.log"
-        if os.path.exists(log_filename):
+        # 先让缓冲中的条目落盘、后台压缩结束，避免删除后又被后台线程重新创建
+        self._sink.flush()
+        rotation = getattr(self._sink, "rotation", None)
+        if rotation is not None:
+            rotation.wait(log_filename)
+        if os.path.exists(log_filename) or rotated_segments(log_filename):
             try:
-                os.remove(log_filename)
+                remove_log(log_filename)
                 print(f"Log file removed: {log_filename}")
             except OSError as e:
                 print(f"Warning: Could not delete log file: {e}")
 
     def _write_log(self, filename: str, message: str):
         log_filename = f".{filename}.log"
-        timestamp = datetime.datetime.now().strftime("%Y%m%d %H:%M:%S")
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y%m%d %H:%M:%S")
         entry = f"{timestamp} {message}\n"
-        
-        try:
-            with open(log_filename, 'a', encoding='utf-8') as f:
-                f.write(entry)
-        except IOError as e:
-            print(f"Warning: Failed to write log for {filename}: {e}")
+        self._sink.write(log_filename, entry, filename, int(now.timestamp()))
 
     def update(self, event_type: str, data: dict):
         filename = data.get('filename')
         if not filename:
             return
 
+        if event_type == 'log_header':
+            self._set_header(filename, data.get('header'))
+            return
+
         if event_type == 'auto_log_enable':
             self.enable_log(filename)
             self._write_log(filename, "session start at " + datetime.datetime.now().strftime("%Y%m%d %H:%M:%S"))
@@ -62,6 +225,11 @@ class Logger(Observer):
 
         if event_type == 'command' and filename in self.enabled_files:
             command_str = data.get('command_str', '')
+            excluded = self._filters.get(filename)
+            if excluded and command_str.split(' ', 1)[0] in excluded:
+                return
             self._write_log(filename, command_str)
+            if command_str in ("save", "close"):
+                self.flush()
 
 
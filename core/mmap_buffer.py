@@ -0,0 +1,290 @@
+"""基于 mmap 的惰性行缓冲区：加载时只建立换行偏移索引，行文本按需解码"""
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, List, Optional
+from .buffer import TextBuffer
+from .writer import DEFAULT_CHUNK_SIZE, iter_line_chunks
+
+# 建索引时每次扫描的字节数
+_CHUNK = 8 * 1024 * 1024
+# 顺序读取原始区域时每批解码的行数
+_DECODE_BATCH = 4096
+
+
+def build_line_index(data, size: int) -> array:
+    """
+    分块扫描换行符，得到每一行的起始偏移，共 n + 1 项
+    第 i 行的字节范围统一为 [starts[i], starts[i + 1] - 1)：
+    最后一行没有换行符时补一个 size + 1 的哨兵
+    """
+    starts = array("q", [0])
+    if size == 0:
+        return starts
+    pos = 0
+    while pos < size:
+        end = min(pos + _CHUNK, size)
+        if end < size:
+            nl = data.rfind(b"\n", pos, end)
+            if nl == -1:
+                nl = data.find(b"\n", end)
+            end = size if nl == -1 else nl + 1
+        parts = data[pos:end].split(b"\n")
+        # 每个换行符之后就是下一行的起点
+        starts.extend(islice(accumulate((len(p) + 1 for p in parts[:-1]), initial=pos), 1, None))
+        pos = end
+    if data[size - 1:size] != b"\n":
+        starts.append(size + 1)
+    return starts
+
+
+def detect_newline(data) -> str:
+    """按第一个换行符判断文件的换行风格："\r\n" 或 "\n" (没有换行符时为 "\n")"""
+    nl = data.find(b"\n")
+    return "\r\n" if nl > 0 and data[nl - 1:nl] == b"\r" else "\n"
+
+
+def scan_newline(path: str) -> str:
+    """磁盘文件的换行风格 (见 detect_newline)"""
+    if os.path.getsize(path) == 0:
+        return "\n"
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return detect_newline(mm)
+
+
+def scan_line_index(path: str) -> array:
+    """对磁盘文件建立行偏移索引 (临时映射，扫描完即释放)"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return array("q", [0])
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return build_line_index(mm, size)
+
+
+class _FileSegment:
+    """引用原文件中连续的若干行 [first, first + count)"""
+    __slots__ = ("first", "count")
+
+    def __init__(self, first: int, count: int):
+        self.first = first
+        self.count = count
+
+
+class _MemSegment:
+    """已经物化 (被修改或新插入) 的若干行"""
+    __slots__ = ("lines",)
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+
+    @property
+    def count(self) -> int:
+        return len(self.lines)
+
+
+class MmapLineBuffer(TextBuffer):
+    """
+    惰性加载的行缓冲区
+    - 原文件通过 mmap 映射，只保存每行的起始偏移 (array('q'))
+    - 文档由若干段组成：原文件行区间 / 内存中的行列表，编辑时只物化被触及的行
+    - 保存时未修改的区间直接按字节范围拷贝，不再逐行解码再编码
+    行的切分规则与 readlines() + rstrip('\\n') 相同；CRLF 文件 (按第一个换行符判断) 的行尾 '\\r' 在解码时去掉。
+    """
+
+    encoding = "utf-8"
+
+    def __init__(self, lines: Optional[Iterable[str]] = None):
+        self._path: Optional[str] = None
+        self._file = None
+        self._mm = None
+        self._starts = array("q", [0])
+        self._size = 0
+        self.newline = "\n"
+        lines = list(lines) if lines is not None else []
+        self._segs: list = [_MemSegment(lines)] if lines else []
+        self._seg_starts: Optional[List[int]] = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "MmapLineBuffer":
+        buf = cls()
+        buf._map(path)
+        return buf
+
+    # --- 映射与索引 ---
+    def _map(self, path: str):
+        self._path = path
+        size = self._size = os.path.getsize(path)
+        self.newline = "\n"
+        if size == 0:
+            # 空文件无法 mmap，也不需要索引
+            self._starts = array("q", [0])
+            self._segs = []
+            self._seg_starts = None
+            return
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._starts = build_line_index(self._mm, size)
+        self.newline = detect_newline(self._mm)
+        self._segs = [_FileSegment(0, len(self._starts) - 1)]
+        self._seg_starts = None
+
+    def close(self):
+        """释放映射 (关闭编辑器或覆盖原文件前调用)"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reopen(self):
+        """重新打开原映射 (文件内容未变，索引和已做的修改都保留)"""
+        self._file = open(self._path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def remap(self, path: str):
+        """文件被整体重写后重新映射：此时内容与磁盘一致，全部回到未修改状态"""
+        expected = len(self)
+        self.close()
+        self._map(path)
+        if len(self) < expected:
+            # 最后一行为空时，写出的文件以换行结尾，按读取规则会少一行，这里补回
+            self._segs.append(_MemSegment([""]))
+            self._seg_starts = None
+
+    @property
+    def source_path(self) -> Optional[str]:
+        return self._path if self._mm is not None else None
+
+    @property
+    def line_index(self) -> array:
+        """原文件的行起始偏移索引 (格式见 build_line_index)"""
+        return self._starts
+
+    def _line_bytes(self, first: int, last: int):
+        """原文件第 [first, last) 行对应的字节范围 (不含最后一行的换行符)"""
+        start, end = self._starts[first], self._starts[last] - 1
+        if self.newline == "\r\n" and end < self._size and self._mm[end - 1:end] == b"\r":
+            end -= 1
+        return start, end
+
+    def _decode(self, first: int, last: int) -> List[str]:
+        start, end = self._line_bytes(first, last)
+        text = self._mm[start:end].decode(self.encoding)
+        if self.newline == "\r\n":
+            text = text.replace("\r\n", "\n")
+        return text.split("\n")
+
+    # --- 段定位 ---
+    def _locate(self, index: int):
+        """返回 (段下标, 段内偏移)"""
+        if self._seg_starts is None:
+            self._seg_starts = [0]
+            for seg in self._segs:
+                self._seg_starts.append(self._seg_starts[-1] + seg.count)
+        if not (0 <= index < self._seg_starts[-1]):
+            raise IndexError("line index out of range")
+        k = bisect_right(self._seg_starts, index) - 1
+        return k, index - self._seg_starts[k]
+
+    def _materialize(self, index: int):
+        """确保第 index 行位于内存段中，返回 (段, 段内偏移)"""
+        k, offset = self._locate(index)
+        seg = self._segs[k]
+        if isinstance(seg, _MemSegment):
+            return seg, offset
+        line = self._decode(seg.first + offset, seg.first + offset + 1)[0]
+        pieces = []
+        if offset:
+            pieces.append(_FileSegment(seg.first, offset))
+        mem = _MemSegment([line])
+        pieces.append(mem)
+        if offset + 1 < seg.count:
+            pieces.append(_FileSegment(seg.first + offset + 1, seg.count - offset - 1))
+        self._segs[k:k + 1] = pieces
+        self._seg_starts = None
+        # 与相邻的内存段合并，避免连续编辑时段数膨胀
+        pos = k + pieces.index(mem)
+        if pos + 1 < len(self._segs) and isinstance(self._segs[pos + 1], _MemSegment):
+            mem.lines.extend(self._segs.pop(pos + 1).lines)
+        if pos > 0 and isinstance(self._segs[pos - 1], _MemSegment):
+            prev = self._segs[pos - 1]
+            offset_in_prev = prev.count
+            prev.lines.extend(mem.lines)
+            del self._segs[pos]
+            return prev, offset_in_prev
+        return mem, 0
+
+    # --- TextBuffer 接口 ---
+    def __len__(self) -> int:
+        return sum(seg.count for seg in self._segs) if self._seg_starts is None else self._seg_starts[-1]
+
+    def get_line(self, index: int) -> str:
+        k, offset = self._locate(index)
+        seg = self._segs[k]
+        if isinstance(seg, _MemSegment):
+            return seg.lines[offset]
+        return self._decode(seg.first + offset, seg.first + offset + 1)[0]
+
+    def set_line(self, index: int, text: str):
+        seg, offset = self._materialize(index)
+        seg.lines[offset] = text
+
+    def insert(self, index: int, text: str):
+        if index >= len(self):
+            if self._segs and isinstance(self._segs[-1], _MemSegment):
+                self._segs[-1].lines.append(text)
+            else:
+                self._segs.append(_MemSegment([text]))
+        else:
+            seg, offset = self._materialize(index)
+            seg.lines.insert(offset, text)
+        self._seg_starts = None
+
+    def delete_line(self, index: int):
+        seg, offset = self._materialize(index)
+        del seg.lines[offset]
+        if not seg.lines:
+            self._segs.remove(seg)
+        self._seg_starts = None
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        total = len(self)
+        end = total if end is None else min(end, total)
+        start = max(0, start)
+        if start >= end:
+            return
+        k, offset = self._locate(start)
+        remaining = end - start
+        for seg in self._segs[k:]:
+            take = min(seg.count - offset, remaining)
+            if isinstance(seg, _MemSegment):
+                yield from seg.lines[offset:offset + take]
+            else:
+                first = seg.first + offset
+                for batch in range(first, first + take, _DECODE_BATCH):
+                    yield from self._decode(batch, min(batch + _DECODE_BATCH, first + take))
+            remaining -= take
+            offset = 0
+            if not remaining:
+                return
+
+    def iter_encoded(self, chunk_size: int = DEFAULT_CHUNK_SIZE, newline: str = "\n") -> Iterator[bytes]:
+        """
+        按保存格式 (newline 连接各行) 产出编码后的字节块
+        未修改的原文件区间直接切片拷贝 (区间内保留原文件的换行符)，内存段逐行编码
+        """
+        sep = newline.encode(self.encoding)
+        first_seg = True
+        for seg in self._segs:
+            if isinstance(seg, _MemSegment):
+                yield from iter_line_chunks(seg.lines, chunk_size, leading_newline=not first_seg, newline=newline)
+            else:
+                if not first_seg:
+                    yield sep
+                start, end = self._line_bytes(seg.first, seg.first + seg.count)
+                for pos in range(start, end, chunk_size):
+                    yield self._mm[pos:min(pos + chunk_size, end)]
+            first_seg = False
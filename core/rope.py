@@ -0,0 +1,178 @@
+"""基于平衡树 (AVL) 的行存储：按行号定位、插入、删除均为 O(log n)"""
+from typing import Iterable, Iterator, List, Optional
+from .buffer import TextBuffer
+
+
+class _RopeNode:
+    """树节点：按中序遍历排列的一行文本，附带子树行数与高度"""
+    __slots__ = ("line", "left", "right", "size", "height")
+
+    def __init__(self, line: str):
+        self.line = line
+        self.left: Optional["_RopeNode"] = None
+        self.right: Optional["_RopeNode"] = None
+        self.size = 1
+        self.height = 1
+
+
+def _size(node: Optional[_RopeNode]) -> int:
+    return node.size if node else 0
+
+
+def _height(node: Optional[_RopeNode]) -> int:
+    return node.height if node else 0
+
+
+def _update(node: _RopeNode):
+    node.size = _size(node.left) + _size(node.right) + 1
+    node.height = max(_height(node.left), _height(node.right)) + 1
+
+
+def _rotate_right(node: _RopeNode) -> _RopeNode:
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rotate_left(node: _RopeNode) -> _RopeNode:
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _balance(node: _RopeNode) -> _RopeNode:
+    _update(node)
+    diff = _height(node.left) - _height(node.right)
+    if diff > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if diff < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+
+def _build(lines: List[str], lo: int, hi: int) -> Optional[_RopeNode]:
+    """由有序行列表直接构建完全平衡的树，O(n)"""
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    node = _RopeNode(lines[mid])
+    node.left = _build(lines, lo, mid)
+    node.right = _build(lines, mid + 1, hi)
+    _update(node)
+    return node
+
+
+def _insert(node: Optional[_RopeNode], index: int, line: str) -> _RopeNode:
+    if node is None:
+        return _RopeNode(line)
+    left_size = _size(node.left)
+    if index <= left_size:
+        node.left = _insert(node.left, index, line)
+    else:
+        node.right = _insert(node.right, index - left_size - 1, line)
+    return _balance(node)
+
+
+def _pop_min(node: _RopeNode):
+    """删除子树中最左节点，返回 (新子树根, 被删节点)"""
+    if node.left is None:
+        return node.right, node
+    node.left, smallest = _pop_min(node.left)
+    return _balance(node), smallest
+
+
+def _delete(node: _RopeNode, index: int) -> Optional[_RopeNode]:
+    left_size = _size(node.left)
+    if index < left_size:
+        node.left = _delete(node.left, index)
+    elif index > left_size:
+        node.right = _delete(node.right, index - left_size - 1)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        node.right, successor = _pop_min(node.right)
+        successor.left, successor.right = node.left, node.right
+        node = successor
+    return _balance(node)
+
+
+class RopeBuffer(TextBuffer):
+    """
+    平衡树行存储
+    适合百万行级别的文件：中间插入/删除整行不需要像 list 那样整体搬移。
+    """
+
+    def __init__(self, lines: Optional[Iterable[str]] = None):
+        lines = list(lines) if lines is not None else []
+        self._root = _build(lines, 0, len(lines))
+
+    def _node_at(self, index: int) -> _RopeNode:
+        node = self._root
+        while node is not None:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index > left_size:
+                index -= left_size + 1
+                node = node.right
+            else:
+                return node
+        raise IndexError("line index out of range")
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def get_line(self, index: int) -> str:
+        return self._node_at(index).line
+
+    def set_line(self, index: int, text: str):
+        self._node_at(index).line = text
+
+    def insert(self, index: int, text: str):
+        self._root = _insert(self._root, min(index, len(self)), text)
+
+    def delete_line(self, index: int):
+        if not (0 <= index < len(self)):
+            raise IndexError("line index out of range")
+        self._root = _delete(self._root, index)
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """中序遍历，先沿路径下探到 start 所在节点，之后每行均摊 O(1)"""
+        end = len(self) if end is None else min(end, len(self))
+        start = max(0, start)
+        remaining = end - start
+        if remaining <= 0:
+            return
+        stack: List[_RopeNode] = []
+        node, index = self._root, start
+        while node is not None:
+            left_size = _size(node.left)
+            if index < left_size:
+                stack.append(node)
+                node = node.left
+            elif index > left_size:
+                index -= left_size + 1
+                node = node.right
+            else:
+                stack.append(node)
+                break
+        while stack and remaining:
+            node = stack.pop()
+            yield node.line
+            remaining -= 1
+            child = node.right
+            while child is not None:
+                stack.append(child)
+                child = child.left
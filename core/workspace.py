@@ -1,18 +1,68 @@
 import os
+import itertools
 import json
-from typing import Dict, Optional
-from .interfaces import Subject
-from .editor import TextEditor, AutoModifiedDecorator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from .interfaces import Observer, Subject
+from .event_bus import EventBus
+from .editor import Editor, TextEditor, AutoModifiedDecorator, BUFFER_BACKENDS, UndoMemoryPool
+from .xml_editor import XmlEditor
+from .xml_loader import load_xml
+from .xml_lazy import load_xml_lazy
 from .memento import WorkspaceMemento, WorkspaceCaretaker
 from .logger import Logger # 需要引入 Logger 类型做类型提示(可选)
+from .log_filter import is_log_header
+from .writer import StreamingWriter, DEFAULT_CHUNK_SIZE
+from .mmap_buffer import scan_line_index, scan_newline
 from pathlib import Path
 
+def _ask_save(filename: str) -> bool:
+    choice = input(f"File '{filename}' has unsaved changes. Save? (y/n): ").strip().lower()
+    return choice == 'y'
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
 class Workspace(Subject):
     def __init__(self):
         super().__init__()
-        self.editors: Dict[str, TextEditor] = {}
+        self.editors: Dict[str, Editor] = {}
         self.active_editor_name: Optional[str] = None
         self.caretaker = WorkspaceCaretaker()
+        # 新打开的编辑器默认使用的行缓冲区实现 (见 editor.BUFFER_BACKENDS)
+        self.default_backend = "list"
+        # 文件大小超过该阈值 (字节) 且未显式指定时，自动改用 rope 行存储
+        self.rope_threshold = 32 * 1024 * 1024
+        # 超过该阈值时改用 mmap 惰性加载，只建换行索引，不把整个文件读进内存
+        self.lazy_threshold = 512 * 1024 * 1024
+        # XML 文件超过该阈值时惰性加载：只建元素偏移表，子树按需解析
+        self.xml_lazy_threshold = 64 * 1024 * 1024
+        # 保存时按块流式写盘；atomic_save 为 True 时先写临时文件再重命名
+        self.writer = StreamingWriter()
+        self.save_chunk_size = DEFAULT_CHUNK_SIZE
+        self.atomic_save = True
+        # 增量保存：只写回自上次保存以来被修改的行 (行字节长度不变时原地覆盖，否则从第一处修改起重写)；
+        # 它会原地改写文件，只在关闭了原子保存时生效 (命令行 --no-atomic-save)
+        self.incremental_save = True
+        # save all 时并发写盘的线程数；parallel_save 为 False 时逐个保存
+        self.parallel_save = True
+        self.save_workers = 8
+        # 未保存文件的确认方式 (close/exit 时调用)，返回 True 表示保存；批处理模式可替换为固定策略
+        self.confirm_save: Callable[[str], bool] = _ask_save
+        # 所有编辑器共享的撤销历史内存预算 (单个编辑器另有 TextEditor.undo_budget)
+        self.undo_pool = UndoMemoryPool()
+        # 新打开的文本编辑器使用的连续输入合并窗口 (秒)，None 表示每条命令单独撤销
+        self.coalesce_window: Optional[float] = None
+        # 异步事件总线；为 None 时观察者在 notify 中同步调用
+        self.event_bus: Optional[EventBus] = None
+        # 各文件最近一次发给观察者的首行版本 (Editor.header_version)
+        self._header_versions: Dict[str, int] = {}
         # Logger 会在 main 中 attach，但为了获取 logger 状态，我们最好能反向访问，
         # 或者在 Subject 中保存 observers 列表。
         # 在 interfaces.py 的 Subject 中，我们有 self._observers。
@@ -22,66 +72,118 @@ class Workspace(Subject):
     # 为了节省篇幅，这里只列出修改过或新增的方法，其余请保留原样
     
     @property
-    def active_editor(self) -> Optional[TextEditor]:
+    def active_editor(self) -> Optional[Editor]:
         if self.active_editor_name and self.active_editor_name in self.editors:
             return self.editors[self.active_editor_name]
         return None
 
-    def load_file(self, filename: str):
-        # (保持原样)
+    def _choose_backend(self, filename: str) -> str:
+        """未指定行存储时的自动选择：超大文件惰性加载，大文件使用 rope，其余使用默认实现"""
+        try:
+            size = os.path.getsize(filename)
+            if size >= self.lazy_threshold:
+                return "lazy"
+            if size >= self.rope_threshold:
+                return "rope"
+        except OSError:
+            pass
+        return self.default_backend
+
+    def load_file(self, filename: str, backend_name: Optional[str] = None):
         if filename in self.editors:
             self.switch_editor(filename)
             return
-        content = []
+        if Path(filename).suffix == '.xml':
+            editor = self._load_xml(filename, backend_name)
+        else:
+            editor = self._load_text(filename, backend_name)
+        if editor is None:
+            return
+        self._open_editor(filename, editor, f"load {filename}")
+        print(f"Loaded {filename}")
+
+    def _load_text(self, filename: str, backend_name: Optional[str]) -> Optional[TextEditor]:
+        if backend_name is None:
+            backend_name = self._choose_backend(filename)
+        elif backend_name not in BUFFER_BACKENDS:
+            print(f"Error: Unknown buffer backend '{backend_name}'. Choose from: {', '.join(BUFFER_BACKENDS)}")
+            return None
+        backend = BUFFER_BACKENDS[backend_name]
+        content = backend()
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    content = [line.rstrip('\n') for line in f.readlines()]
-            except IOError as e:
+                content = backend.from_file(filename)
+            except (IOError, ValueError) as e:
                 print(f"Error loading file: {e}")
-                return
+                return None
         else:
             if Path(filename).suffix != '.txt':
                 print(f"Warning: {filename} is not a .txt file.Please check the file format.")
-                return 
+                return None
 
             print(f"New file created: {filename}")
-            
+
         editor = TextEditor(filename, content)
+        if os.path.exists(filename):
+            editor.final_newline = self._ends_with_newline(filename)
+            editor.newline = scan_newline(filename)
+            self._record_disk_state(editor, filename)
+        return editor
+
+    def _load_xml(self, filename: str, mode: Optional[str] = None) -> Optional[XmlEditor]:
+        """mode 为 lazy 时惰性加载；未指定时按文件大小自动选择"""
+        if mode not in (None, "lazy"):
+            print(f"Error: XML files can only be loaded with the 'lazy' backend, not '{mode}'.")
+            return None
+        if not os.path.exists(filename):
+            print(f"New file created: {filename}")
+            return XmlEditor.new(filename)
+        try:
+            if mode == "lazy" or os.path.getsize(filename) >= self.xml_lazy_threshold:
+                return load_xml_lazy(filename)
+            return load_xml(filename)
+        except (IOError, ValueError) as e:
+            print(f"Error loading file: {e}")
+            return None
+
+    def _open_editor(self, filename: str, editor: Editor, command_str: str):
+        """登记新打开的编辑器并设为活动文件，通知观察者 (首行为日志头时自动开启日志)"""
+        if editor.kind == "text":
+            editor.coalesce_window = self.coalesce_window
         editor = AutoModifiedDecorator(editor)
         self.editors[filename] = editor
+        self.undo_pool.register(editor)
         self.active_editor_name = filename
-        
-        if content and content[0].strip() == "# log":
+        self._publish_header(filename, editor)
+        if is_log_header(editor.first_line):
             self.notify("auto_log_enable", {"filename": filename})
-
-        self.notify("command", {"filename": filename, "command_str": f"load {filename}"})
-        print(f"Loaded {filename}")
+        self.notify("command", {"filename": filename, "command_str": command_str})
+        return editor
 
     def init_file(self, filename: str, with_log: bool = False):
-        # (保持原样)
         if filename in self.editors:
             print(f"Error: {filename} is already open.")
             return
-        if Path(filename).suffix != '.txt':
-            print(f"Warning: {filename} is not a .txt file.Please check the file format.")
+        suffix = Path(filename).suffix
+        if suffix == '.xml':
+            editor = XmlEditor.new(filename, with_log)
+        elif suffix == '.txt':
+            content = ["# log"] if with_log else []
+            editor = TextEditor(filename, content, backend=self.default_backend)
+        else:
+            print(f"Warning: {filename} is not a .txt or .xml file.Please check the file format.")
             return
-        content = ["# log"] if with_log else []
-        editor = TextEditor(filename, content)
-        editor = AutoModifiedDecorator(editor)
-        editor.is_modified = True 
-        self.editors[filename] = editor
-        self.active_editor_name = filename
-        if with_log:
-            self.notify("auto_log_enable", {"filename": filename})
-        self.notify("command", {"filename": filename, "command_str": f"init {filename}"})
+        editor = self._open_editor(filename, editor, f"init {filename}")
+        editor.is_modified = True
         print(f"Initialized {filename}")
 
     def save_file(self, filename: str = None):
-        # (保持原样)
         if filename == "all":
-            for name in self.editors:
-                self._write_to_disk(name)
+            if self.parallel_save:
+                self._save_all_parallel()
+            else:
+                for name in self.editors:
+                    self._write_to_disk(name)
             return
         target = filename if filename else self.active_editor_name
         if not target or target not in self.editors:
@@ -89,18 +191,193 @@ class Workspace(Subject):
             return
         self._write_to_disk(target)
 
+    def _save_all_parallel(self):
+        """
+        把已修改的编辑器交给线程池并发写盘，未修改的直接跳过。
+        工作线程只做磁盘 I/O；修改标记、观察者通知和输出都在主线程按打开顺序处理
+        """
+        pending = [name for name, editor in self.editors.items() if editor.in_transaction]
+        for name in pending:
+            print(f"  [skipped] {name}: transaction in progress")
+        targets = [name for name, editor in self.editors.items()
+                   if editor.is_modified and not editor.in_transaction]
+        skipped = len(self.editors) - len(targets) - len(pending)
+        if not targets:
+            print(f"Nothing to save ({skipped} unchanged).")
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(self.save_workers, len(targets)))) as pool:
+            futures = {name: pool.submit(self._save_editor, name) for name in targets}
+        saved = 0
+        print("Save all:")
+        for name in targets:
+            try:
+                written = futures[name].result()
+            except Exception as e:
+                # 单个文件的任何异常都只算该文件失败，其余文件照常收尾
+                print(f"  [failed] {name}: {e}")
+                continue
+            saved += 1
+            self.editors[name].is_modified = False
+            self.editors[name].break_coalescing()
+            self.notify("command", {"filename": name, "command_str": "save"})
+            print(f"  [saved]  {name} ({written} bytes written)")
+        self.event_barrier()
+        print(f"{saved} saved, {len(targets) - saved} failed, {skipped} unchanged.")
+
     def _write_to_disk(self, filename: str):
-        # (保持原样)
         editor = self.editors[filename]
+        if editor.in_transaction:
+            # 事务中的中间状态不落盘
+            print(f"Error: {filename} has a transaction in progress, commit or rollback first.")
+            return
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(editor.get_content_str())
+            written = self._save_editor(filename)
             editor.is_modified = False
+            editor.break_coalescing()
             self.notify("command", {"filename": filename, "command_str": "save"})
-            print(f"Saved {filename}")
+            self.event_barrier()
+            print(f"Saved {filename} ({written} bytes written)")
         except IOError as e:
             print(f"Error saving {filename}: {e}")
 
+    def _save_editor(self, filename: str) -> int:
+        """把编辑器内容写到磁盘并返回写入字节数；只做 I/O，可在工作线程中执行"""
+        editor = self.editors[filename]
+        if editor.kind == "xml":
+            # 未修改的子树直接输出序列化缓存
+            chunks = editor.iter_encoded(self.save_chunk_size)
+            if self._is_mapped_source(editor, filename):
+                return self._write_atomic(editor, filename, chunks)
+            if self.atomic_save:
+                return self.writer.write_atomic(filename, chunks)
+            return self.writer.write_direct(filename, chunks)
+        written = None
+        if self._incremental_enabled:
+            written = self._write_incremental(editor, filename)
+        if written is None:
+            written = self._write_full(editor, filename)
+        return written
+
+    def _write_full(self, editor: TextEditor, filename: str) -> int:
+        chunks = editor.lines.iter_encoded(self.save_chunk_size, editor.newline)
+        if editor.final_newline and len(editor.lines):
+            chunks = itertools.chain(chunks, [editor.newline.encode('utf-8')])
+        if self.atomic_save or self._is_mapped_source(editor, filename):
+            written = self._write_atomic(editor, filename, chunks)
+        else:
+            written = self.writer.write_direct(filename, chunks)
+        self._record_disk_state(editor, filename)
+        return written
+
+    def _write_incremental(self, editor: TextEditor, filename: str) -> Optional[int]:
+        """
+        利用编辑器记录的脏行做增量保存，返回写入的字节数；
+        无法增量保存时 (没有磁盘索引、文件被外部改动等) 返回 None，由调用方整体重写
+        """
+        index = editor.disk_index
+        if index is None or not os.path.exists(filename) or editor.disk_stat != self._disk_stat(filename):
+            return None
+        first = editor.dirty_from
+        if first is None:
+            return 0
+        lines = editor.lines
+        disk_lines = len(index) - 1
+        dirty = editor.dirty_lines
+        if dirty is not None and len(lines) == disk_lines:
+            # 行数未变：逐行比较编码后的长度，全部相同则原地覆盖
+            # (磁盘索引中的行包含换行符前的 '\r'，以换行结尾的行写回时带上它)
+            cr = editor.newline[:-1].encode('utf-8')
+            updates = []
+            for i in sorted(dirty):
+                data = lines[i].encode('utf-8')
+                if cr and (i + 1 < disk_lines or editor.final_newline):
+                    data += cr
+                if len(data) != index[i + 1] - 1 - index[i]:
+                    updates = None
+                    break
+                updates.append((index[i], data))
+            if updates is not None:
+                written = self.writer.write_in_place(filename, updates)
+                self._record_disk_state(editor, filename, index)
+                return written
+        if first > disk_lines or self._is_mapped_source(editor, filename):
+            # 惰性加载的未修改内容来自原文件映射，不能原地覆盖尾部
+            return None
+        written, new_index = self.writer.rewrite_tail(
+            filename, index, first, lines.iter_lines(first), self.save_chunk_size, editor.final_newline,
+            editor.newline)
+        self._record_disk_state(editor, filename, new_index)
+        return written
+
+    @property
+    def _incremental_enabled(self) -> bool:
+        # 增量保存原地改写文件，只在关闭了原子保存时使用，否则保存中途崩溃会留下写了一半的文件
+        return self.incremental_save and not self.atomic_save
+
+    @staticmethod
+    def _ends_with_newline(filename: str) -> bool:
+        with open(filename, 'rb') as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def _disk_stat(filename: str):
+        st = os.stat(filename)
+        return st.st_size, st.st_mtime_ns
+
+    def _record_disk_state(self, editor: TextEditor, filename: str, index=None):
+        """加载/保存后记录磁盘状态：清空脏行，更新行偏移索引与文件 stat"""
+        editor.clear_dirty()
+        editor.disk_stat = self._disk_stat(filename)
+        if not self._incremental_enabled:
+            # 用不上增量保存时不建行偏移索引 (否则每次加载/保存都要把文件重新扫描一遍)
+            editor.disk_index = None
+        elif index is not None:
+            editor.disk_index = index
+        elif self._is_mapped_source(editor, filename):
+            editor.disk_index = editor.lines.line_index
+        else:
+            editor.disk_index = scan_line_index(filename)
+
+    @staticmethod
+    def _mapping(editor: Editor):
+        """编辑器中映射原文件的部分：文本为行缓冲区，XML 为惰性模式的偏移表 (没有时为 None)"""
+        return editor.lines if editor.kind == "text" else editor.source
+
+    def _is_mapped_source(self, editor: Editor, filename: str) -> bool:
+        """编辑器内容是否仍映射着即将被覆盖的文件"""
+        source = getattr(self._mapping(editor), "source_path", None)
+        return source is not None and os.path.abspath(source) == os.path.abspath(filename)
+
+    def _write_atomic(self, editor: Editor, filename: str, chunks) -> int:
+        """
+        写临时文件再重命名覆盖，保存中途崩溃不会留下被截断的文件。
+        惰性加载的文件必须走这条路径：映射区域正是未修改内容的数据来源，不能原地截断重写
+        """
+        mapped = self._is_mapped_source(editor, filename)
+        tmp_name, written = self.writer.write_temp(filename, chunks)
+        try:
+            try:
+                self.writer.replace(tmp_name, filename)
+            except PermissionError:
+                if not mapped:
+                    raise
+                # Windows 下文件被映射时无法替换，先释放映射再试
+                self._mapping(editor).close()
+                try:
+                    self.writer.replace(tmp_name, filename)
+                except OSError:
+                    self._mapping(editor).reopen()
+                    raise
+        except OSError:
+            self.writer.discard(tmp_name)
+            raise
+        if mapped:
+            self._mapping(editor).remap(filename)
+        return written
+
     def switch_editor(self, filename: str):
         # (保持原样)
         if filename in self.editors:
@@ -119,6 +396,104 @@ class Workspace(Subject):
             status = "*" if editor.is_modified else ""
             print(f"{prefix} {name}{status}")
 
+    # --- 日志过滤头 ---
+    def _publish_header(self, filename: str, editor: Editor):
+        """把首行发给观察者 (日志过滤头在此重新编译)，并记下当前的首行版本"""
+        self._header_versions[filename] = editor.header_version
+        self._deliver("log_header", {"filename": filename, "header": editor.first_line})
+
+    def _sync_header(self, filename: str):
+        """首行自上次发布后被修改过时重新发布；未修改时只比较一个整数"""
+        editor = self.editors.get(filename)
+        if editor is not None and self._header_versions.get(filename) != editor.header_version:
+            self._publish_header(filename, editor)
+
+    # --- 事务 ---
+    def notify(self, event_type: str, data: dict):
+        """处于事务中的文件的命令通知推迟到提交时发出"""
+        editor = self.editors.get(data.get("filename"))
+        if event_type == "command" and editor is not None:
+            if editor.in_transaction:
+                editor.defer((event_type, data))
+                return
+            self._sync_header(data["filename"])
+        self._deliver(event_type, data)
+
+    # --- 事件投递 ---
+    def _deliver(self, event_type: str, data: dict):
+        """启用事件总线时只入队，由观察者各自的后台线程投递；否则同步调用"""
+        if self.event_bus is not None and not self.event_bus.closed:
+            self.event_bus.publish(self._observers, event_type, data)
+        else:
+            super().notify(event_type, data)
+
+    def detach(self, observer: Observer):
+        super().detach(observer)
+        if self.event_bus is not None:
+            self.event_bus.unsubscribe(observer)
+
+    def event_barrier(self):
+        """等待已发出的事件全部投递 (同步模式下立即返回)"""
+        if self.event_bus is not None:
+            self.event_bus.flush()
+
+    def report_events(self):
+        if self.event_bus is None:
+            print("Event bus disabled (observers are notified synchronously).")
+            return
+        print(f"  {'observer':<16}{'policy':<13}{'published':>10}{'queued':>8}{'delivered':>10}"
+              f"{'dropped':>9}{'coalesced':>10}{'failed':>8}")
+        for name, c in self.event_bus.stats().items():
+            print(f"  {name:<16}{c['policy']:<13}{c['published']:>10}{c['queued']:>8}{c['delivered']:>10}"
+                  f"{c['dropped']:>9}{c['coalesced']:>10}{c['failed']:>8}")
+
+    def begin_transaction(self, filename: str = None) -> bool:
+        target = filename if filename else self.active_editor_name
+        if not target or target not in self.editors:
+            print("Error: No file specified or file not open.")
+            return False
+        if not self.editors[target].begin():
+            return False
+        print(f"Transaction started on {target}")
+        return True
+
+    def commit_transaction(self, filename: str = None) -> bool:
+        target = filename if filename else self.active_editor_name
+        editor = self.editors.get(target)
+        if editor is None or not editor.in_transaction:
+            print("Error: No transaction in progress.")
+            return False
+        count = editor.transaction_size
+        deferred = editor.commit()
+        self._sync_header(target)
+        for event_type, data in deferred:
+            self._deliver(event_type, data)
+        print(f"Committed {count} command(s) on {target}")
+        return True
+
+    def rollback_transaction(self, filename: str = None) -> bool:
+        target = filename if filename else self.active_editor_name
+        editor = self.editors.get(target)
+        if editor is None or not editor.in_transaction:
+            print("Error: No transaction in progress.")
+            return False
+        count = editor.transaction_size
+        editor.rollback()
+        print(f"Rolled back {count} command(s) on {target}")
+        return True
+
+    def report_undo_memory(self):
+        """打印各编辑器撤销历史的条数与内存占用"""
+        if not self.editors:
+            print("No files open.")
+            return
+        for name, editor in self.editors.items():
+            prefix = ">" if name == self.active_editor_name else " "
+            print(f"{prefix} {name}: {editor.undo_depth} undo steps, {_format_bytes(editor.undo_memory)}")
+        budget = self.undo_pool.budget
+        limit = _format_bytes(budget) if budget is not None else "unlimited"
+        print(f"Total: {_format_bytes(self.undo_pool.used)} / {limit}")
+
     # === 以下是重点修改的部分 ===
 
     def close_file(self, filename: str = None):
@@ -131,10 +506,11 @@ class Workspace(Subject):
             return
 
         editor = self.editors[target]
+        if editor.in_transaction:
+            self.rollback_transaction(target)
         
         if editor.is_modified:
-            choice = input(f"File '{target}' has unsaved changes. Save? (y/n): ").strip().lower()
-            if choice == 'y':
+            if self.confirm_save(target):
                 self._write_to_disk(target)
             else:
                 # 用户选择不保存
@@ -146,9 +522,14 @@ class Workspace(Subject):
                     if self._observers:
                         logger = self._observers[0] 
                         if hasattr(logger, 'delete_log_file'):
+                            # 排队中的日志事件先投递完，避免删除后日志又被写出来
+                            self.event_barrier()
                             logger.delete_log_file(target)
         
         del self.editors[target]
+        self._header_versions.pop(target, None)
+        self.undo_pool.unregister(editor)
+        editor.close()
         self.notify("command", {"filename": target, "command_str": "close"})
         print(f"Closed {target}")
 
@@ -162,24 +543,36 @@ class Workspace(Subject):
         
         for filename in open_files:
             editor = self.editors[filename]
+            if editor.in_transaction:
+                self.rollback_transaction(filename)
             if editor.is_modified:
-                choice = input(f"File '{filename}' has unsaved changes. Save? (y/n): ").strip().lower()
-                if choice == 'y':
+                if self.confirm_save(filename):
                     self._write_to_disk(filename)
                 else:
                     if not os.path.exists(filename):
                         if self._observers:
                             logger = self._observers[0]
                             if hasattr(logger, 'delete_log_file'):
+                                self.event_barrier()
                                 logger.delete_log_file(filename)
              
+                        self.undo_pool.unregister(editor)
                         del self.editors[filename] 
+                        self._header_versions.pop(filename, None)
                         
                         if self.active_editor_name == filename:
                             self.active_editor_name = None
 
         self.save_state()
+        self.flush_observers()
         return True
+
+    def flush_observers(self):
+        """让事件总线和带缓冲的观察者 (如异步日志) 把积压的内容处理完"""
+        self.event_barrier()
+        for observer in self._observers:
+            if hasattr(observer, 'flush'):
+                observer.flush()
     
 
 
@@ -299,6 +692,8 @@ class Workspace(Subject):
     #         print("Warning: Failed to restore workspace state.")
     def save_state(self):
         """保存当前工作区状态（公开接口）"""
+        # 日志开关等观察者状态要等排队的事件处理完才准确
+        self.event_barrier()
         memento = self.create_memento()
         self.caretaker.save(memento)
     
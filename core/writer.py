@@ -0,0 +1,167 @@
+"""流式保存：按固定大小的字节块写盘，可选 "写临时文件 + 重命名" 的原子模式"""
+import os
+import tempfile
+from array import array
+from typing import Iterable, Iterator, Tuple
+
+# 每次写入磁盘的目标块大小 (字节)
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_line_chunks(lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     leading_newline: bool = False, newline: str = "\n") -> Iterator[bytes]:
+    """
+    把行流按 newline 连接并编码为 UTF-8，攒够 chunk_size 字节输出一块
+    任何时刻只持有一个块，峰值内存与文件大小无关
+    leading_newline: 在第一行之前也加一个换行 (用于拼接在已有内容之后)
+    """
+    pending = []
+    size = 0
+    need_sep = leading_newline
+    sep = newline.encode('utf-8')
+    for line in lines:
+        if need_sep:
+            pending.append(sep)
+            size += len(sep)
+        need_sep = True
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield b"".join(pending)
+
+
+class StreamingWriter:
+    """把字节块序列写入文件，返回写入的字节数"""
+
+    def __init__(self, fsync: bool = True):
+        self.fsync = fsync
+
+    def write_direct(self, path: str, chunks: Iterable[bytes]) -> int:
+        """直接覆盖目标文件 (中途失败会留下不完整的文件)"""
+        with open(path, 'wb') as f:
+            return self._write_chunks(f, chunks)
+
+    def write_temp(self, path: str, chunks: Iterable[bytes]):
+        """
+        写入与目标同目录的临时文件并落盘，返回 (临时文件名, 字节数)
+        同目录保证随后的 os.replace 是同一文件系统内的原子重命名
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                written = self._write_chunks(f, chunks)
+            if os.path.exists(path):
+                # 保留原文件的权限位
+                os.chmod(tmp_name, os.stat(path).st_mode & 0o7777)
+        except BaseException:
+            self.discard(tmp_name)
+            raise
+        return tmp_name, written
+
+    @staticmethod
+    def replace(tmp_name: str, path: str):
+        os.replace(tmp_name, path)
+
+    @staticmethod
+    def discard(tmp_name: str):
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+
+    def write_atomic(self, path: str, chunks: Iterable[bytes]) -> int:
+        """先完整写入临时文件，再重命名覆盖目标；崩溃时原文件保持不变"""
+        tmp_name, written = self.write_temp(path, chunks)
+        try:
+            self.replace(tmp_name, path)
+        except BaseException:
+            self.discard(tmp_name)
+            raise
+        return written
+
+    def _write_chunks(self, f, chunks: Iterable[bytes]) -> int:
+        written = 0
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+        if self.fsync:
+            f.flush()
+            os.fsync(f.fileno())
+        return written
+
+    def write_in_place(self, path: str, updates: Iterable[Tuple[int, bytes]]) -> int:
+        """
+        把若干 (偏移, 字节) 原地写回文件，要求每段长度与磁盘上原内容相同
+        用于只有行内修改且行的字节长度不变的增量保存
+        """
+        written = 0
+        with open(path, 'r+b') as f:
+            for offset, data in updates:
+                f.seek(offset)
+                f.write(data)
+                written += len(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return written
+
+    def rewrite_tail(self, path: str, starts: array, first: int, lines: Iterable[str],
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, final_newline: bool = False, newline: str = "\n"):
+        """
+        从第 first 行 (0-based) 开始重写文件并截断，之前的字节保持不动
+        starts 为磁盘文件的行偏移索引 (见 mmap_buffer.build_line_index)，
+        lines 为从第 first 行开始的新内容，各行之间用 newline 连接；final_newline 为 True 时文件以换行结尾
+        返回 (写入字节数, 新的行偏移索引)
+        """
+        new_starts = starts[:first]
+        # 从第 first 行之前的 "\n" 处开始写 (第 0 行则从文件头开始)；
+        # 它前面的 "\r" 属于未改动的上一行，原样保留，所以第一个分隔符只写 "\n"
+        # (上一行是原文件没有换行符的最后一行时，pos 就是文件末尾，写完整的分隔符)
+        pos = starts[first] - 1 if first > 0 else 0
+        written = 0
+        sep = newline.encode('utf-8')
+        with open(path, 'r+b') as f:
+            next_sep = b"\n" if pos < f.seek(0, os.SEEK_END) else sep
+            f.seek(pos)
+            pending = []
+            size = 0
+            need_sep = first > 0
+            for line in lines:
+                if need_sep:
+                    pending.append(next_sep)
+                    size += len(next_sep)
+                    pos += len(next_sep)
+                need_sep = True
+                next_sep = sep
+                new_starts.append(pos)
+                data = line.encode('utf-8')
+                pending.append(data)
+                size += len(data)
+                pos += len(data)
+                if size >= chunk_size:
+                    f.write(b"".join(pending))
+                    written += size
+                    pending = []
+                    size = 0
+            # 文件非空时按原文件的格式补上结尾换行 (与整体保存一致)
+            ends_with_newline = final_newline and need_sep
+            if ends_with_newline:
+                pending.append(next_sep)
+                size += len(next_sep)
+                pos += len(next_sep)
+            if pending:
+                f.write(b"".join(pending))
+                written += size
+            f.truncate(pos)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # 以换行结尾时最后一个偏移就是文件大小，否则补上最后一行的哨兵
+        new_starts.append(pos if ends_with_newline else pos + 1)
+        return written, new_starts
@@ -0,0 +1,183 @@
+import sys
+from typing import TYPE_CHECKING, Optional
+from .interfaces import Command
+from .xml_editor import XmlElement, is_valid_name, subtree_memory
+
+if TYPE_CHECKING:
+    from .xml_editor import XmlEditor
+
+
+def _check_new_element(editor: 'XmlEditor', tag: str, new_id: str) -> bool:
+    if not is_valid_name(tag):
+        print(f"Error: 非法的标签名: {tag}")
+        return False
+    if editor.has_id(new_id):
+        print(f"Error: 元素ID已存在: {new_id}")
+        return False
+    return True
+
+
+class InsertBeforeCommand(Command):
+    """
+    功能: 在目标元素前 (同级) 插入新元素
+    命令: insert-before <tagName> <newId> <targetId> ["text"]
+    """
+    def __init__(self, editor: 'XmlEditor', tag: str, new_id: str, target_id: str, text: Optional[str] = None):
+        self.editor = editor
+        self.tag = tag
+        self.new_id = new_id
+        self.target_id = target_id
+        self.text = text or None
+        self.node: Optional[XmlElement] = None
+
+    def execute(self) -> bool:
+        editor = self.editor
+        if not _check_new_element(editor, self.tag, self.new_id):
+            return False
+        target = editor.find(self.target_id)
+        if target is None:
+            print(f"Error: 目标元素不存在: {self.target_id}")
+            return False
+        if target is editor.root:
+            print("Error: 不能在根元素前插入元素")
+            return False
+        if self.node is None:
+            self.node = XmlElement(self.tag, {"id": self.new_id}, self.text)
+        editor.attach(self.node, target.parent, target.parent.children.index(target))
+        return True
+
+    def undo(self):
+        if self.node is not None and self.node.parent is not None:
+            self.editor.detach(self.node)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + subtree_memory(self.node) if self.node else sys.getsizeof(self)
+
+
+class AppendChildCommand(Command):
+    """
+    功能: 在父元素内追加子元素 (作为最后一个子元素)
+    命令: append-child <tagName> <newId> <parentId> ["text"]
+    """
+    def __init__(self, editor: 'XmlEditor', tag: str, new_id: str, parent_id: str, text: Optional[str] = None):
+        self.editor = editor
+        self.tag = tag
+        self.new_id = new_id
+        self.parent_id = parent_id
+        self.text = text or None
+        self.node: Optional[XmlElement] = None
+
+    def execute(self) -> bool:
+        editor = self.editor
+        if not _check_new_element(editor, self.tag, self.new_id):
+            return False
+        parent = editor.find(self.parent_id)
+        if parent is None:
+            print(f"Error: 父元素不存在: {self.parent_id}")
+            return False
+        if self.node is None:
+            self.node = XmlElement(self.tag, {"id": self.new_id}, self.text)
+        editor.attach(self.node, parent)
+        return True
+
+    def undo(self):
+        if self.node is not None and self.node.parent is not None:
+            self.editor.detach(self.node)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + subtree_memory(self.node) if self.node else sys.getsizeof(self)
+
+
+class EditIdCommand(Command):
+    """
+    功能: 修改元素 ID
+    命令: edit-id <oldId> <newId>
+    """
+    def __init__(self, editor: 'XmlEditor', old_id: str, new_id: str):
+        self.editor = editor
+        self.old_id = old_id
+        self.new_id = new_id
+
+    def execute(self) -> bool:
+        editor = self.editor
+        node = editor.find(self.old_id)
+        if node is None:
+            print(f"Error: 元素不存在: {self.old_id}")
+            return False
+        if node is editor.root:
+            print("Error: 不建议修改根元素ID")
+            return False
+        if editor.has_id(self.new_id):
+            print(f"Error: 目标ID已存在: {self.new_id}")
+            return False
+        editor.set_id(node, self.new_id)
+        return True
+
+    def undo(self):
+        node = self.editor.find(self.new_id)
+        if node is not None:
+            self.editor.set_id(node, self.old_id)
+
+
+class EditTextCommand(Command):
+    """
+    功能: 修改元素文本，省略或为空时清空
+    命令: edit-text <elementId> ["text"]
+    """
+    def __init__(self, editor: 'XmlEditor', element_id: str, text: Optional[str] = None):
+        self.editor = editor
+        self.element_id = element_id
+        self.text = text or None
+        self.node: Optional[XmlElement] = None
+        self.old_text: Optional[str] = None
+
+    def execute(self) -> bool:
+        node = self.editor.find(self.element_id)
+        if node is None:
+            print(f"Error: 元素不存在: {self.element_id}")
+            return False
+        self.node = node
+        self.old_text = node.text
+        self.editor.set_text(node, self.text)
+        return True
+
+    def undo(self):
+        if self.node is not None:
+            self.editor.set_text(self.node, self.old_text)
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.text or "") + sys.getsizeof(self.old_text or "")
+
+
+class DeleteElementCommand(Command):
+    """
+    功能: 删除元素及其所有子元素
+    命令: delete <elementId>
+    """
+    def __init__(self, editor: 'XmlEditor', element_id: str):
+        self.editor = editor
+        self.element_id = element_id
+        self.node: Optional[XmlElement] = None
+        self.parent: Optional[XmlElement] = None
+        self.position = -1
+
+    def execute(self) -> bool:
+        editor = self.editor
+        node = editor.find(self.element_id)
+        if node is None:
+            print(f"Error: 元素不存在: {self.element_id}")
+            return False
+        if node is editor.root:
+            print("Error: 不能删除根元素")
+            return False
+        self.node, self.parent = node, node.parent
+        self.position = editor.detach(node)
+        return True
+
+    def undo(self):
+        if self.node is not None and self.node.parent is None:
+            self.editor.attach(self.node, self.parent, self.position)
+
+    def memory_size(self) -> int:
+        # 被删除的子树由撤销记录持有
+        return sys.getsizeof(self) + subtree_memory(self.node) if self.node else sys.getsizeof(self)
@@ -0,0 +1,414 @@
+"""
+XML 编辑器
+文档解析为 XmlElement 树 (组合模式)，并维护 id -> 元素 的索引，所有编辑命令都通过 XmlEditor
+提供的少数几个原语修改树，索引随之同步更新。
+每个子树缓存自己序列化后的文本；编辑只让被修改的元素及其祖先的缓存失效，
+保存时未修改的子树直接输出缓存，只重新序列化被修改过的部分。
+惰性模式 (source 不为 None) 下树中只有被访问过的元素，其余子树由 xml_lazy.LazyXmlSource 按偏移表按需解析。
+"""
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .editor import Editor
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+INDENT = "    "
+# 只缓存序列化后不超过该长度 (字符) 的子树，更大的子树每次保存时由缓存的子节点拼出，
+# 避免同一段文本在每一层祖先的缓存里各存一份
+CACHE_MAX_CHARS = 64 * 1024
+
+_NAME = re.compile(r"[A-Za-z_][\w.\-]*")
+
+
+def is_valid_name(name: str) -> bool:
+    """标签名是否合法 (简化的 XML Name)"""
+    return _NAME.fullmatch(name) is not None
+
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attr(value: str) -> str:
+    return _escape_text(value).replace('"', "&quot;")
+
+
+class XmlElement:
+    """
+    XML 元素节点；属性按原文顺序保存，id 也是属性之一
+    注释与处理指令不作为节点，按原文 (如 "<!-- x -->") 挂在相邻的元素上：
+    lead 为紧接在本元素之前的 (根元素则为 XML 声明之后的)，trail 为最后一个子元素之后、结束标签之前的
+    """
+    __slots__ = ("tag", "attrs", "text", "children", "parent", "lead", "trail", "_cache", "_cache_depth",
+                 "_lazy")
+
+    def __init__(self, tag: str, attrs: Optional[Dict[str, str]] = None, text: Optional[str] = None):
+        self.tag = tag
+        self.attrs: Dict[str, str] = attrs if attrs is not None else {}
+        self.text = text
+        self.children: List["XmlElement"] = []
+        self.parent: Optional["XmlElement"] = None
+        self.lead: Optional[List[str]] = None
+        self.trail: Optional[List[str]] = None
+        self._cache: Optional[str] = None
+        self._cache_depth = -1
+        # 惰性模式下子元素尚未解析时为它在原文件中的元素编号，否则为 -1 (此时 trail 尚未确定，原样拷贝中已包含)
+        self._lazy = -1
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.attrs.get("id")
+
+    def __repr__(self):
+        return f"<XmlElement {self.tag} id={self.id!r}>"
+
+    def invalidate(self):
+        """本元素的内容变了：丢弃它和所有祖先的序列化缓存"""
+        node = self
+        # 有缓存的子树其后代都有缓存，因此遇到没有缓存的祖先即可停止
+        while node is not None and node._cache is not None:
+            node._cache = None
+            node = node.parent
+
+    def iter_subtree(self) -> Iterator["XmlElement"]:
+        """先序遍历子树 (非递归)"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def depth(self) -> int:
+        depth, node = 0, self.parent
+        while node is not None:
+            depth += 1
+            node = node.parent
+        return depth
+
+    def label(self) -> str:
+        """xml-tree / xml-find 中显示的形式: tag [name="value", ...]"""
+        if not self.attrs:
+            return self.tag
+        attrs = ", ".join(f'{name}="{value}"' for name, value in self.attrs.items())
+        return f"{self.tag} [{attrs}]"
+
+    def start_tag(self) -> str:
+        attrs = "".join(f' {name}="{_escape_attr(value)}"' for name, value in self.attrs.items())
+        return f"<{self.tag}{attrs}>"
+
+
+def _misc_lines(items: Optional[List[str]], level: int) -> str:
+    if not items:
+        return ""
+    return "".join(f"{INDENT * level}{item}\n" for item in items)
+
+
+def iter_serialized(root: XmlElement, depth: int = 0, source=None) -> Iterator[str]:
+    """
+    按行缩进序列化子树，产出字符串块 (非递归)
+    不超过 CACHE_MAX_CHARS 的子树序列化后写回缓存，下次直接复用；
+    已输出的内容只要不属于可能被缓存的未闭合子树就及时产出，峰值内存与文档大小无关
+    惰性模式下未展开的子树从 source 原样拷贝原文件中的内容
+    注释与处理指令各占一行，与所在位置的元素同样缩进
+    """
+    out: List[str] = []
+    base = 0            # out[0] 在所有片段中的序号
+    total = 0           # 已生成的字符数
+    # 未闭合的元素: [节点, 深度, 起始片段序号, 起始字符数, 仍可缓存]
+    frames: List[list] = []
+    stack: List[Tuple[Optional[XmlElement], int]] = [(root, depth)]
+    while stack:
+        node, level = stack.pop()
+        if node is None:
+            frame = frames.pop()
+            node, level = frame[0], frame[1]
+            piece = f"{_misc_lines(node.trail, level + 1)}{INDENT * level}</{node.tag}>\n"
+            out.append(piece)
+            total += len(piece)
+            if frame[4] and total - frame[3] <= CACHE_MAX_CHARS:
+                i = frame[2] - base
+                text = "".join(out[i:])
+                del out[i:]
+                out.append(text)
+                node._cache, node._cache_depth = text, level
+        elif node._cache is not None and node._cache_depth == level:
+            out.append(node._cache)
+            total += len(node._cache)
+        elif node._lazy >= 0:
+            size = source.raw_size(node._lazy)
+            if size <= CACHE_MAX_CHARS:
+                text = f"{_misc_lines(node.lead, level)}{INDENT * level}{source.raw_text(node._lazy)}\n"
+                node._cache, node._cache_depth = text, level
+                out.append(text)
+                total += len(text)
+            else:
+                # 大子树边读边输出，包含它的祖先都不再缓存
+                for frame in frames:
+                    frame[4] = False
+                if out:
+                    yield "".join(out)
+                    base += len(out)
+                    out = []
+                yield _misc_lines(node.lead, level) + INDENT * level
+                yield from source.iter_raw_text(node._lazy)
+                yield "\n"
+                total += size
+        elif not node.children and not node.trail:
+            text = (f"{_misc_lines(node.lead, level)}{INDENT * level}{node.start_tag()}"
+                    f"{_escape_text(node.text or '')}</{node.tag}>\n")
+            if len(text) <= CACHE_MAX_CHARS:
+                node._cache, node._cache_depth = text, level
+            out.append(text)
+            total += len(text)
+        else:
+            frames.append([node, level, base + len(out), total, True])
+            piece = f"{_misc_lines(node.lead, level)}{INDENT * level}{node.start_tag()}\n"
+            if node.text:
+                piece += f"{INDENT * (level + 1)}{_escape_text(node.text)}\n"
+            out.append(piece)
+            total += len(piece)
+            stack.append((None, level))
+            stack.extend((child, level + 1) for child in reversed(node.children))
+        if len(out) > 256:
+            # 找到最外层仍可能被缓存的未闭合元素，它之前的内容可以产出
+            pin = len(out)
+            for frame in frames:
+                if frame[4] and total - frame[3] > CACHE_MAX_CHARS:
+                    frame[4] = False
+                if frame[4]:
+                    pin = frame[2] - base
+                    break
+            if pin >= 128:
+                yield "".join(out[:pin])
+                del out[:pin]
+                base += pin
+    if out:
+        yield "".join(out)
+
+
+class XmlEditor(Editor):
+    """XML 文档编辑器：元素树 + id 索引，撤销/重做与事务沿用 Editor"""
+    kind = "xml"
+
+    def __init__(self, filename: str, root: XmlElement, declaration: str = XML_DECLARATION,
+                 log_header: Optional[str] = None, epilogue: Optional[List[str]] = None):
+        super().__init__(filename)
+        # XML 命令不存在 "连续输入"，不做合并
+        self.coalesce_window = None
+        self.root = root
+        self.declaration = declaration
+        # 文件首行的 "# log ..." 注释 (不属于 XML 内容，保存时原样写回)
+        self.log_header = log_header
+        # 根元素之后的注释与处理指令
+        self.epilogue: List[str] = epilogue or []
+        self.index: Dict[str, XmlElement] = {}
+        # 二级索引 (供 xml-find 使用)：标签名 -> 元素集合，属性名 -> 属性值 -> 元素集合 (id 属性直接查 index)
+        self.tag_index: Dict[str, Set[XmlElement]] = {}
+        self.attr_index: Dict[str, Dict[str, Set[XmlElement]]] = {}
+        # 惰性模式下原文件的偏移表 (xml_lazy.LazyXmlSource)
+        self.source = None
+        for node in root.iter_subtree():
+            self._index_node(node)
+
+    @classmethod
+    def new(cls, filename: str, with_log: bool = False) -> "XmlEditor":
+        """init 创建的空文档：只有 id 为 root 的根元素"""
+        return cls(filename, XmlElement("root", {"id": "root"}), log_header="# log" if with_log else None)
+
+    @property
+    def first_line(self) -> Optional[str]:
+        return self.log_header if self.log_header is not None else self.declaration
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+
+    # --- 查找 ---
+    def find(self, element_id: str) -> Optional[XmlElement]:
+        """按 id 查找元素；惰性模式下会解析出从已加载的祖先到该元素的路径，并展开元素本身的子元素"""
+        node = self.index.get(element_id)
+        if node is None and self.source is not None:
+            node = self.source.resolve(element_id, self)
+        if node is not None and node._lazy >= 0:
+            self.expand(node)
+        return node
+
+    def has_id(self, element_id: str) -> bool:
+        """id 是否存在 (不触发惰性解析)"""
+        if element_id in self.index:
+            return True
+        return self.source is not None and self.source.locate(element_id) is not None
+
+    def __contains__(self, element_id: str) -> bool:
+        return self.has_id(element_id)
+
+    def expand(self, node: XmlElement):
+        """惰性模式：解析 node 的直接子元素 (孙元素仍保持未展开)"""
+        # 展开后按规范格式输出，原样拷贝的缓存不再适用
+        node.invalidate()
+        children = self.source.children(node._lazy)
+        # 未展开时 trail 暂存的是开始标签与第一个子元素之间的注释
+        if children:
+            children[0].lead = node.trail
+        node.trail = self.source.closing_misc(node._lazy)
+        node._lazy = -1
+        for child in children:
+            child.parent = node
+            node.children.append(child)
+            self._index_node(child)
+
+    def _index_node(self, node: XmlElement):
+        element_id = node.id
+        if element_id is not None:
+            self.index[element_id] = node
+        self.tag_index.setdefault(node.tag, set()).add(node)
+        for name, value in node.attrs.items():
+            if name != "id":
+                self._index_attr(node, name, value)
+
+    def _unindex_node(self, node: XmlElement):
+        if node.id is not None and self.index.get(node.id) is node:
+            del self.index[node.id]
+        self.tag_index[node.tag].discard(node)
+        for name, value in node.attrs.items():
+            if name != "id":
+                self._unindex_attr(node, name, value)
+
+    def _index_attr(self, node: XmlElement, name: str, value: str):
+        self.attr_index.setdefault(name, {}).setdefault(value, set()).add(node)
+
+    def _unindex_attr(self, node: XmlElement, name: str, value: str):
+        values = self.attr_index[name]
+        values[value].discard(node)
+        if not values[value]:
+            # 属性值种类可能很多 (例如 id)，空集合及时删除
+            del values[value]
+
+    # --- 编辑原语 (命令只通过这些方法修改树，保证索引与缓存同步) ---
+    def attach(self, node: XmlElement, parent: XmlElement, position: Optional[int] = None):
+        """把 node (可以带子树) 挂到 parent 的 position 处，默认追加到末尾"""
+        if position is None:
+            parent.children.append(node)
+        else:
+            parent.children.insert(position, node)
+        node.parent = parent
+        for n in node.iter_subtree():
+            self._index_node(n)
+        parent.invalidate()
+
+    def detach(self, node: XmlElement) -> int:
+        """把 node 连同子树从树上摘下，返回它原来的位置"""
+        parent = node.parent
+        position = parent.children.index(node)
+        del parent.children[position]
+        node.parent = None
+        for n in node.iter_subtree():
+            self._unindex_node(n)
+        parent.invalidate()
+        return position
+
+    def set_id(self, node: XmlElement, new_id: str):
+        del self.index[node.id]
+        node.attrs["id"] = new_id
+        self.index[new_id] = node
+        node.invalidate()
+
+    def set_text(self, node: XmlElement, text: Optional[str]):
+        node.text = text
+        node.invalidate()
+
+    def load_tag(self, tag: Optional[str]):
+        """
+        惰性模式下先解析出所有可能匹配的元素，使二级索引完整：
+        给定标签时按偏移表只解析该标签的元素，否则展开整个文档
+        """
+        if self.source is None:
+            return
+        if tag is not None:
+            self.source.resolve_tag(tag, self)
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node._lazy >= 0:
+                self.expand(node)
+            stack.extend(node.children)
+
+    def child_count(self, node: XmlElement) -> int:
+        """子元素个数 (惰性模式下未展开的元素按偏移表计数，不触发解析)"""
+        if node._lazy >= 0:
+            return self.source.child_count(node._lazy)
+        return len(node.children)
+
+    # --- 树形显示 ---
+    def iter_tree(self, root: Optional[XmlElement] = None, max_depth: Optional[int] = None,
+                  limit: Optional[int] = None) -> Iterator[str]:
+        """
+        xml-tree 的输出行 (非递归)：root 为第 0 层，max_depth 限制向下显示的层数，limit 限制显示的元素个数
+        惰性模式下只展开实际显示到的元素
+        """
+        root = root or self.root
+        yield root.label()
+        shown = 1
+        # 待输出的条目: (元素或文本行, 前缀, 是否为最后一项, 层数)
+        stack: List[tuple] = []
+        self._push_tree_entries(root, "", 0, max_depth, stack)
+        while stack:
+            item, prefix, last, depth = stack.pop()
+            connector = "└── " if last else "├── "
+            if not isinstance(item, XmlElement):
+                yield f"{prefix}{connector}{item}"
+                continue
+            if limit is not None and shown >= limit:
+                yield f"{prefix}{connector}... (stopped after {limit} elements)"
+                return
+            yield f"{prefix}{connector}{item.label()}"
+            shown += 1
+            self._push_tree_entries(item, prefix + ("    " if last else "│   "), depth, max_depth, stack)
+
+    def _push_tree_entries(self, node: XmlElement, prefix: str, depth: int, max_depth: Optional[int],
+                           stack: List[tuple]):
+        entries: list = [f'"{node.text}"'] if node.text else []
+        if max_depth is not None and depth >= max_depth:
+            hidden = self.child_count(node)
+            if hidden:
+                entries.append(f"... ({hidden} child element{'s' if hidden > 1 else ''})")
+        else:
+            if node._lazy >= 0:
+                self.expand(node)
+            entries.extend(node.children)
+        for i in range(len(entries) - 1, -1, -1):
+            stack.append((entries[i], prefix, i == len(entries) - 1, depth + 1))
+
+    # --- 序列化 ---
+    def iter_text(self) -> Iterator[str]:
+        if self.log_header is not None:
+            yield self.log_header + "\n"
+        yield self.declaration + "\n"
+        yield from iter_serialized(self.root, source=self.source)
+        yield _misc_lines(self.epilogue, 0)
+
+    def iter_encoded(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """编码为 UTF-8，攒够 chunk_size 字节输出一块 (供 StreamingWriter 写盘)"""
+        pending, size = [], 0
+        for chunk in self.iter_text():
+            data = chunk.encode("utf-8")
+            pending.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                yield b"".join(pending)
+                pending, size = [], 0
+        if pending:
+            yield b"".join(pending)
+
+    def get_content_str(self) -> str:
+        return "".join(self.iter_text())
+
+
+def subtree_memory(node: XmlElement) -> int:
+    """子树占用内存的估计 (字节)，用于撤销内存预算"""
+    size = 0
+    for n in node.iter_subtree():
+        size += sys.getsizeof(n) + sys.getsizeof(n.attrs) + sys.getsizeof(n.text or "")
+    return size
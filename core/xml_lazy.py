@@ -0,0 +1,284 @@
+"""
+惰性加载的 XML 文档
+加载时只扫描一遍原文件，记录每个元素的起止字节偏移、父元素与最后一个后代 (先序编号)，以及 id -> 编号；
+元素树中起初只有根元素。命令按 id 访问元素时才解析从已加载的祖先到该元素路径上的元素，
+每次只展开一层 (子元素的开始标签与文本)。保存时未展开的子树按字节区间从原文件原样拷贝。
+元素之间的注释与处理指令在展开时从相邻元素之间的字节中取出，与完整加载时挂在同样的位置。
+"""
+import codecs
+import mmap
+import os
+import re
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from .xml_editor import XmlEditor, XmlElement
+from .xml_loader import _TreeBuilder, parse_fragment, parse_stream, pi_markup
+
+# 拷贝未展开子树时每次读取的字节数
+_RAW_CHUNK = 1024 * 1024
+_TAG = re.compile(rb"<([^\s/>]+)")
+# 元素之间的字节中可能出现的标记：CDATA 段 (跳过，其中的 "<!--" 不是注释)、注释、处理指令
+_MISC = re.compile(rb"<!\[CDATA\[.*?\]\]>|<!--(.*?)-->|<\?([^\s?]+)\s*(.*?)\?>", re.S)
+
+
+def _misc_in(data: bytes) -> Optional[List[str]]:
+    """取出一段元素之间的字节中的注释与处理指令 (XML 声明除外)，没有时返回 None"""
+    result = []
+    for match in _MISC.finditer(data):
+        comment, target, pi_data = match.groups()
+        if comment is not None:
+            result.append(f"<!--{comment.decode('utf-8')}-->")
+        elif target is not None and target != b"xml":
+            result.append(pi_markup(target.decode("utf-8"), pi_data.decode("utf-8")))
+    return result or None
+
+
+class _OffsetScanner(_TreeBuilder):
+    """扫描阶段的 expat 回调：不建节点，只记录偏移表"""
+
+    def __init__(self, parser, line_offset: int = 0, base: int = 0):
+        super().__init__(parser, line_offset, base)
+        self.base = base
+        self.ids: Dict[str, int] = {}
+        self.starts = array("q")
+        self.ends = array("q")
+        self.parents = array("i")
+        self.lasts = array("i")
+        # 标签名 -> 该标签的元素编号 (供 xml-find 按标签找到尚未解析的元素)
+        self.by_tag: Dict[str, array] = {}
+        self.open: List[int] = []
+        # 刚结束、还不知道结束标签在哪里收尾的元素：下一个事件的位置就是它的结束偏移
+        self.pending = -1
+
+    def install(self):
+        parser = self.parser
+        parser.XmlDeclHandler = self.xml_decl
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        # 没有设置字符数据处理函数时，文本、注释等其余内容都交给 DefaultHandlerExpand
+        parser.DefaultHandlerExpand = self.mark
+
+    def mark(self, *args):
+        if self.pending >= 0:
+            self.ends[self.pending] = self.parser.CurrentByteIndex + self.base
+            self.pending = -1
+
+    def start(self, tag, attributes):
+        self.mark()
+        names = attributes[::2]
+        element_id = attributes[2 * names.index("id") + 1] if "id" in names else None
+        self.check_id(tag, element_id)
+        k = len(self.starts)
+        self.ids[element_id] = k
+        self.starts.append(self.parser.CurrentByteIndex + self.base)
+        self.ends.append(0)
+        self.parents.append(self.open[-1] if self.open else -1)
+        self.lasts.append(k)
+        numbers = self.by_tag.get(tag)
+        if numbers is None:
+            numbers = self.by_tag[tag] = array("i")
+        numbers.append(k)
+        self.open.append(k)
+
+    def end(self, tag):
+        self.mark()
+        k = self.open.pop()
+        self.lasts[k] = len(self.starts) - 1
+        self.pending = k
+
+
+class LazyXmlSource:
+    """
+    原文件的元素偏移表
+    元素按先序编号，编号 k 的子树即 [k, lasts[k]]；nodes 记录已经物化为 XmlElement 的元素
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+        self._mm = None
+        self.nodes: Dict[int, XmlElement] = {}
+        self._scan(path)
+
+    def _scan(self, path: str):
+        with open(path, "rb") as f:
+            scanner, self.log_header = parse_stream(f, _OffsetScanner)
+        if scanner.pending >= 0:
+            scanner.ends[scanner.pending] = os.path.getsize(path)
+        self.declaration = scanner.declaration
+        self.ids = scanner.ids
+        self.starts, self.ends = scanner.starts, scanner.ends
+        self.parents, self.lasts = scanner.parents, scanner.lasts
+        self.by_tag = scanner.by_tag
+        self.base = scanner.base
+        self._path = path
+        self.reopen()
+
+    def close(self):
+        """释放映射 (关闭编辑器或覆盖原文件前调用)"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reopen(self):
+        self._file = open(self._path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def source_path(self) -> Optional[str]:
+        return self._path if self._mm is not None else None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    # --- 物化 ---
+    def element(self, k: int) -> XmlElement:
+        """解析编号 k 的元素本身 (标签、属性、文本)；有子元素时处于未展开状态"""
+        if self.lasts[k] > k:
+            # 开始标签和文本截止到第一个子元素，补上结束标签后解析
+            head = self._mm[self.starts[k]:self.starts[k + 1]]
+            node = parse_fragment(head + b"</" + _TAG.match(head).group(1) + b">")
+            node._lazy = k
+        else:
+            node = parse_fragment(self._mm[self.starts[k]:self.ends[k]])
+        self.nodes[k] = node
+        return node
+
+    def children(self, k: int) -> List[XmlElement]:
+        """编号 k 的子元素；除第一个外，lead 取自与前一个兄弟元素之间的字节"""
+        result = []
+        child, last = k + 1, self.lasts[k]
+        while child <= last:
+            node = self.element(child)
+            if result:
+                node.lead = _misc_in(self._mm[self.ends[prev]:self.starts[child]])
+            result.append(node)
+            prev = child
+            child = self.lasts[child] + 1
+        return result
+
+    def closing_misc(self, k: int) -> Optional[List[str]]:
+        """编号 k 的最后一个子元素之后、结束标签之前的注释与处理指令 (k 有子元素时)"""
+        child, last, prev = k + 1, self.lasts[k], -1
+        while child <= last:
+            prev = child
+            child = self.lasts[child] + 1
+        return None if prev < 0 else _misc_in(self._mm[self.ends[prev]:self.ends[k]])
+
+    def prologue(self) -> Optional[List[str]]:
+        """XML 声明与根元素之间的注释与处理指令"""
+        return _misc_in(self._mm[self.base:self.starts[0]])
+
+    def epilogue(self) -> List[str]:
+        return _misc_in(self._mm[self.ends[0]:]) or []
+
+    def child_count(self, k: int) -> int:
+        count, child, last = 0, k + 1, self.lasts[k]
+        while child <= last:
+            count += 1
+            child = self.lasts[child] + 1
+        return count
+
+    def root(self) -> XmlElement:
+        return self.nodes[0] if 0 in self.nodes else self.element(0)
+
+    def _attached(self, node: XmlElement) -> bool:
+        while node.parent is not None:
+            node = node.parent
+        return node is self.nodes.get(0)
+
+    def locate(self, element_id: str) -> Optional[List[int]]:
+        """
+        尚未物化的元素：返回从它到最近的已物化祖先 (不含) 的编号链；
+        元素不存在、已经物化 (其 id 以编辑器的索引为准) 或位于被删除的子树中时返回 None
+        """
+        k = self.ids.get(element_id)
+        if k is None or k in self.nodes:
+            return None
+        return self._chain(k)
+
+    def _chain(self, k: int) -> Optional[List[int]]:
+        chain = []
+        while k not in self.nodes:
+            chain.append(k)
+            k = self.parents[k]
+        return chain if self._attached(self.nodes[k]) else None
+
+    def _expand_chain(self, chain: List[int], editor: XmlEditor) -> XmlElement:
+        node = self.nodes[self.parents[chain[-1]]]
+        for k in reversed(chain):
+            editor.expand(node)
+            node = self.nodes[k]
+        return node
+
+    def resolve(self, element_id: str, editor: XmlEditor) -> Optional[XmlElement]:
+        """逐层展开到 id 对应的元素并返回它"""
+        chain = self.locate(element_id)
+        return None if chain is None else self._expand_chain(chain, editor)
+
+    def resolve_tag(self, tag: str, editor: XmlEditor):
+        """把原文件中所有该标签、尚未物化且仍在树上的元素解析出来 (编辑器的索引随之更新)"""
+        for k in self.by_tag.get(tag, ()):
+            if k not in self.nodes:
+                chain = self._chain(k)
+                if chain is not None:
+                    self._expand_chain(chain, editor)
+
+    def materialize(self, node: XmlElement):
+        """把未展开的节点连同整个子树一次解析进内存"""
+        node.invalidate()
+        full = parse_fragment(self._mm[self.starts[node._lazy]:self.ends[node._lazy]])
+        for child in full.children:
+            child.parent = node
+        node.children = full.children
+        node.trail = full.trail
+        node._lazy = -1
+
+    # --- 原样拷贝 ---
+    def raw_size(self, k: int) -> int:
+        return self.ends[k] - self.starts[k]
+
+    def raw_text(self, k: int) -> str:
+        return self._mm[self.starts[k]:self.ends[k]].decode("utf-8")
+
+    def iter_raw_text(self, k: int) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pos, end = self.starts[k], self.ends[k]
+        while pos < end:
+            chunk = self._mm[pos:min(pos + _RAW_CHUNK, end)]
+            pos += len(chunk)
+            yield decoder.decode(chunk, pos >= end)
+
+    # --- 保存后 ---
+    def remap(self, path: str):
+        """
+        文件被整体重写后重新扫描：已物化的元素按 id 对应到新的编号；
+        撤销历史中被删除的未展开子树不会出现在新文件里，先把它们完整解析进内存
+        """
+        for node in list(self.nodes.values()):
+            if node._lazy >= 0 and not self._attached(node):
+                self.materialize(node)
+        root = self.nodes[0]
+        self.close()
+        self._scan(path)
+        nodes = {}
+        for node in root.iter_subtree():
+            k = self.ids[node.id]
+            nodes[k] = node
+            if node._lazy >= 0:
+                node._lazy = k
+        self.nodes = nodes
+
+
+def load_xml_lazy(path: str) -> XmlEditor:
+    """惰性加载：只扫描偏移表，树中只有 (未展开的) 根元素"""
+    source = LazyXmlSource(path)
+    root = source.root()
+    root.lead = source.prologue()
+    editor = XmlEditor(path, root, source.declaration, source.log_header, source.epilogue())
+    editor.source = source
+    return editor
@@ -0,0 +1,175 @@
+"""
+流式 XML 加载
+按块把文件字节喂给 expat，在事件回调里用显式栈建立元素树并同时建 id 索引：
+只扫描一遍，不把整个文件读成字符串，也不受递归深度限制。
+格式错误、缺少 id、重复 id 都以 ValueError 报告，并给出所在的行号和列号。
+注释与处理指令按原文挂在相邻元素的 lead / trail 上 (见 XmlElement)，保存时写回。
+"""
+import io
+from typing import BinaryIO, List, Optional, Tuple
+from xml.parsers import expat
+
+from .xml_editor import XML_DECLARATION, XmlEditor, XmlElement
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _read_log_header(stream: BinaryIO) -> Tuple[Optional[str], bytes, int]:
+    """读出文件首行的 "# log ..." 注释 (如果有)，返回 (注释, 剩余的第一块数据, XML 内容的起始字节偏移)"""
+    data = stream.read(CHUNK_SIZE)
+    if not data.startswith(b"# log"):
+        return None, data, 0
+    while b"\n" not in data:
+        more = stream.read(CHUNK_SIZE)
+        if not more:
+            break
+        data += more
+    line, _, rest = data.partition(b"\n")
+    return line.rstrip(b"\r").decode("utf-8"), rest, len(line) + 1
+
+
+def pi_markup(target: str, data: str) -> str:
+    """按 expat 给出的 (目标, 数据) 还原处理指令"""
+    return f"<?{target} {data}?>" if data else f"<?{target}?>"
+
+
+class _TreeBuilder:
+    """expat 事件回调：维护未闭合元素的栈，元素文本只保留第一个子元素之前的部分"""
+
+    def __init__(self, parser, line_offset: int = 0, base: int = 0):
+        self.parser = parser
+        self.line_offset = line_offset
+        self.root: Optional[XmlElement] = None
+        self.declaration = XML_DECLARATION
+        self.ids = set()
+        self.stack: List[XmlElement] = []
+        # 栈顶元素尚未遇到子元素时收集到的文本片段；None 表示不再收集
+        self.text: Optional[List[str]] = None
+        # 还没有归属的注释与处理指令 (归入下一个开始的元素的 lead，或栈顶元素的 trail)
+        self.misc: List[str] = []
+        # 根元素结束之后的注释与处理指令
+        self.epilogue: List[str] = []
+
+    def install(self):
+        parser = self.parser
+        parser.buffer_text = True
+        parser.XmlDeclHandler = self.xml_decl
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.characters
+        parser.CommentHandler = self.comment
+        parser.ProcessingInstructionHandler = self.processing_instruction
+
+    def where(self, line: int, column: int) -> str:
+        return f"line {line + self.line_offset}, column {column + 1}"
+
+    def _here(self) -> str:
+        return self.where(self.parser.CurrentLineNumber, self.parser.CurrentColumnNumber)
+
+    def check_id(self, tag: str, element_id: Optional[str]):
+        if element_id is None:
+            raise ValueError(f"element <{tag}> has no id attribute ({self._here()})")
+        if element_id in self.ids:
+            raise ValueError(f"duplicate id '{element_id}' ({self._here()})")
+
+    def flush_text(self):
+        if self.text is not None:
+            text = "".join(self.text).strip()
+            self.stack[-1].text = text or None
+            self.text = None
+
+    def xml_decl(self, version, encoding, standalone):
+        decl = f'<?xml version="{version}"'
+        if encoding:
+            decl += f' encoding="{encoding}"'
+        if standalone != -1:
+            decl += f' standalone="{"yes" if standalone else "no"}"'
+        self.declaration = decl + "?>"
+
+    def start(self, tag, attributes):
+        attrs = dict(zip(attributes[::2], attributes[1::2]))
+        element_id = attrs.get("id")
+        self.check_id(tag, element_id)
+        self.ids.add(element_id)
+        node = XmlElement(tag, attrs)
+        if self.misc:
+            node.lead, self.misc = self.misc, []
+        if self.stack:
+            self.flush_text()
+            parent = self.stack[-1]
+            node.parent = parent
+            parent.children.append(node)
+        else:
+            self.root = node
+        self.stack.append(node)
+        self.text = []
+
+    def end(self, tag):
+        self.flush_text()
+        if self.misc:
+            self.stack[-1].trail, self.misc = self.misc, []
+        self.stack.pop()
+
+    def characters(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def _add_misc(self, markup: str):
+        if self.root is not None and not self.stack:
+            self.epilogue.append(markup)
+        else:
+            self.misc.append(markup)
+
+    def comment(self, data):
+        self._add_misc(f"<!--{data}-->")
+
+    def processing_instruction(self, target, data):
+        self._add_misc(pi_markup(target, data))
+
+
+def parse_stream(stream: BinaryIO, builder_class=_TreeBuilder):
+    """
+    把二进制流逐块喂给 expat，事件交给 builder_class(parser, 行号偏移, 字节偏移) 处理
+    返回 (builder, 日志头)；格式错误时抛出 ValueError
+    """
+    log_header, data, base = _read_log_header(stream)
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    builder = builder_class(parser, 1 if log_header is not None else 0, base)
+    builder.install()
+    try:
+        while data:
+            parser.Parse(data, False)
+            data = stream.read(CHUNK_SIZE)
+        parser.Parse(b"", True)
+    except expat.ExpatError as e:
+        raise ValueError(f"malformed XML: {expat.ErrorString(e.code)} ({builder.where(e.lineno, e.offset)})")
+    return builder, log_header
+
+
+def parse_fragment(data: bytes) -> XmlElement:
+    """解析文件中一个完整元素的字节，返回该元素 (含子树)"""
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    builder = _TreeBuilder(parser)
+    builder.install()
+    try:
+        parser.Parse(data, True)
+    except expat.ExpatError as e:
+        raise ValueError(f"malformed XML: {expat.ErrorString(e.code)}")
+    return builder.root
+
+
+def read_xml(stream: BinaryIO, filename: str = "<stream>") -> XmlEditor:
+    """从二进制流逐块解析 XML (可以带 "# log" 首行)，返回编辑器；格式错误时抛出 ValueError"""
+    builder, log_header = parse_stream(stream)
+    return XmlEditor(filename, builder.root, builder.declaration, log_header, builder.epilogue)
+
+
+def parse_xml(text: str, filename: str = "<string>") -> XmlEditor:
+    return read_xml(io.BytesIO(text.encode("utf-8")), filename)
+
+
+def load_xml(path: str) -> XmlEditor:
+    with open(path, "rb") as f:
+        return read_xml(f, path)
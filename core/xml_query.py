@@ -0,0 +1,151 @@
+"""
+XPath 的一个小子集，供 xml-find 使用
+
+    book[@category='COOKING']/title     任意位置的 book 下的 title 子元素
+    /bookstore/book                     从根元素开始的绝对路径
+    bookstore//price                    // 表示任意层后代
+    *[@lang]  title[text()='Harry Potter']  [@id='x']
+
+每一步先从 XmlEditor 维护的标签/属性索引中取候选 (取最小的那个集合再逐个检查其余条件)，
+只有 "/" 子元素步骤和没有任何可用索引的步骤 (例如 '*'、只有 text() 条件) 才遍历元素。
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .xml_editor import XmlEditor, XmlElement
+
+_NAME = r"[A-Za-z_][\w.\-]*"
+_STEP = re.compile(rf"(\*|{_NAME})")
+_PREDICATE = re.compile(
+    rf"""\[\s*(?:@({_NAME})(?:\s*=\s*(?:'([^']*)'|"([^"]*)"))?|text\(\)\s*=\s*(?:'([^']*)'|"([^"]*)"))\s*\]""")
+
+
+class Step(NamedTuple):
+    """一个定位步骤；attrs 中值为 None 表示只要求属性存在"""
+    descendant: bool
+    tag: Optional[str]
+    attrs: Tuple[Tuple[str, Optional[str]], ...]
+    text: Optional[str]
+
+    def matches(self, node: XmlElement) -> bool:
+        if self.tag is not None and node.tag != self.tag:
+            return False
+        for name, value in self.attrs:
+            actual = node.attrs.get(name)
+            if actual is None or (value is not None and actual != value):
+                return False
+        return self.text is None or (node.text or "") == self.text
+
+
+def compile_query(query: str) -> List[Step]:
+    """解析查询表达式，语法错误时抛出 ValueError"""
+    steps: List[Step] = []
+    pos, query = 0, query.strip()
+    if not query:
+        raise ValueError("empty query")
+    # 不以 '/' 开头的查询在整个文档中查找，等同于以 '//' 开头
+    descendant = not query.startswith("/") or query.startswith("//")
+    while pos < len(query):
+        if query.startswith("//", pos):
+            descendant, pos = True, pos + 2
+        elif query.startswith("/", pos):
+            pos += 1
+        match = _STEP.match(query, pos)
+        if match is None:
+            raise ValueError(f"expected an element name at position {pos + 1}")
+        tag = None if match.group(1) == "*" else match.group(1)
+        pos = match.end()
+        attrs, text = [], None
+        while pos < len(query) and query[pos] == "[":
+            pred = _PREDICATE.match(query, pos)
+            if pred is None:
+                raise ValueError(f"unsupported predicate at position {pos + 1}")
+            name, single, double, text_single, text_double = pred.groups()
+            if name is not None:
+                attrs.append((name, single if single is not None else double))
+            else:
+                text = text_single if text_single is not None else text_double
+            pos = pred.end()
+        if pos < len(query) and query[pos] != "/":
+            raise ValueError(f"unexpected '{query[pos]}' at position {pos + 1}")
+        steps.append(Step(descendant, tag, tuple(attrs), text))
+        descendant = False
+    return steps
+
+
+def _candidates(editor: XmlEditor, step: Step) -> Iterable[XmlElement]:
+    """从索引中取出满足 step 的元素 (顺序不定)"""
+    if not any(name == "id" and value is not None for name, value in step.attrs):
+        # 按 id 查找时 find 会自行解析，不必先加载同标签的元素
+        editor.load_tag(step.tag)
+    pools = []
+    for name, value in step.attrs:
+        if name == "id":
+            if value is None:
+                continue
+            node = editor.find(value)
+            pools.append([node] if node is not None else [])
+        elif value is not None:
+            pools.append(editor.attr_index.get(name, {}).get(value, ()))
+        elif name in editor.attr_index:
+            pools.append([n for nodes in editor.attr_index[name].values() for n in nodes])
+        else:
+            pools.append(())
+    if step.tag is not None:
+        pools.append(editor.tag_index.get(step.tag, ()))
+    if not pools:
+        # 既没有标签也没有可索引的属性条件，只能检查全部元素
+        pools.append(list(editor.index.values()))
+    smallest = min(pools, key=len)
+    return [node for node in smallest if step.matches(node)]
+
+
+def _children(editor: XmlEditor, node: XmlElement) -> List[XmlElement]:
+    if node._lazy >= 0:
+        editor.expand(node)
+    return node.children
+
+
+def _document_order(nodes: Iterable[XmlElement]) -> List[XmlElement]:
+    """按元素在文档中的先后排序 (比较从根到元素的子元素下标路径)"""
+    positions: Dict[XmlElement, Dict[XmlElement, int]] = {}
+
+    def path(node: XmlElement) -> List[int]:
+        result = []
+        while node.parent is not None:
+            parent = node.parent
+            index = positions.get(parent)
+            if index is None:
+                index = positions[parent] = {child: i for i, child in enumerate(parent.children)}
+            result.append(index[node])
+            node = parent
+        result.reverse()
+        return result
+
+    return sorted(nodes, key=path)
+
+
+def run_query(editor: XmlEditor, steps: List[Step]) -> List[XmlElement]:
+    """执行已编译的查询，按文档顺序返回匹配的元素"""
+    first = steps[0]
+    if first.descendant:
+        current = _candidates(editor, first)
+    else:
+        current = [editor.root] if first.matches(editor.root) else []
+    for step in steps[1:]:
+        if not current:
+            break
+        if not step.descendant:
+            current = [child for node in current for child in _children(editor, node) if step.matches(child)]
+            continue
+        # 后代步骤：从索引取候选，再沿父指针检查是否位于当前结果之下
+        scope = set(current)
+        matched = []
+        for node in _candidates(editor, step):
+            ancestor = node.parent
+            while ancestor is not None and ancestor not in scope:
+                ancestor = ancestor.parent
+            if ancestor is not None:
+                matched.append(node)
+        current = matched
+    return _document_order(set(current))
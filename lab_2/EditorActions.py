@@ -6,9 +6,9 @@ import WorkSpace
 import Logging
 
 class EditCommand:
-    """编辑命令基类（抽象命令）"""
+    """编辑命令基类（抽象命令）；参数由 Run.py 中注册的模式解析后传给构造函数"""
     
-    def execute(self, command):
+    def execute(self):
         """执行命令"""
         raise NotImplementedError
     
@@ -24,19 +24,11 @@ class EditCommand:
 class AppendCommand(EditCommand):
     """追加文本命令 - append "text" """
     
-    def __init__(self):
+    def __init__(self, text=""):
         self.file = None
-        self.text = ""
+        self.text = text
     
-    def execute(self, command):
-        # 解析命令：append "text"
-        parts = command.split('"')
-        if len(parts) < 2:
-            print("参数错误，应为：append \"text\"")
-            return False
-        
-        self.text = parts[1]
-        
+    def execute(self):
         # 获取当前活动文件
         if not WorkSpace.WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -78,31 +70,13 @@ class AppendCommand(EditCommand):
 class InsertCommand(EditCommand):
     """插入文本命令 - insert <line:col> "text" """
     
-    def __init__(self):
+    def __init__(self, position=(0, 0), text=""):
         self.file = None
-        self.line = 0
-        self.col = 0
-        self.text = ""
+        self.line, self.col = position
+        self.text = text
         self.original_line_content = ""
     
-    def execute(self, command):
-        # 解析命令：insert 1:3 "text"
-        try:
-            parts = command.split('"')
-            if len(parts) < 2:
-                print("参数错误，应为：insert <line:col> \"text\"")
-                return False
-            
-            self.text = parts[1]
-            position = parts[0].strip().split()[1]  # 获取line:col部分
-            line_col = position.split(':')
-            self.line = int(line_col[0])
-            self.col = int(line_col[1])
-            
-        except (IndexError, ValueError):
-            print("参数错误，应为：insert <line:col> \"text\"")
-            return False
-        
+    def execute(self):
         # 获取当前活动文件
         if not WorkSpace.WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -239,32 +213,14 @@ class InsertCommand(EditCommand):
 class DeleteCommand(EditCommand):
     """删除字符命令 - delete <line:col> <len> """
     
-    def __init__(self):
+    def __init__(self, position=(0, 0), length=0):
         self.file = None
-        self.line = 0
-        self.col = 0
-        self.length = 0
+        self.line, self.col = position
+        self.length = length
         self.deleted_text = ""
         self.original_line_content = ""
     
-    def execute(self, command):
-        # 解析命令：delete 1:3 5
-        try:
-            parts = command.split()
-            if len(parts) != 3:
-                print("参数错误，应为：delete <line:col> <len>")
-                return False
-            
-            position = parts[1]
-            line_col = position.split(':')
-            self.line = int(line_col[0])
-            self.col = int(line_col[1])
-            self.length = int(parts[2])
-            
-        except (IndexError, ValueError):
-            print("参数错误，应为：delete <line:col> <len>")
-            return False
-        
+    def execute(self):
         # 获取当前活动文件
         if not WorkSpace.WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -336,38 +292,14 @@ class DeleteCommand(EditCommand):
 class ReplaceCommand(EditCommand):
     """替换字符命令 - replace <line:col> <len> "text" """
     
-    def __init__(self):
+    def __init__(self, position=(0, 0), length=0, text=""):
         self.file = None
-        self.line = 0
-        self.col = 0
-        self.length = 0
-        self.text = ""
+        self.line, self.col = position
+        self.length = length
+        self.text = text
         self.original_line_content = ""
     
-    def execute(self, command):
-        # 解析命令：replace 1:3 5 "text"
-        try:
-            parts = command.split('"')
-            if len(parts) < 2:
-                print("参数错误，应为：replace <line:col> <len> \"text\"")
-                return False
-            
-            self.text = parts[1]
-            cmd_parts = parts[0].strip().split()
-            if len(cmd_parts) != 3:
-                print("参数错误，应为：replace <line:col> <len> \"text\"")
-                return False
-            
-            position = cmd_parts[1]
-            line_col = position.split(':')
-            self.line = int(line_col[0])
-            self.col = int(line_col[1])
-            self.length = int(cmd_parts[2])
-            
-        except (IndexError, ValueError):
-            print("参数错误，应为：replace <line:col> <len> \"text\"")
-            return False
-        
+    def execute(self):
         # 获取当前活动文件
         if not WorkSpace.WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -438,7 +370,11 @@ class ReplaceCommand(EditCommand):
 class ShowCommand(EditCommand):
     """显示文本内容命令 - show [startLine:endLine] """
     
-    def execute(self, command):
+    def __init__(self, span=None):
+        # (起始行, 结束行)，结束行为 -1 表示到文件末尾；None 表示显示全文
+        self.span = span
+    
+    def execute(self):
         # 获取当前活动文件
         if not WorkSpace.WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -452,25 +388,9 @@ class ShowCommand(EditCommand):
             print("当前文件不存在")
             return False
         
-        # 解析命令：show 或 show 1:5
-        parts = command.split()
-        
-        if len(parts) == 1:
-            # 显示全文
-            start_line = 1
+        start_line, end_line = self.span or (1, -1)
+        if end_line == -1:
             end_line = len(file.content)
-        elif len(parts) == 2:
-            # 显示指定范围
-            try:
-                range_parts = parts[1].split(':')
-                start_line = int(range_parts[0])
-                end_line = int(range_parts[1])
-            except (IndexError, ValueError):
-                print("参数错误，应为：show [startLine:endLine]")
-                return False
-        else:
-            print("参数错误，应为：show [startLine:endLine]")
-            return False
         
         # 处理空文件
         if not file.content:
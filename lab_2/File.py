@@ -3,6 +3,34 @@ class FileList():
     all_files_path = set()
     all_files = {}
 
+def _bump(method):
+    def wrapper(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class ContentList(list):
+    """文件内容：普通的行列表，每次修改都会增加 version (快照据此判断内容是否变化)"""
+    version = 0
+    # 快照缓存的 (version, 内容哈希)，见 Memento._store_blob
+    digest = None
+
+    append = _bump(list.append)
+    extend = _bump(list.extend)
+    insert = _bump(list.insert)
+    pop = _bump(list.pop)
+    remove = _bump(list.remove)
+    clear = _bump(list.clear)
+    sort = _bump(list.sort)
+    reverse = _bump(list.reverse)
+    __setitem__ = _bump(list.__setitem__)
+    __delitem__ = _bump(list.__delitem__)
+    __iadd__ = _bump(list.__iadd__)
+    __imul__ = _bump(list.__imul__)
+
+
 class TextFile():
     def __init__(self, filePath,content=None,withLog=False):
         self.fileName = filePath.split("/")[-1]
@@ -16,6 +44,14 @@ class TextFile():
         self.command_history = []  # 已执行的命令
         self.redo_stack = []  # 已撤销的命令（用于redo）
     
+    @property
+    def content(self):
+        return self._content
+
+    @content.setter
+    def content(self, lines):
+        self._content = lines if isinstance(lines, ContentList) else ContentList(lines)
+
     def add_to_history(self, command):
         """添加命令到历史记录"""
         if command.can_undo():
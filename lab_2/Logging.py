@@ -1,8 +1,13 @@
 import os
+import sys
+import time
 import datetime
 import File
 import WorkSpace
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.log_index import append_entries, parse_since, query_log
+
 class Logger:
     """
     日志模块核心类 (Observer)
@@ -49,19 +54,15 @@ class Logger:
         
         self._append_to_log_file(filepath, log_entry)
 
-    def show_log(self, filepath):
+    def has_log(self, filepath):
+        return os.path.exists(self._get_log_filename(filepath))
+
+    def show_log(self, filepath, tail=None, since=None, grep=None):
         """
-        读取并返回日志内容
+        逐行产出日志内容 (借助偏移索引定位，不整体读入)
+        tail: 最后 N 条；since: 时间戳秒；grep: 命令中包含的子串
         """
-        log_file = self._get_log_filename(filepath)
-        if not os.path.exists(log_file):
-            return "暂无日志记录。"
-        
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            return f"读取日志失败: {str(e)}"
+        return query_log(self._get_log_filename(filepath), tail=tail, since=since, grep=grep)
 
     def _get_log_filename(self, filepath):
         """
@@ -91,8 +92,7 @@ class Logger:
         """
         log_file = self._get_log_filename(filepath)
         try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(content)
+            append_entries(log_file, [(content, int(time.time()))])
         except Exception as e:
             # 需求：若日志记录失败仅提示警告，不中断程序正常运行
             print(f"[Warning] 写入日志失败: {str(e)}")
@@ -102,9 +102,11 @@ class LogOnCommand:
     命令: log-on [file]
     功能: 启用日志
     """
-    def execute(self, command):
-        parts = command.split(' ')
-        if len(parts) < 2:
+    def __init__(self, target_file=None):
+        self.target_file = target_file
+
+    def execute(self):
+        if self.target_file is None:
             # 默认对当前活动文件生效
             if not WorkSpace.WorkSpace.current_workFile_path:
                 print("没有打开的文件")
@@ -116,7 +118,7 @@ class LogOnCommand:
                     WorkSpace.WorkSpace.logger.enable_logging(target_file)
         else:
             # 对指定文件生效
-            target_file = parts[1]
+            target_file = self.target_file
             if(target_file not in File.FileList.all_files_path):
                 print("当前文件不存在")
             else:
@@ -127,9 +129,11 @@ class LogOffCommand:
     命令: log-off [file]
     功能: 关闭日志
     """
-    def execute(self, command):
-        parts = command.split(' ')
-        if len(parts) < 2:
+    def __init__(self, target_file=None):
+        self.target_file = target_file
+
+    def execute(self):
+        if self.target_file is None:
             # 默认对当前活动文件生效
             if not WorkSpace.WorkSpace.current_workFile_path:
                 print("没有打开的文件")
@@ -143,7 +147,7 @@ class LogOffCommand:
                     WorkSpace.WorkSpace.logger.disable_logging(target_path)
         else:
             # 对指定文件生效
-            target_file = parts[1]
+            target_file = self.target_file
             if(target_file not in File.FileList.all_files_path):
                 print("当前文件不存在")
             else:
@@ -151,31 +155,50 @@ class LogOffCommand:
             
 class LogShowCommand:
     """
-    命令: log-show [file]
+    命令: log-show [file] [--tail N] [--since 时间] [--grep 命令]
     功能: 显示日志内容
     """
-    def execute(self, command):
-        parts = command.split(' ')
-        if len(parts) < 2:
+    def __init__(self, target_file=None, tail=None, since=None, grep=None):
+        self.target_file = target_file
+        self.tail = tail
+        self.since = since
+        self.grep = grep
+
+    def execute(self):
+        tail = self.tail
+        if tail is not None and tail < 0:
+            print("参数错误：--tail 不能为负数")
+            return
+        try:
+            since = parse_since(self.since) if self.since is not None else None
+        except ValueError:
+            print("参数错误：--since 格式如 20250101T08:00:00 或 2025-01-01")
+            return
+
+        if self.target_file is None:
             # 默认对当前活动文件生效
             if not WorkSpace.WorkSpace.current_workFile_path:
                 print("没有打开的文件")
-            else:
-                target_path = WorkSpace.WorkSpace.current_workFile_path
-                if target_path not in WorkSpace.WorkSpace.current_workFile_list:
-                    print("当前文件不存在")
-                else:
-                    content = WorkSpace.WorkSpace.logger.show_log(target_path)
-                    print(f"--- Log for {target_path} ---")
-                    print(content)
-                    print("-----------------------------")
+                return
+            target_file = WorkSpace.WorkSpace.current_workFile_path
+            if target_file not in WorkSpace.WorkSpace.current_workFile_list:
+                print("当前文件不存在")
+                return
         else:
             # 对指定文件生效
-            target_file = parts[1]
+            target_file = self.target_file
             if(target_file not in File.FileList.all_files_path):
                 print("当前文件不存在")
-            else:
-                content = WorkSpace.WorkSpace.logger.show_log(target_file)
-                print(f"--- Log for {target_file} ---")
-                print(content)
-                print("-----------------------------")
\ No newline at end of file
+                return
+
+        logger = WorkSpace.WorkSpace.logger
+        print(f"--- Log for {target_file} ---")
+        if not logger.has_log(target_file):
+            print("暂无日志记录。")
+        else:
+            try:
+                for line in logger.show_log(target_file, tail=tail, since=since, grep=self.grep):
+                    print(line)
+            except Exception as e:
+                print(f"读取日志失败: {str(e)}")
+        print("-----------------------------")
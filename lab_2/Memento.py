@@ -1,8 +1,173 @@
+import hashlib
 import json
+import os
+import struct
 from datetime import datetime
 from File import FileList
 
+# memento.txt 是只追加的快照日志：
+#   文件头 MAGIC，之后每条记录为 [4字节长度][JSON][4字节长度 + END_MARK]
+# 记录尾部重复了长度，恢复时可以从文件末尾直接定位最后一条完整记录
+MEMENTO_FILE = "memento.txt"
+MAGIC = b"MEMJ1\n"
+HEADER = struct.Struct(">I")
+TRAILER = struct.Struct(">I4s")
+END_MARK = b"MEND"
+
+# 文件内容按 sha256 存放在 BLOB_DIR 下，快照中只记录内容的哈希，未变化的文件不重复存储
+BLOB_DIR = ".memento_blobs"
+
+# 日志超过 "最后一条记录大小 * COMPACT_FACTOR" 且不小于 COMPACT_MIN_BYTES 时压缩为只剩最后一条
+COMPACT_FACTOR = 32
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+def _encode_record(state):
+    payload = json.dumps(state, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload + TRAILER.pack(len(payload), END_MARK)
+
+
+def _read_last_record(f, size):
+    """从文件末尾读取最后一条记录，尾部不完整时返回 None"""
+    if size < len(MAGIC) + HEADER.size + TRAILER.size:
+        return None
+    f.seek(size - TRAILER.size)
+    length, mark = TRAILER.unpack(f.read(TRAILER.size))
+    start = size - TRAILER.size - length - HEADER.size
+    if mark != END_MARK or start < len(MAGIC):
+        return None
+    f.seek(start)
+    if HEADER.unpack(f.read(HEADER.size))[0] != length:
+        return None
+    try:
+        return json.loads(f.read(length).decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def _scan_records(f, size):
+    """从头顺序扫描，返回 (最后一条完整记录, 其结束位置)；用于尾部被截断的情况"""
+    last, end = None, len(MAGIC)
+    pos = len(MAGIC)
+    while pos + HEADER.size + TRAILER.size <= size:
+        f.seek(pos)
+        length = HEADER.unpack(f.read(HEADER.size))[0]
+        record_end = pos + HEADER.size + length + TRAILER.size
+        if record_end > size:
+            break
+        payload = f.read(length)
+        if TRAILER.unpack(f.read(TRAILER.size)) != (length, END_MARK):
+            break
+        try:
+            last = json.loads(payload.decode("utf-8"))
+        except ValueError:
+            break
+        pos = end = record_end
+    return last, end
+
+
+def _store_blob(content):
+    """
+    把文件内容写入内容寻址存储，返回哈希；相同内容只写一次
+    content 自上次快照以来没有修改 (version 未变) 时直接复用缓存的哈希，不再序列化和计算哈希
+    """
+    cached = getattr(content, "digest", None)
+    if cached is not None and cached[0] == content.version \
+            and os.path.exists(os.path.join(BLOB_DIR, cached[1])):
+        return cached[1]
+    data = json.dumps(content, ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(BLOB_DIR, digest)
+    if not os.path.exists(path):
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    if hasattr(content, "version"):
+        content.digest = (content.version, digest)
+    return digest
+
+
+def _load_blob(digest):
+    with open(os.path.join(BLOB_DIR, digest), "rb") as f:
+        return json.loads(f.read().decode("utf-8"))
+
+
+def _resolve_contents(state):
+    """把快照中的 blob 引用还原为 content，同一版本的内容只读取一次"""
+    loaded = {}
+    for f in state.get("all_files", []):
+        digest = f.pop("blob", None)
+        if digest is None:
+            continue
+        if digest not in loaded:
+            try:
+                loaded[digest] = _load_blob(digest)
+            except (OSError, ValueError):
+                print(f"快照引用的文件内容丢失: {f.get('filePath')}")
+                loaded[digest] = []
+        f["content"] = list(loaded[digest])
+    return state
+
+
+def _collect_garbage(states):
+    """删除不再被任何快照引用的 blob"""
+    if not os.path.isdir(BLOB_DIR):
+        return
+    live = {f["blob"] for state in states for f in state.get("all_files", []) if "blob" in f}
+    for name in os.listdir(BLOB_DIR):
+        if name not in live:
+            try:
+                os.remove(os.path.join(BLOB_DIR, name))
+            except OSError:
+                pass
+
+
+def _write_journal(states):
+    """用给定快照重写整个日志 (写临时文件后替换，中途失败不影响原文件)"""
+    tmp = MEMENTO_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        for state in states:
+            f.write(_encode_record(state))
+    os.replace(tmp, MEMENTO_FILE)
+    _collect_garbage(states)
+
+
+def _migrate_legacy():
+    """旧格式为整个 JSON 列表，只保留最后一个快照转换为日志格式"""
+    try:
+        with open(MEMENTO_FILE, "r", encoding="utf-8") as f:
+            all_states = json.load(f)
+    except (ValueError, UnicodeDecodeError):
+        all_states = []
+    if not isinstance(all_states, list):
+        all_states = []
+    _write_journal(all_states[-1:])
+
+
+def _open_journal():
+    """确保日志存在且为新格式"""
+    if not os.path.exists(MEMENTO_FILE) or os.path.getsize(MEMENTO_FILE) == 0:
+        _write_journal([])
+        return
+    with open(MEMENTO_FILE, "rb") as f:
+        head = f.read(len(MAGIC))
+    if head != MAGIC:
+        _migrate_legacy()
+
+
+def compact(last_state=None):
+    """压缩日志：只保留最后一个快照，并回收不再引用的 blob"""
+    if last_state is None:
+        last_state = _read_last_state()
+    _write_journal([last_state] if last_state else [])
+
+
 def update(current_workFile_path, current_workFile_list):
+    # 先确保日志就绪 (迁移/新建时会回收 blob，必须在写入新 blob 之前)
+    _open_journal()
     new_state = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "current_workFile_path": current_workFile_path,
@@ -12,47 +177,55 @@ def update(current_workFile_path, current_workFile_list):
             for filePath, fileObj in current_workFile_list.items()
         },
 
-        # 保存所有文件
+        # 保存所有文件 (内容只存哈希)
         "all_files": [
             {
                 "fileName": f.fileName,
                 "filePath": f.filePath,
-                "content": f.content,
+                "blob": _store_blob(f.content),
                 "state": f.state
             }
             for f in FileList.all_files.values()
         ]
     }
 
-    # 读取原来的状态历史（list）
-    try:
-        with open("memento.txt", "r", encoding="utf-8") as f:
-            all_states = json.load(f)
-    except FileNotFoundError:
-        all_states = []
+    record = _encode_record(new_state)
+    # 只在文件末尾追加新快照，不再读取和重写历史
+    with open(MEMENTO_FILE, "ab") as f:
+        f.write(record)
+        size = f.tell()
 
-    # 添加新的快照
-    all_states.append(new_state)
-
-    # 写回文件
-    with open("memento.txt", "w", encoding="utf-8") as f:
-        json.dump(all_states, f, ensure_ascii=False, indent=2)
+    if size > max(COMPACT_MIN_BYTES, len(record) * COMPACT_FACTOR):
+        compact(new_state)
 
     print("工作区状态已保存")
 
 
+def _read_last_state():
+    """读取最后一条完整的快照 (blob 引用未展开)"""
+    _open_journal()
+    size = os.path.getsize(MEMENTO_FILE)
+    end = size
+    with open(MEMENTO_FILE, "rb") as f:
+        last_state = _read_last_record(f, size)
+        if last_state is None and size > len(MAGIC):
+            # 上次写入中途中断：回退到最后一条完整记录，并截掉残缺的尾部
+            last_state, end = _scan_records(f, size)
+    if end < size:
+        with open(MEMENTO_FILE, "r+b") as f:
+            f.truncate(end)
+    return last_state
+
+
 def recover():
-    try:
-        with open("memento.txt", "r", encoding="utf-8") as f:
-            all_states = json.load(f)
-    except FileNotFoundError:
+    if not os.path.exists(MEMENTO_FILE):
         print("没有可恢复的工作区状态")
         return
 
-    if not all_states:
+    last_state = _read_last_state()
+
+    if not last_state:
         print("没有可恢复的工作区状态")
         return
 
-    last_state = all_states[-1]
-
-    return last_state
\ No newline at end of file
+    return _resolve_contents(last_state)
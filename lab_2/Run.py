@@ -1,41 +1,87 @@
+import os
+import shlex
+import sys
 import WorkSpace
 import Memento
 import EditorActions
 import Logging
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.dispatcher import Dispatcher
+
 class CommandFactory:
+    # 命令名 -> (命令类, 参数模式, 用法提示)；参数按模式解析后传给命令类的构造函数
+    # 每次执行都创建新实例 (编辑命令会把自身压入撤销历史，不能共用一个实例)
+    command_specs = {
+        # 工作区命令
+        "load": (WorkSpace.LoadCommand, "file", "参数错误，应为：load <file>"),
+        "save": (WorkSpace.SaveCommand, "[target]", "参数错误，应为：save [file|all]"),
+        "init": (WorkSpace.InitCommand, "file [flag]", "参数错误，应为：init <file> [with-log]"),
+        "close": (WorkSpace.CloseCommand, "[file]", "参数错误，应为：close [file]"),
+        "edit": (WorkSpace.EditCommand, "file", "参数错误，应为：edit <file>"),
+        "editor-list": (WorkSpace.EditorListCommand, "", None),
+        "dir-tree": (WorkSpace.DirTreeCommand, "", None),
+        "undo": (WorkSpace.UndoCommand, "", None),
+        "redo": (WorkSpace.RedoCommand, "", None),
+
+        # 文本编辑命令
+        "append": (EditorActions.AppendCommand, "text", '参数错误，应为：append "text"'),
+        "insert": (EditorActions.InsertCommand, "pos:pos text", '参数错误，应为：insert <line:col> "text"'),
+        "delete": (EditorActions.DeleteCommand, "pos:pos length:int", "参数错误，应为：delete <line:col> <len>"),
+        "replace": (EditorActions.ReplaceCommand, "pos:pos length:int text",
+                    '参数错误，应为：replace <line:col> <len> "text"'),
+        # 与原实现一致，范围的两端都必须给出 (show 1 这类参数报错，而不是显示全文)
+        "show": (EditorActions.ShowCommand, "[span:pos]", "参数错误，应为：show [startLine:endLine]"),
+
+        # # 日志命令
+        "log-on": (Logging.LogOnCommand, "[file]", "参数错误，应为：log-on [file]"),
+        "log-off": (Logging.LogOffCommand, "[file]", "参数错误，应为：log-off [file]"),
+        "log-show": (Logging.LogShowCommand, "[file] --tail:int --since --grep",
+                     "参数错误，应为：log-show [file] [--tail N] [--since 时间] [--grep 命令]"),
+    }
+
     def __init__(self):
-        self.commands = {
-            # 工作区命令
-            "load": WorkSpace.LoadCommand(),
-            "save": WorkSpace.SaveCommand(),
-            "init": WorkSpace.InitCommand(),
-            "close": WorkSpace.CloseCommand(),
-            "edit": WorkSpace.EditCommand(),
-            "editor-list": WorkSpace.EditorListCommand(),
-            "dir-tree": WorkSpace.DirTreeCommand(),
-            "undo": WorkSpace.UndoCommand(),
-            "redo": WorkSpace.RedoCommand(),
-
-            # 文本编辑命令
-            "append": EditorActions.AppendCommand(),
-            "insert": EditorActions.InsertCommand(),
-            "delete": EditorActions.DeleteCommand(),
-            "replace": EditorActions.ReplaceCommand(),
-            "show": EditorActions.ShowCommand(),
-
-            # # 日志命令
-            "log-on": Logging.LogOnCommand(),
-            "log-off": Logging.LogOffCommand(),
-            "log-show": Logging.LogShowCommand(),
-        }
+        # 与 Lab1 共用 core.dispatcher 的注册表；与原实现一样，多余的参数报错而不是忽略
+        self.dispatcher = Dispatcher(unknown=lambda name, context: "不支持的操作", strict=True)
+        for name, (cls, schema, usage) in self.command_specs.items():
+            self.dispatcher.register(name, self._runner(cls), schema, usage=usage)
+
+    @staticmethod
+    def _runner(cls):
+        return lambda context, raw, *args: cls(*args).execute()
 
     def isValid(self, operator):
-        return operator in self.commands
+        return operator in self.dispatcher
 
     def getCommand(self, operator):
-        return self.commands.get(operator)
-    
+        # 保持原接口：返回的对象 execute(整行命令)，参数按注册的模式解析
+        return _LineCommand(self, operator) if operator in self.command_specs else None
+
+    def execute(self, command, operator=None):
+        # 与 Lab1 相同，按 shell 规则切分，引号内的文本可以包含空格
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            print("参数错误：引号不匹配")
+            return False
+        if operator is not None and (not tokens or tokens[0] != operator):
+            tokens.insert(0, operator)
+        if not tokens:
+            return False
+        return self.dispatcher.dispatch(None, tokens, command)
+
+
+class _LineCommand:
+    """getCommand 的返回值：接收整行命令，交给 CommandFactory 按参数模式解析后执行"""
+
+    def __init__(self, factory, operator):
+        self.factory = factory
+        self.operator = operator
+
+    def execute(self, command):
+        return self.factory.execute(command, self.operator)
+
+
 if __name__ == "__main__":
     cf=CommandFactory()
     last_state = Memento.recover()
@@ -53,9 +99,5 @@ if __name__ == "__main__":
         if(command == "curlist"):
             print(WorkSpace.WorkSpace.current_workFile_list)
             continue
-        operator = command.split(" ")[0]
-        if(not cf.isValid(operator)):
-            print("不支持的操作")
-            continue
-        cf.getCommand(operator).execute(command)
+        cf.execute(command)
         
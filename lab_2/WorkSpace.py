@@ -62,11 +62,11 @@ class WorkSpace():
             WorkSpace.recent_files.append(current_file)
 
 class LoadCommand():
-    def execute(self, command):
-        if(len(command.split(" "))) != 2 :
-            print("参数错误，应为：load <file>")
-            return 
-        filePath = command.split(" ")[1]
+    def __init__(self, filePath=""):
+        self.filePath = filePath
+
+    def execute(self):
+        filePath = self.filePath
         if not CommonUtils.pathCheck(filePath):
             return 
         if filePath in WorkSpace.recent_files:
@@ -88,14 +88,17 @@ class LoadCommand():
 
      
 class SaveCommand():
-    def execute(self, command):
-        args = command.split(" ")
-        if len(args) == 1:
+    def __init__(self, target=None):
+        # None 表示当前文件，"all" 表示所有打开的文件
+        self.target = target
+
+    def execute(self):
+        if self.target is None:
             # save 当前文件
             filePath = WorkSpace.current_workFile_path
             self.save_single_file(filePath)
-        elif len(args) == 2:
-            param = args[1]
+        else:
+            param = self.target
             if param == "all":
                 # save 所有文件
                 self.save_all_files()
@@ -110,9 +113,6 @@ class SaveCommand():
                     return
                 self.save_single_file(filePath)
                 WorkSpace.logger.log_command(filePath, f"save {filePath}")
-        else:
-            print("参数错误，应为：save [file|all]")
-            return
 
     def save_single_file(self, file_path):
         """保存单个文件"""
@@ -160,24 +160,17 @@ class SaveCommand():
                
 
 class InitCommand():
-    def execute(self, command):
-        args = command.split(" ")
-        filePath =""
-        withLog = False
-        if len(args)==3:
-            if(not CommonUtils.pathCheck(args[1]) or args[2]!="with-log"):
-                print("参数错误")
-                return 
-            filePath = args[1]
-            withLog = True
-        elif len(args)==2:
-            if(not CommonUtils.pathCheck(args[1])):
-                print("参数错误")
-                return 
-            filePath = args[1]
-        else:
+    def __init__(self, filePath="", flag=None):
+        self.filePath = filePath
+        # 可选的第二个参数只能是 with-log
+        self.flag = flag
+
+    def execute(self):
+        filePath = self.filePath
+        if self.flag not in (None, "with-log") or not CommonUtils.pathCheck(filePath):
             print("参数错误")
             return
+        withLog = self.flag == "with-log"
         if(filePath in File.FileList.all_files_path):
             print("文件已存在")
             return
@@ -195,27 +188,27 @@ class InitCommand():
             WorkSpace.logger.log_command(filePath, f"init {filePath}")
 
 class CloseCommand():
-    def execute(self, command):
-        args = command.split(" ")
-        if len(args) == 1:
+    def __init__(self, filePath=None):
+        # None 表示关闭当前文件
+        self.filePath = filePath
+
+    def execute(self):
+        if self.filePath is None:
             filePath = WorkSpace.current_workFile_path
-        elif len(args) == 2:
-            filePath = args[1]
+        else:
+            filePath = self.filePath
             if not CommonUtils.pathCheck(filePath):
                 print("参数错误")
                 return
             if filePath not in [f.filePath for f in WorkSpace.current_workFile_list.values()]:
                 print("该文件不在当前工作区中")
                 return
-        else:
-            print("参数错误")
-            return
         curFile = WorkSpace.current_workFile_list[filePath]
         if(curFile.state=="modified"):
             op=input("文件已修改，是否保存文件？(y/n)")
             if(op == "y"):
                 #这里调save 的操作
-                SaveCommand().execute(f"save {filePath}")
+                SaveCommand(filePath).execute()
             elif(op == "n"):
                 #n 就直接关闭
                 del WorkSpace.current_workFile_list[filePath]
@@ -239,11 +232,11 @@ class CloseCommand():
 
 
 class EditCommand():
-    def execute(self, command):
-        if(len(command.split(" "))) != 2 :
-            print("参数错误，应为：edit <file>")
-            return
-        filePath = command.split(" ")[1]
+    def __init__(self, filePath=""):
+        self.filePath = filePath
+
+    def execute(self):
+        filePath = self.filePath
         if not CommonUtils.pathCheck(filePath):
                 print("参数错误")
                 return
@@ -260,18 +253,12 @@ class EditCommand():
         WorkSpace.logger.log_command(filePath, f"edit {filePath}")
 
 class EditorListCommand():
-    def execute(self, command):
-        if(len(command.split(" "))) != 1 :
-            print("参数错误，应为：editor-list")
+    def execute(self):
         for f in WorkSpace.current_workFile_list.values():
             print(f.filePath)
 
 class DirTreeCommand():
-    def execute(self, command):
-        if len(command.split(" ")) != 1:
-            print("参数错误，应为：dir-tree")
-            return
-
+    def execute(self):
         paths = list(File.FileList.all_files_path)
         if not paths:
             print("(空)")
@@ -301,11 +288,7 @@ class DirTreeCommand():
         print_tree(tree)
 
 class UndoCommand():
-    def execute(self, command):
-        if len(command.split()) != 1:
-            print("参数错误，应为：undo")
-            return
-        
+    def execute(self):
         # 检查是否有活动文件
         if not WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -322,11 +305,7 @@ class UndoCommand():
         WorkSpace.logger.log_command(current_file, f"undo {current_file}")
 
 class RedoCommand():
-    def execute(self, command):
-        if len(command.split()) != 1:
-            print("参数错误，应为：redo")
-            return
-        
+    def execute(self):
         # 检查是否有活动文件
         if not WorkSpace.current_workFile_path:
             print("没有打开的文件")
@@ -1,19 +1,399 @@
+import argparse
+import atexit
+import io
+import os
 import sys
 import shlex
+import time
+from contextlib import redirect_stdout
+from typing import List, Optional, Tuple
 from core.workspace import Workspace
-from core.logger import Logger
+from core.logger import Logger, BufferedLogSink
+from core.log_rotation import LogRotation
+from core.event_bus import EventBus, POLICIES
+from core.instrument import INSTRUMENTATION
 from core.commands import AppendCommand, InsertCommand, DeleteCommand, ReplaceCommand
-from utils.file_helper import print_dir_tree, print_file_helper
+from core.xml_commands import (InsertBeforeCommand, AppendChildCommand, EditIdCommand, EditTextCommand,
+                               DeleteElementCommand)
+from core.xml_query import compile_query, run_query
+from core.dispatcher import Dispatcher
+from core.log_index import parse_since, query_log
+from utils.file_helper import print_dir_tree, print_file_helper, write_lines
+
+
+# ==============================
+# 命令注册表 (core.dispatcher)：处理函数签名为 handler(workspace, user_input, *参数)
+# ==============================
+def _unknown_command(cmd: str, workspace: Workspace) -> str:
+    if workspace.active_editor:
+        return f"Unknown command: {cmd}"
+    # 没有活动文件时的提示
+    return f"Unknown command '{cmd}' or no active file open."
+
+
+COMMANDS = Dispatcher(has_editor=lambda workspace: workspace.active_editor is not None,
+                      unknown=_unknown_command,
+                      editor_kind=lambda workspace: workspace.active_editor.kind)
+command = COMMANDS.command
+
+
+def execute(workspace: Workspace, parts: List[str], user_input: str) -> bool:
+    """
+    执行一条已解析的命令 (exit 由调用方处理)
+    参数错误或命令执行失败时返回 False
+    """
+    return COMMANDS.dispatch(workspace, parts, user_input)
+
+
+def _run_edit(workspace: Workspace, user_input: str, cmd) -> bool:
+    editor = workspace.active_editor
+    if not editor.execute_command(cmd):
+        return False
+    workspace.notify("command", {"filename": editor.filename, "command_str": user_input})
+    return True
+
+
+# ==============================
+# 指令说明命令
+# ==============================
+@command("help")
+def _help(workspace, user_input):
+    print_file_helper()
+
+
+# ==============================
+# 全局/工作区命令
+# ==============================
+@command("load", "file [backend]", usage="Usage: load <file> [list|piece|rope|lazy]")
+def _load(workspace, user_input, filename, backend):
+    workspace.load_file(filename, backend)
+
+
+@command("save", "[target]")
+def _save(workspace, user_input, target):
+    workspace.save_file(target)
+
+
+@command("init", "file *flags", usage="Usage: init <file> [with-log]")
+def _init(workspace, user_input, filename, flags):
+    workspace.init_file(filename, "with-log" in flags)
+
+
+@command("close", "[target]")
+def _close(workspace, user_input, target):
+    workspace.close_file(target)
+
+
+@command("edit", "file", usage="Usage: edit <file>")
+def _edit(workspace, user_input, filename):
+    workspace.switch_editor(filename)
+
+
+@command("editor-list")
+def _editor_list(workspace, user_input):
+    workspace.list_editors()
+
+
+@command("undo-mem")
+def _undo_mem(workspace, user_input):
+    workspace.report_undo_memory()
+
+
+@command("event-stats")
+def _event_stats(workspace, user_input):
+    workspace.report_events()
+
+
+@command("stats", "[action]", usage="Usage: stats [reset]")
+def _stats(workspace, user_input, action):
+    if action == "reset":
+        INSTRUMENTATION.reset()
+        print("Statistics reset.")
+        return
+    if action is not None:
+        print("Usage: stats [reset]")
+        return False
+    INSTRUMENTATION.report()
+
+
+@command("dir-tree", "[path]")
+def _dir_tree(workspace, user_input, path):
+    print_dir_tree(path or ".")
+
+
+# ==============================
+# 日志命令
+# ==============================
+@command("log-on", "[target]")
+def _log_on(workspace, user_input, target):
+    target = target or workspace.active_editor_name
+    if not target:
+        print("Error: No file specified.")
+        return False
+    workspace.notify("log_on", {"filename": target})
+
+
+@command("log-off", "[target]")
+def _log_off(workspace, user_input, target):
+    target = target or workspace.active_editor_name
+    if target:
+        workspace.notify("log_off", {"filename": target})
+
+
+@command("log-show", "[target] --tail:int --since --grep",
+         usage="Usage: log-show [file] [--tail N] [--since TIMESTAMP] [--grep CMD]",
+         format_error="Error: --tail expects a number")
+def _log_show(workspace, user_input, target, tail, since, grep):
+    target = target or workspace.active_editor_name
+    if not target:
+        print("Error: No file specified.")
+        return False
+    if tail is not None and tail < 0:
+        print("Error: --tail expects a non-negative number")
+        return False
+    try:
+        since_stamp = parse_since(since) if since is not None else None
+    except ValueError:
+        print("Error: --since expects a time like \"20250101 08:00:00\" or 2025-01-01")
+        return False
+    workspace.flush_observers()
+    log_path = f".{target}.log"
+    if not os.path.exists(log_path):
+        print("No log file found.")
+        return
+    # 借助偏移索引直接定位，逐行输出，不把整个日志读进内存
+    print(f"--- Log for {target} ---")
+    _print_paged(query_log(log_path, tail=tail, since=since_stamp, grep=grep))
+    print("------------------------")
+
+
+def _print_paged(lines, page_size: int = 40):
+    """逐行输出；交互终端中每输出一页暂停，输入 q 结束"""
+    interactive = sys.stdin.isatty() and sys.stdout.isatty()
+    for count, line in enumerate(lines, 1):
+        print(line)
+        if interactive and count % page_size == 0:
+            if input("-- more (Enter to continue, q to quit) --").strip().lower() == "q":
+                break
+
+
+# ==============================
+# 编辑器命令 (需要有活动文件)
+# ==============================
+@command("append", "text", usage='Usage: append "text"', requires_editor=True, kind="text")
+def _append(workspace, user_input, text):
+    return _run_edit(workspace, user_input, AppendCommand(workspace.active_editor, text))
+
+
+@command("insert", "pos:pos text", usage='Usage: insert <line:col> "text"',
+         format_error='Error: format should be insert line:col "text"', requires_editor=True, kind="text")
+def _insert(workspace, user_input, pos, text):
+    line, col = pos
+    return _run_edit(workspace, user_input, InsertCommand(workspace.active_editor, line, col, text))
+
+
+@command("delete", "pos:pos length:int", usage="Usage: delete <line:col> <len>",
+         format_error="Error: format should be delete line:col len", requires_editor=True, kind="text")
+def _delete(workspace, user_input, pos, length):
+    line, col = pos
+    return _run_edit(workspace, user_input, DeleteCommand(workspace.active_editor, line, col, length))
+
+
+@command("replace", "pos:pos length:int text", usage='Usage: replace <line:col> <len> "text"',
+         format_error='Error: format should be replace line:col len "text"', requires_editor=True, kind="text")
+def _replace(workspace, user_input, pos, length, text):
+    line, col = pos
+    return _run_edit(workspace, user_input, ReplaceCommand(workspace.active_editor, line, col, length, text))
+
+
+@command("undo", requires_editor=True)
+def _undo(workspace, user_input):
+    editor = workspace.active_editor
+    if not editor.undo():
+        return False
+    workspace.notify("command", {"filename": editor.filename, "command_str": "undo"})
+    print("Undone.")
+    return True
+
+
+@command("redo", requires_editor=True)
+def _redo(workspace, user_input):
+    editor = workspace.active_editor
+    if not editor.redo():
+        return False
+    workspace.notify("command", {"filename": editor.filename, "command_str": "redo"})
+    print("Redone.")
+    return True
+
+
+@command("begin", requires_editor=True)
+def _begin(workspace, user_input):
+    return workspace.begin_transaction()
+
+
+@command("commit", requires_editor=True)
+def _commit(workspace, user_input):
+    return workspace.commit_transaction()
+
+
+@command("rollback", requires_editor=True)
+def _rollback(workspace, user_input):
+    return workspace.rollback_transaction()
+
+
+@command("show", "[span:range]", format_error="Error: format should be show start:end", requires_editor=True,
+         kind="text")
+def _show(workspace, user_input, span):
+    # show [start:end]
+    start, end = span or (1, -1)
+    lines = workspace.active_editor.lines
+    total = len(lines)
+    s_idx = max(0, start - 1)
+    e_idx = total if end == -1 else min(total, end)
+
+    for i, line in enumerate(lines.iter_lines(s_idx, e_idx), s_idx + 1):
+        print(f"{i}: {line}")
+
+
+# ==============================
+# XML 编辑命令 (活动文件为 .xml 时可用)
+# ==============================
+@command("insert-before", "tag new_id target_id [text]",
+         usage='Usage: insert-before <tagName> <newId> <targetId> ["text"]', kind="xml")
+def _insert_before(workspace, user_input, tag, new_id, target_id, text):
+    return _run_edit(workspace, user_input, InsertBeforeCommand(workspace.active_editor, tag, new_id, target_id, text))
+
+
+@command("append-child", "tag new_id parent_id [text]",
+         usage='Usage: append-child <tagName> <newId> <parentId> ["text"]', kind="xml")
+def _append_child(workspace, user_input, tag, new_id, parent_id, text):
+    return _run_edit(workspace, user_input, AppendChildCommand(workspace.active_editor, tag, new_id, parent_id, text))
+
+
+@command("edit-id", "old_id new_id", usage="Usage: edit-id <oldId> <newId>", kind="xml")
+def _edit_id(workspace, user_input, old_id, new_id):
+    return _run_edit(workspace, user_input, EditIdCommand(workspace.active_editor, old_id, new_id))
+
+
+@command("edit-text", "element_id [text]", usage='Usage: edit-text <elementId> ["text"]', kind="xml")
+def _edit_text(workspace, user_input, element_id, text):
+    return _run_edit(workspace, user_input, EditTextCommand(workspace.active_editor, element_id, text))
+
+
+@command("delete", "element_id", usage="Usage: delete <elementId>", kind="xml")
+def _delete_element(workspace, user_input, element_id):
+    return _run_edit(workspace, user_input, DeleteElementCommand(workspace.active_editor, element_id))
+
+
+@command("xml-tree", "[target] --root --depth:int --limit:int",
+         usage="Usage: xml-tree [file] [--root ID] [--depth N] [--limit N]",
+         format_error="Error: --depth and --limit expect a number")
+def _xml_tree(workspace, user_input, target, root, depth, limit):
+    target = target or workspace.active_editor_name
+    if not target:
+        print("Error: No file specified.")
+        return False
+    editor = workspace.editors.get(target)
+    if editor is None:
+        print(f"Error: File {target} not open.")
+        return False
+    if editor.kind != "xml":
+        print("Error: xml-tree only works on .xml files")
+        return False
+    node = None
+    if root is not None:
+        node = editor.find(root)
+        if node is None:
+            print(f"Error: 元素不存在: {root}")
+            return False
+    write_lines(editor.iter_tree(node, depth, limit))
+
+
+@command("xml-find", "query", usage='Usage: xml-find "book[@category=\'COOKING\']/title"', kind="xml")
+def _xml_find(workspace, user_input, query):
+    try:
+        steps = compile_query(query)
+    except ValueError as e:
+        print(f"Error: invalid query: {e}")
+        return False
+    start = time.perf_counter()
+    matches = run_query(workspace.active_editor, steps)
+    elapsed = time.perf_counter() - start
+    write_lines(f'{node.label()} "{node.text}"' if node.text else node.label() for node in matches)
+    print(f"{len(matches)} match(es) in {elapsed * 1000:.3f} ms")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Lab1 Text Editor")
+    parser.add_argument("--script", metavar="FILE",
+                        help="batch mode: run the commands in FILE ('-' reads from stdin)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="batch mode: suppress per-command output, only print the summary")
+    parser.add_argument("--yes", action="store_true",
+                        help="batch mode: save modified files instead of discarding them")
+    parser.add_argument("--log-max-bytes", type=int, default=1024 * 1024, metavar="N",
+                        help="rotate a command log once it grows past N bytes (0 disables size rotation)")
+    parser.add_argument("--log-keep", type=int, default=5, metavar="N",
+                        help="number of rotated log segments to keep")
+    parser.add_argument("--log-rotate-per-session", action="store_true",
+                        help="start a new log segment on the first write of every session")
+    parser.add_argument("--event-bus", action="store_true",
+                        help="deliver observer events on background workers instead of inline")
+    # coalesce 会把同一文件的多条命令事件合并成一条，日志会丢行，不提供给日志观察者
+    parser.add_argument("--log-policy", choices=[p for p in POLICIES if p != "coalesce"], default="block",
+                        help="event bus back-pressure policy for the logger (default: block)")
+    parser.add_argument("--no-atomic-save", action="store_true",
+                        help="save in place instead of via a temporary file; only changed lines are rewritten "
+                             "(faster for large files, but a crash mid-save can leave a partial file)")
+    parser.add_argument("--coalesce", type=float, metavar="SECONDS",
+                        help="interactive mode: merge adjacent edits typed within SECONDS into one undo step")
+    parser.add_argument("--stats", action="store_true",
+                        help="record call counts, latency percentiles and I/O bytes on the hot paths")
+    parser.add_argument("--stats-json", metavar="FILE",
+                        help="like --stats, and dump the statistics to FILE as JSON at exit")
+    options = parser.parse_args(argv)
+
+    if options.stats or options.stats_json:
+        INSTRUMENTATION.enable()
+        if options.stats_json:
+            atexit.register(INSTRUMENTATION.dump_json, options.stats_json)
 
-def main():
     # 1. 系统初始化
     # 初始化工作区
     workspace = Workspace()
-    # 初始化日志模块
-    logger = Logger()
+    workspace.atomic_save = not options.no_atomic_save
+    # 初始化日志模块 (后台线程批量写日志，save/close/exit 时强制落盘；日志按大小/会话轮转)
+    rotation = LogRotation(max_bytes=options.log_max_bytes or None, keep=options.log_keep,
+                           per_session=options.log_rotate_per_session)
+    logger = Logger(sink=BufferedLogSink(rotation=rotation))
     # 将日志模块作为观察者注册到工作区
     workspace.attach(logger) 
+    if options.event_bus:
+        workspace.event_bus = EventBus()
+        workspace.event_bus.subscribe(logger, policy=options.log_policy)
+
+    if options.script is not None:
+        if options.script == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            try:
+                with open(options.script, "r", encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except OSError as e:
+                print(f"Error: cannot read script: {e}", file=sys.stderr)
+                sys.exit(2)
+        failed = run_batch(workspace, lines, quiet=options.quiet, autosave=options.yes)
+        if workspace.event_bus is not None:
+            workspace.event_bus.close()
+        logger.close()
+        sys.exit(1 if failed else 0)
+
+    workspace.coalesce_window = options.coalesce
     workspace.load_workspace_state()
+    run_interactive(workspace)
+
+
+def run_interactive(workspace: Workspace):
     print("==========================================")
     print(" Welcome to Lab1 Text Editor")
     print(" Type 'help' for command list (optional)")
@@ -40,165 +420,15 @@ def main():
             if not parts:
                 continue
 
-            cmd = parts[0]
-            args = parts[1:]
-
-            # ==============================
-            # 指令说明命令
-            # ==============================
-            if cmd == "help":
-                print_file_helper()
-                continue
-
-            # ==============================
-            # 全局/工作区命令
-            # ==============================
-            if cmd == "exit":
+            if parts[0] == "exit":
                 # 【修改点】调用 check_and_exit 处理未保存文件的交互逻辑
                 # 如果返回 True，说明用户处理完了所有文件（保存或放弃），可以安全退出
                 if workspace.check_and_exit():
                     print("Bye!")
                     sys.exit(0)
-            
-            elif cmd == "load":
-                if not args: print("Usage: load <file>"); continue
-                workspace.load_file(args[0])
-
-            elif cmd == "save":
-                target = args[0] if args else None
-                workspace.save_file(target)
-
-            elif cmd == "init":
-                if not args: print("Usage: init <file> [with-log]"); continue
-                with_log = "with-log" in args
-                workspace.init_file(args[0], with_log)
-
-            elif cmd == "close":
-                target = args[0] if args else None
-                workspace.close_file(target)
-            
-            elif cmd == "edit":
-                if not args: print("Usage: edit <file>"); continue
-                workspace.switch_editor(args[0])
-
-            elif cmd == "editor-list":
-                workspace.list_editors()
-
-            elif cmd == "dir-tree":
-                path = args[0] if args else "."
-                print_dir_tree(path)
-
-            # ==============================
-            # 日志命令
-            # ==============================
-            elif cmd == "log-on":
-                target = args[0] if args else workspace.active_editor_name
-                if target: workspace.notify("log_on", {"filename": target})
-                else: print("Error: No file specified.")
-
-            elif cmd == "log-off":
-                target = args[0] if args else workspace.active_editor_name
-                if target: workspace.notify("log_off", {"filename": target})
-
-            elif cmd == "log-show":
-                target = args[0] if args else workspace.active_editor_name
-                if target:
-                    try:
-                        # 尝试读取隐藏的日志文件
-                        with open(f".{target}.log", "r", encoding="utf-8") as f:
-                            print(f"--- Log for {target} ---")
-                            print(f.read())
-                            print("------------------------")
-                    except FileNotFoundError:
-                        print("No log file found.")
-                else: print("Error: No file specified.")
-
-            # ==============================
-            # 编辑器命令 (需要有活动文件)
-            # ==============================
-            elif workspace.active_editor:
-                editor = workspace.active_editor
-                
-                if cmd == "append":
-                    if not args: print("Usage: append \"text\""); continue
-                    if editor.execute_command(AppendCommand(editor, args[0])):
-                        workspace.notify("command", {"filename": editor.filename, "command_str": user_input})
-
-                elif cmd == "insert":
-                    # insert line:col "text"
-                    if len(args) < 2: print("Usage: insert <line:col> \"text\""); continue
-                    try:
-                        if ':' not in args[0]: raise ValueError
-                        l_str, c_str = args[0].split(':')
-                        line, col = int(l_str), int(c_str)
-                        if editor.execute_command(InsertCommand(editor, line, col, args[1])):
-                            workspace.notify("command", {"filename": editor.filename, "command_str": user_input})
-                    except ValueError:
-                        print("Error: format should be insert line:col \"text\"")
-
-                elif cmd == "delete":
-                    # delete line:col len
-                    if len(args) < 2: print("Usage: delete <line:col> <len>"); continue
-                    try:
-                        if ':' not in args[0]: raise ValueError
-                        l_str, c_str = args[0].split(':')
-                        line, col = int(l_str), int(c_str)
-                        length = int(args[1])
-                        if editor.execute_command(DeleteCommand(editor, line, col, length)):
-                            workspace.notify("command", {"filename": editor.filename, "command_str": user_input})
-                    except ValueError:
-                        print("Error: format should be delete line:col len")
-
-                elif cmd == "replace":
-                    # replace line:col len "text"
-                    if len(args) < 3: print("Usage: replace <line:col> <len> \"text\""); continue
-                    try:
-                        if ':' not in args[0]: raise ValueError
-                        l_str, c_str = args[0].split(':')
-                        line, col = int(l_str), int(c_str)
-                        length = int(args[1])
-                        if editor.execute_command(ReplaceCommand(editor, line, col, length, args[2])):
-                            workspace.notify("command", {"filename": editor.filename, "command_str": user_input})
-                    except ValueError:
-                        print("Error: format should be replace line:col len \"text\"")
-
-                elif cmd == "undo":
-                    editor.undo()
-                    workspace.notify("command", {"filename": editor.filename, "command_str": "undo"})
-                    print("Undone.")
-
-                elif cmd == "redo":
-                    editor.redo()
-                    workspace.notify("command", {"filename": editor.filename, "command_str": "redo"})
-                    print("Redone.")
-
-                elif cmd == "show":
-                    # show [start:end]
-                    start, end = 1, -1
-                    if args:
-                        try:
-                            if ':' in args[0]:
-                                s, e = args[0].split(':')
-                                start = int(s) if s else 1
-                                end = int(e) if e else -1
-                        except ValueError: 
-                            print("Error: format should be show start:end")
-                            continue
-                    
-                    lines = editor.lines
-                    total = len(lines)
-                    s_idx = max(0, start - 1)
-                    e_idx = total if end == -1 else min(total, end)
-                    
-                    for i in range(s_idx, e_idx):
-                        print(f"{i+1}: {lines[i]}")
-
-                else:
-                    print(f"Unknown command: {cmd}")
-            
-            else:
-                # 没有活动文件时的提示
-                print(f"Unknown command '{cmd}' or no active file open.")
+                continue
+
+            execute(workspace, parts, user_input)
 
         except KeyboardInterrupt:
             # 捕获 Ctrl+C，同样走安全退出流程
@@ -210,5 +440,120 @@ def main():
         except Exception as e:
             print(f"System Error: {e}")
 
+
+# ==============================
+# 批处理模式
+# ==============================
+class _OutputProbe(io.TextIOBase):
+    """转发命令输出 (quiet 时丢弃)，同时记下第一条 "Error" 开头的行用于判定失败"""
+
+    def __init__(self, target):
+        self.target = target
+        self.error: Optional[str] = None
+        self.last_line: Optional[str] = None
+
+    def reset(self):
+        self.error = None
+        self.last_line = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        if self.error is None and "Error" in s:
+            for line in s.splitlines():
+                if line.startswith("Error"):
+                    self.error = line.strip()
+                    break
+        if s.strip():
+            self.last_line = s.strip().splitlines()[-1]
+        if self.target is not None:
+            self.target.write(s)
+        return len(s)
+
+
+def parse_script(lines: List[str]):
+    """
+    预先解析整个脚本，返回 (命令列表, 解析错误列表)
+    命令为 (行号, 原始文本, 参数列表)；空行和 '#' 开头的注释行被跳过
+    """
+    commands: List[Tuple[int, str, List[str]]] = []
+    errors: List[Tuple[int, str, str]] = []
+    for lineno, raw in enumerate(lines, 1):
+        text = raw.strip()
+        if not text or text.startswith("#"):
+            continue
+        try:
+            parts = shlex.split(text)
+        except ValueError:
+            errors.append((lineno, text, "Error: Invalid command format (unmatched quotes)."))
+            continue
+        if parts:
+            commands.append((lineno, text, parts))
+    return commands, errors
+
+
+def run_batch(workspace: Workspace, lines: List[str], quiet: bool = False,
+              autosave: bool = False, summary=None) -> int:
+    """
+    非交互地执行脚本中的命令，不渲染提示符；结束后向 summary (默认 stderr) 输出耗时与失败统计
+    未保存的文件在 autosave 为 True 时保存，否则丢弃；返回失败的命令数
+    """
+    summary = summary if summary is not None else sys.stderr
+    commands, failures = parse_script(lines)
+    # 批处理中不能向用户提问，close/exit 时按固定策略处理未保存的文件
+    workspace.confirm_save = lambda filename: autosave
+    # 脚本里的命令间隔极短，按时间窗口合并会把整段脚本并成一个撤销单元，批处理中每条命令单独撤销
+    workspace.coalesce_window = None
+    timings = {}
+    executed = 0
+    probe = _OutputProbe(None if quiet else sys.stdout)
+    started = time.perf_counter()
+    with redirect_stdout(probe):
+        for lineno, text, parts in commands:
+            if parts[0] == "exit":
+                break
+            probe.reset()
+            t0 = time.perf_counter()
+            try:
+                ok = execute(workspace, parts, text)
+            except Exception as e:
+                ok = False
+                probe.error = f"System Error: {e}"
+            elapsed = time.perf_counter() - t0
+            executed += 1
+            stat = timings.setdefault(parts[0], [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+            if not ok or probe.error:
+                failures.append((lineno, text, probe.error or probe.last_line or "failed"))
+        # 脚本结束时仍未提交的事务视为失败并回滚
+        for name, editor in workspace.editors.items():
+            if editor.in_transaction:
+                workspace.rollback_transaction(name)
+                failures.append((len(lines) + 1, "(end of script)", f"Error: transaction on {name} was not committed"))
+        unsaved = [name for name, editor in workspace.editors.items() if editor.is_modified]
+        if autosave:
+            for name in unsaved:
+                workspace.save_file(name)
+            unsaved = [name for name in unsaved if workspace.editors[name].is_modified]
+    workspace.flush_observers()
+    total = time.perf_counter() - started
+
+    print(f"Executed {executed} commands in {total:.3f}s, {len(failures)} failed.", file=summary)
+    if timings:
+        print(f"  {'command':<12}{'count':>8}{'total ms':>12}{'avg ms':>10}{'max ms':>10}", file=summary)
+        for name, (count, spent, worst) in sorted(timings.items(), key=lambda item: -item[1][1]):
+            print(f"  {name:<12}{count:>8}{spent * 1000:>12.2f}{spent * 1000 / count:>10.3f}{worst * 1000:>10.3f}",
+                  file=summary)
+    if failures:
+        print("Failures:", file=summary)
+        for lineno, text, message in sorted(failures):
+            print(f"  line {lineno}: {text} -> {message}", file=summary)
+    if unsaved:
+        print(f"Unsaved changes discarded: {', '.join(unsaved)} (use --yes to save)", file=summary)
+    return len(failures)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,77 @@
+import io
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main
+from core.logger import Logger
+from core.workspace import Workspace
+
+
+SCRIPT = """
+# comment lines and blank lines are skipped
+init notes.txt with-log
+append "first"
+insert 9:1 "nowhere"
+append "second
+append "third"
+bogus
+save
+append "unsaved"
+"""
+
+
+def test_batch_runs_script_and_reports(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.attach(Logger())
+    summary = io.StringIO()
+    failed = main.run_batch(ws, SCRIPT.splitlines(), quiet=True, summary=summary)
+    assert capsys.readouterr().out == ""
+    assert failed == 3
+    assert (tmp_path / "notes.txt").read_text(encoding="utf-8") == "# log\nfirst\nthird"
+    report = summary.getvalue()
+    assert "Executed 7 commands" in report
+    assert "line 5: insert 9:1 \"nowhere\" -> Error: Line number 9 out of range." in report
+    assert "line 6: append \"second -> Error: Invalid command format" in report
+    assert "line 8: bogus -> Unknown command: bogus" in report
+    assert "Unsaved changes discarded: notes.txt" in report
+    assert "append \"third\"" in (tmp_path / ".notes.txt.log").read_text(encoding="utf-8")
+
+
+def test_batch_autosave_and_exit(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    lines = ["init a.txt", "append \"x\"", "close", "init b.txt", "append \"y\"", "exit", "append \"z\""]
+    assert main.run_batch(ws, lines, autosave=True, summary=io.StringIO()) == 0
+    # close 时不再向用户提问，按 autosave 策略保存
+    assert "Saved a.txt" in capsys.readouterr().out
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "x"
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == "y"
+
+
+def test_undo_refused_in_transaction_is_not_logged(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.attach(Logger())
+    lines = ["init t.txt with-log", "begin", "append \"a\"", "undo", "commit", "undo", "undo", "save"]
+    summary = io.StringIO()
+    assert main.run_batch(ws, lines, summary=summary) == 2
+    out = capsys.readouterr().out
+    assert "Error: Cannot undo inside a transaction, use rollback." in out
+    assert "Nothing to undo." in out
+    assert out.count("Undone.") == 1
+    assert "line 4: undo -> Error: Cannot undo inside a transaction" in summary.getvalue()
+    log = (tmp_path / ".t.txt.log").read_text(encoding="utf-8")
+    assert log.count("undo") == 1
+    assert "append \"a\"" in log
+
+
+def test_batch_undoes_one_command_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    # 即使交互模式开启了合并窗口，脚本中的每条命令仍是独立的撤销单元
+    ws.coalesce_window = 1.0
+    lines = ["init t.txt", "append \"a\"", "append \"b\"", "append \"c\"", "undo", "save"]
+    assert main.run_batch(ws, lines, quiet=True, summary=io.StringIO()) == 0
+    assert (tmp_path / "t.txt").read_text(encoding="utf-8") == "a\nb"
+    assert ws.editors["t.txt"].undo_depth == 2
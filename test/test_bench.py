@@ -0,0 +1,19 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from bench_core import SCENARIOS, compare, make_file, parse_size, run
+
+
+def test_synthetic_file_size(tmp_path):
+    path = str(tmp_path / "f.txt")
+    make_file(path, parse_size("3KB"), seed=1)
+    assert os.path.getsize(path) == 3072
+
+
+def test_smoke_run_and_compare(tmp_path):
+    result = run([parse_size("1KB")], ops=20, repeat=1, seed=1, workdir=str(tmp_path))
+    assert set(result["results"]) == {f"{name}@1KB" for name in SCENARIOS}
+    assert all(r["median_s"] > 0 for r in result["results"].values())
+    faster_baseline = {"results": {k: dict(v, median_s=v["median_s"] / 2) for k, v in result["results"].items()}}
+    assert compare(result, result, 0.1) == []
+    assert sorted(compare(result, faster_baseline, 0.1)) == sorted(result["results"])
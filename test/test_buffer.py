@@ -0,0 +1,160 @@
+import os
+import random
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.buffer import ListBuffer, PieceTableBuffer
+from core.rope import RopeBuffer
+from core.editor import TextEditor
+from core.commands import AppendCommand, InsertCommand, DeleteCommand, ReplaceCommand
+
+
+def random_edits(buf, ref, steps=400, seed=7):
+    """对 buf 和参考实现 ref (普通 list) 做同样的随机编辑，逐步比对"""
+    rnd = random.Random(seed)
+    for _ in range(steps):
+        op = rnd.choice(["append", "insert", "pop", "set", "ins_text", "del_text"])
+        if op == "append" or not ref:
+            text = rnd.choice(["", "abc", "hello world", "x" * 5])
+            buf.append(text)
+            ref.append(text)
+        elif op == "insert":
+            i = rnd.randrange(len(ref) + 1)
+            buf.insert(i, "new%d" % i)
+            ref.insert(i, "new%d" % i)
+        elif op == "pop":
+            i = rnd.randrange(len(ref))
+            assert buf.pop(i) == ref.pop(i)
+        elif op == "set":
+            i = rnd.randrange(len(ref))
+            buf[i] = "set"
+            ref[i] = "set"
+        elif op == "ins_text":
+            i = rnd.randrange(len(ref))
+            col = rnd.randrange(len(ref[i]) + 1)
+            buf.insert_text(i, col, "ZZ")
+            ref[i] = ref[i][:col] + "ZZ" + ref[i][col:]
+        else:
+            i = rnd.randrange(len(ref))
+            if not ref[i]:
+                continue
+            col = rnd.randrange(len(ref[i]))
+            length = rnd.randrange(len(ref[i]) - col + 1)
+            assert buf.delete_text(i, col, length) == ref[i][col:col + length]
+            ref[i] = ref[i][:col] + ref[i][col + length:]
+        assert len(buf) == len(ref)
+    assert list(buf) == ref
+    assert buf.get_text() == "\n".join(ref)
+    assert [buf.line_length(i) for i in range(len(ref))] == [len(s) for s in ref]
+    assert list(buf.iter_lines(3, 9)) == ref[3:9]
+
+
+def test_list_buffer_matches_list():
+    random_edits(ListBuffer(["a", "b"]), ["a", "b"])
+
+
+def test_piece_table_matches_list():
+    random_edits(PieceTableBuffer(["first line", "", "third"]), ["first line", "", "third"])
+
+
+def test_rope_matches_list():
+    random_edits(RopeBuffer(["r%d" % i for i in range(50)]), ["r%d" % i for i in range(50)], steps=800)
+
+
+def test_rope_stays_balanced():
+    buf = RopeBuffer()
+    for i in range(4096):
+        buf.insert(0, str(i))
+    # AVL 高度上界约 1.44 * log2(n)
+    assert buf._root.height <= 18
+    assert buf[0] == "4095" and buf[-1] == "0"
+
+
+def test_piece_table_compaction_keeps_content():
+    buf = PieceTableBuffer(["x"])
+    buf.MAX_PIECES = 8
+    ref = ["x"]
+    random_edits(buf, ref, steps=200, seed=3)
+
+
+def test_piece_table_small_blocks_match_list():
+    # 块很小时编辑会频繁跨块删除、拆分块
+    lines = ["p%d" % i for i in range(30)]
+    buf = PieceTableBuffer(lines)
+    buf.BLOCK_SIZE = 2
+    random_edits(buf, list(lines), steps=800, seed=5)
+    assert sum(len(block) for block in buf._blocks) == buf._piece_count
+
+
+def test_from_text_matches_readlines():
+    for text in ["", "a", "a\n", "a\n\nb", "a\nb\n", "\n"]:
+        expected = [line.rstrip("\n") for line in text.splitlines(keepends=True)]
+        assert list(PieceTableBuffer.from_text(text)) == expected
+        assert list(ListBuffer.from_text(text)) == expected
+        assert list(RopeBuffer.from_text(text)) == expected
+
+
+def test_commands_on_piece_table_backend():
+    editor = TextEditor("t.txt", backend="piece")
+    editor.execute_command(AppendCommand(editor, "Hello World"))
+    editor.execute_command(AppendCommand(editor, "This is line 2"))
+    editor.execute_command(InsertCommand(editor, 1, 6, " Python"))
+    assert editor.get_content_str() == "Hello Python World\nThis is line 2"
+    editor.execute_command(DeleteCommand(editor, 1, 6, 7))
+    editor.execute_command(ReplaceCommand(editor, 2, 9, 4, "Code"))
+    assert editor.get_content_str() == "Hello World\nThis is Code 2"
+    editor.undo()
+    editor.undo()
+    assert editor.get_content_str() == "Hello Python World\nThis is line 2"
+    editor.redo()
+    assert editor.get_content_str() == "Hello World\nThis is line 2"
+    assert not editor.execute_command(InsertCommand(editor, 3, 1, "x"))
+    assert not editor.execute_command(DeleteCommand(editor, 1, 1, 100))
+
+
+def test_workspace_picks_rope_for_large_files(tmp_path, monkeypatch):
+    from core.workspace import Workspace
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "big.txt").write_text("a\nb\nc\n", encoding="utf-8")
+    (tmp_path / "small.txt").write_text("a", encoding="utf-8")
+    ws = Workspace()
+    ws.rope_threshold = 4
+    ws.load_file("big.txt")
+    ws.load_file("small.txt")
+    ws.load_file("other.txt", "piece")
+    assert isinstance(ws.editors["big.txt"].lines, RopeBuffer)
+    assert isinstance(ws.editors["small.txt"].lines, ListBuffer)
+    assert isinstance(ws.editors["other.txt"].lines, PieceTableBuffer)
+    assert list(ws.editors["big.txt"].lines) == ["a", "b", "c"]
+
+
+def test_lazy_buffer_edits_and_save(tmp_path, monkeypatch):
+    from core.mmap_buffer import MmapLineBuffer
+    from core.workspace import Workspace
+    monkeypatch.chdir(tmp_path)
+    ref = ["line %d" % i for i in range(2000)]
+    (tmp_path / "huge.txt").write_text("\n".join(ref) + "\n", encoding="utf-8")
+    ws = Workspace()
+    # 这里直接改缓冲区而不经过命令，没有脏行记录，关闭增量保存
+    ws.incremental_save = False
+    ws.load_file("huge.txt", "lazy")
+    buf = ws.editors["huge.txt"].lines
+    assert isinstance(buf, MmapLineBuffer)
+    assert len(buf) == 2000 and buf[1999] == "line 1999"
+    random_edits(buf, ref, steps=300, seed=11)
+    ws.save_file("huge.txt")
+    # 原文件以换行结尾，保存后保留
+    assert (tmp_path / "huge.txt").read_text(encoding="utf-8") == "\n".join(ref) + "\n"
+    # 保存后重新映射，内容回到未修改状态
+    assert list(ws.editors["huge.txt"].lines) == ref
+    ws.close_file("huge.txt")
+
+
+def test_lazy_index_without_trailing_newline(tmp_path):
+    from core.mmap_buffer import MmapLineBuffer
+    for text in ["a", "a\n\nb", "\n", "x\ny\n"]:
+        path = tmp_path / "f.txt"
+        path.write_bytes(text.encode("utf-8"))
+        buf = MmapLineBuffer.from_file(str(path))
+        assert list(buf) == list(PieceTableBuffer.from_text(text))
+        assert b"".join(buf.iter_encoded()) == buf.get_text().encode("utf-8")
+        buf.close()
@@ -0,0 +1,76 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pytest
+from core.dispatcher import Dispatcher, DispatchError, compile_schema
+
+
+def test_schema_parsing():
+    d = Dispatcher()
+    spec = d.register("replace", lambda ctx, raw, *a: a, "pos:pos length:int text [count:int] *rest",
+                      format_error="bad format")
+    assert spec.parse(["2:3", "4", "txt"]) == [(2, 3), 4, "txt", None, []]
+    assert spec.parse(["2:3", "4", "txt", "5", "a", "b"]) == [(2, 3), 4, "txt", 5, ["a", "b"]]
+    with pytest.raises(DispatchError, match="Usage: replace"):
+        spec.parse(["2:3"])
+    with pytest.raises(DispatchError, match="bad format"):
+        spec.parse(["2-3", "4", "txt"])
+    show = d.register("show", lambda ctx, raw, span: span, "[span:range]")
+    assert show.parse([":5"]) == [(1, 5)] and show.parse(["all"]) == [(1, -1)]
+    with pytest.raises(ValueError):
+        compile_schema("[a] b")
+    with pytest.raises(ValueError):
+        compile_schema("x:nosuchtype")
+
+
+def test_dispatch_and_registration(capsys):
+    calls = []
+    d = Dispatcher(has_editor=lambda ctx: ctx["editor"], unknown=lambda name, ctx: "nope " + name)
+
+    @d.command("spell-check", "[lang]", requires_editor=True)
+    def spell_check(ctx, raw, lang):
+        calls.append((raw, lang))
+
+    assert d.dispatch({"editor": True}, ["spell-check", "en"], "spell-check en")
+    assert calls == [("spell-check en", "en")]
+    assert not d.dispatch({"editor": False}, ["spell-check"])
+    assert not d.dispatch({"editor": True}, ["missing"])
+    assert capsys.readouterr().out == "nope spell-check\nnope missing\n"
+    with pytest.raises(ValueError):
+        d.register("spell-check", spell_check)
+
+
+def test_main_commands_use_registry(tmp_path, monkeypatch, capsys):
+    import main
+    from core.workspace import Workspace
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    assert "insert" in main.COMMANDS
+    assert not main.execute(ws, ["append", "x"], 'append "x"')
+    assert main.execute(ws, ["init", "a.txt"], "init a.txt")
+    assert main.execute(ws, ["append", "hello"], 'append "hello"')
+    assert not main.execute(ws, ["insert", "1-1", "x"], 'insert 1-1 "x"')
+    assert main.execute(ws, ["insert", "1:6", "!"], 'insert 1:6 "!"')
+    assert ws.active_editor.get_content_str() == "hello!"
+    out = capsys.readouterr().out
+    assert "Unknown command 'append' or no active file open." in out
+    assert 'Error: format should be insert line:col "text"' in out
+
+
+def test_lab2_rejects_unexpected_arguments(tmp_path, monkeypatch, capsys):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab_2"))
+    import Run
+    monkeypatch.chdir(tmp_path)
+    factory = Run.CommandFactory()
+    assert factory.execute("init a.txt")
+    assert factory.execute('append "hello world"')
+    capsys.readouterr()
+    # 范围必须写全；多余的参数同样报错，而不是显示全文
+    for command in ("show 1", "show 1:1 3", "load a.txt b.txt"):
+        assert not factory.execute(command)
+    assert capsys.readouterr().out.count("参数错误") == 3
+    # getCommand 仍返回接收整行命令的对象
+    assert factory.getCommand("append").execute('append "two"')
+    factory.getCommand("show").execute("show 2:2")
+    assert capsys.readouterr().out.endswith("2: two\n")
+    assert factory.getCommand("nope") is None
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.event_bus import EventBus
+from core.interfaces import Observer
+from core.logger import Logger
+from core.workspace import Workspace
+
+
+class Recorder(Observer):
+    def __init__(self, gate=None):
+        self.events = []
+        self.gate = gate
+
+    def update(self, event_type, data):
+        if self.gate is not None:
+            self.gate.wait()
+        self.events.append((event_type, data.get("n")))
+
+
+def test_events_delivered_in_order_off_thread_and_flush_is_a_barrier():
+    gate = threading.Event()
+    bus = EventBus()
+    slow, fast = Recorder(gate), Recorder()
+    for i in range(50):
+        bus.publish([slow, fast], "command", {"n": i})
+    bus.subscribe(fast).drain()
+    assert fast.events == [("command", i) for i in range(50)]
+    # 慢观察者不阻塞发布方
+    assert slow.events == []
+    gate.set()
+    bus.flush()
+    assert slow.events == fast.events
+    assert bus.stats()["Recorder"]["delivered"] == 50
+    bus.close()
+
+
+def test_back_pressure_policies():
+    gate = threading.Event()
+    bus = EventBus()
+    dropping, coalescing = Recorder(gate), Recorder(gate)
+    bus.subscribe(dropping, policy="drop-oldest", max_queue=3)
+    bus.subscribe(coalescing, policy="coalesce", max_queue=3)
+    bus.publish([dropping, coalescing], "command", {"n": 0, "filename": "warm"})
+    # 第一条已被投递线程取走并卡在 gate 上，之后的事件都在队列里
+    while bus.stats()["Recorder"]["queued"] or bus.stats()["Recorder#1"]["queued"]:
+        time.sleep(0.001)
+    for i in range(1, 11):
+        bus.publish([dropping, coalescing], "command", {"n": i, "filename": "a.txt"})
+    gate.set()
+    bus.flush()
+    assert dropping.events == [("command", n) for n in (0, 8, 9, 10)]
+    assert coalescing.events == [("command", 0), ("command", 10)]
+    stats = bus.stats()
+    assert stats["Recorder"]["dropped"] == 7 and stats["Recorder#1"]["coalesced"] == 9
+    bus.close()
+
+
+def test_workspace_bus_mode_logs_after_barrier(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    logger = Logger()
+    ws.attach(logger)
+    ws.event_bus = EventBus()
+    ws.init_file("a.txt", with_log=True)
+    for i in range(20):
+        ws.notify("command", {"filename": "a.txt", "command_str": 'append "%d"' % i})
+    ws.save_file("a.txt")
+    lines = (tmp_path / ".a.txt.log").read_text(encoding="utf-8").splitlines()
+    assert [line.split(" ", 2)[2] for line in lines[2:]] == ['append "%d"' % i for i in range(20)] + ["save"]
+    ws.event_bus.close()
+
+
+def test_logger_channel_never_coalesces():
+    bus = EventBus(default_policy="coalesce")
+    channel = bus.subscribe(Logger())
+    assert channel.policy == "block"
+    bus.close()
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.commands import AppendCommand
+from core.editor import Editor
+from core.event_bus import EventBus
+from core.instrument import Histogram, Instrumentation
+from core.workspace import Workspace
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for ns in range(1, 1001):
+        h.add(ns * 1000)
+    # 对数分桶的误差在一个子桶 (约 19%) 以内
+    assert 500000 <= h.percentile(50) <= 500000 * 1.19
+    assert 990000 <= h.percentile(99) <= 1000000
+    assert h.percentile(100) == h.max == 1000000
+
+
+def test_wrappers_record_and_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("one\ntwo", encoding="utf-8")
+    original = Editor.execute_command
+    inst = Instrumentation()
+    inst.enable()
+    try:
+        ws = Workspace()
+        ws.atomic_save = False
+        ws.load_file("a.txt")
+        # 已打开的文件再次 load 只切换，不重新读盘
+        ws.load_file("a.txt")
+        editor = ws.active_editor
+        editor.coalesce_window = None
+        for i in range(5):
+            editor.execute_command(AppendCommand(editor, "x"))
+        editor.undo()
+        ws.save_file()
+    finally:
+        inst.disable()
+    assert Editor.execute_command is original
+    stats = inst.snapshot()
+    assert stats["editor.execute_command"]["count"] == 5
+    assert stats["editor.undo"]["count"] == 1
+    assert stats["workspace.load_file"]["bytes_read"] == 7
+    assert stats["workspace.save_editor"]["bytes_written"] == len("\nx") * 4
+    assert stats["workspace.notify"]["count"] >= 2
+    inst.dump_json(str(tmp_path / "stats.json"))
+    assert json.loads((tmp_path / "stats.json").read_text())["editor.undo"]["p99_ms"] > 0
+
+
+def test_notify_counted_with_event_bus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    inst = Instrumentation()
+    inst.enable()
+    try:
+        ws = Workspace()
+        ws.event_bus = EventBus()
+        ws.init_file("b.txt")
+        ws.active_editor.execute_command(AppendCommand(ws.active_editor, "x"))
+        ws.notify("command", {"filename": "b.txt", "command_str": "append \"x\""})
+        ws.event_bus.close()
+    finally:
+        inst.disable()
+    assert inst.snapshot()["workspace.notify"]["count"] >= 2
@@ -0,0 +1,70 @@
+import datetime
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.log_index import RECORD, append_entries, index_path, parse_since, query_log
+
+
+def entry(day, minute, message):
+    when = datetime.datetime(2025, 1, day, 8, minute)
+    return "%s %s\n" % (when.strftime("%Y%m%d %H:%M:%S"), message), int(when.timestamp())
+
+
+def write_log(path):
+    rows = [entry(1 + i // 60, i % 60, "append \"row %d\"" % i if i % 3 else "save") for i in range(300)]
+    for start in range(0, len(rows), 7):
+        append_entries(path, rows[start:start + 7])
+    return [text.rstrip("\n") for text, _ in rows]
+
+
+def test_tail_since_and_grep(tmp_path):
+    path = str(tmp_path / ".a.txt.log")
+    rows = write_log(path)
+    assert os.path.getsize(index_path(path)) == RECORD.size * 300
+    assert list(query_log(path)) == rows
+    assert list(query_log(path, tail=3)) == rows[-3:]
+    assert list(query_log(path, since=parse_since("2025-01-03"))) == rows[120:]
+    assert list(query_log(path, since=parse_since("20250103 08:30:00"), tail=2)) == rows[-2:]
+    assert list(query_log(path, grep="save", tail=2)) == [rows[294], rows[297]]
+    # grep 只匹配命令部分，不匹配时间戳
+    assert list(query_log(path, grep="2025")) == []
+    assert list(query_log(path, since=parse_since("2030-01-01"))) == []
+    assert list(query_log(str(tmp_path / "missing.log"))) == []
+
+
+def test_index_rebuilt_for_legacy_or_stale_logs(tmp_path):
+    path = str(tmp_path / ".b.txt.log")
+    rows = write_log(path)
+    # 没有索引的旧日志：查询时重建
+    os.remove(index_path(path))
+    assert list(query_log(path, tail=1)) == rows[-1:]
+    # 索引落后于日志 (例如写索引前中断)：检测到不一致后重建
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("20250109 08:00:00 append \"late\"\n")
+    assert list(query_log(path, tail=2)) == [rows[-1], "20250109 08:00:00 append \"late\""]
+    # 旧日志第一次追加时先补建索引
+    os.remove(index_path(path))
+    append_entries(path, [entry(10, 0, "close")])
+    assert os.path.getsize(index_path(path)) == RECORD.size * 302
+
+
+def test_log_show_command(tmp_path, monkeypatch, capsys):
+    import main
+    from core.logger import Logger
+    from core.workspace import Workspace
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.attach(Logger())
+    main.execute(ws, ["init", "n.txt", "with-log"], "init n.txt with-log")
+    for i in range(5):
+        main.execute(ws, ["append", str(i)], 'append "%d"' % i)
+    capsys.readouterr()
+    assert main.execute(ws, ["log-show", "--tail", "2"], "log-show --tail 2")
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "--- Log for n.txt ---"
+    assert [line.split(" ", 2)[2] for line in out[1:3]] == ['append "3"', 'append "4"']
+    assert not main.execute(ws, ["log-show", "--since", "yesterday"], "log-show --since yesterday")
+    assert not main.execute(ws, ["log-show", "--tail", "x"], "log-show --tail x")
+    assert not main.execute(ws, ["log-show", "--tail", "-1", "--grep", "append"], "log-show --tail -1 --grep append")
+    assert "non-negative" in capsys.readouterr().out
+    assert not main.execute(ws, ["log-show", "--bogus", "1"], "log-show --bogus 1")
@@ -0,0 +1,67 @@
+import datetime
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.log_index import append_entries, index_path, parse_since, query_log, remove_log, rotated_segments
+from core.log_rotation import LogRotation
+from core.logger import FileLogSink
+
+
+def entry(i):
+    when = datetime.datetime(2025, 1, 1 + i // 60, 8, i % 60)
+    return "%s append \"row %d\"\n" % (when.strftime("%Y%m%d %H:%M:%S"), i), int(when.timestamp())
+
+
+def write_rotated(path, rotation, count):
+    for i in range(count):
+        text, stamp = entry(i)
+        rotation.maybe_rotate(path, len(text))
+        append_entries(path, [(text, stamp)])
+    rotation.wait()
+    return [entry(i)[0].rstrip("\n") for i in range(count)]
+
+
+def test_size_rotation_compresses_and_reads_across_segments(tmp_path):
+    path = str(tmp_path / ".a.txt.log")
+    rotation = LogRotation(max_bytes=400, keep=10)
+    rows = write_rotated(path, rotation, 60)
+    segments = rotated_segments(path)
+    assert len(segments) >= 3
+    # 最新的历史段保持未压缩，更旧的在后台压缩为 gzip
+    assert segments[0] == path + ".1"
+    assert all(s.endswith(".gz") for s in segments[1:])
+    assert os.path.getsize(path) <= 400
+    assert list(query_log(path)) == rows
+    assert list(query_log(path, tail=25)) == rows[-25:]
+    assert list(query_log(path, since=parse_since("20250101 08:07:00"))) == rows[7:]
+    assert list(query_log(path, grep="row 1", tail=3)) == [r for r in rows if "row 1" in r][-3:]
+    # 历史段的索引缺失时按需重建 (压缩段也可以)
+    os.remove(index_path(segments[-1]))
+    assert list(query_log(path, tail=60)) == rows
+    rotation.close()
+
+
+def test_retention_and_remove(tmp_path):
+    path = str(tmp_path / ".b.txt.log")
+    rotation = LogRotation(max_bytes=200, keep=2)
+    rows = write_rotated(path, rotation, 40)
+    assert rotated_segments(path) == [path + ".1", path + ".2.gz"]
+    assert not os.path.exists(path + ".3.gz")
+    # 超出保留数量的旧日志已删除，剩下的仍按顺序连续
+    kept = list(query_log(path))
+    assert kept == rows[-len(kept):] and len(kept) < len(rows)
+    remove_log(path)
+    assert os.listdir(str(tmp_path)) == []
+    rotation.close()
+
+
+def test_session_rotation(tmp_path):
+    path = str(tmp_path / ".c.txt.log")
+    FileLogSink().write(path, "session start at 20250101 08:00:00\n", "c.txt", 0)
+    sink = FileLogSink(LogRotation(max_bytes=None, per_session=True))
+    sink.write(path, "session start at 20250102 08:00:00\n", "c.txt", 1)
+    sink.write(path, "20250102 08:00:01 save\n", "c.txt", 2)
+    sink.close()
+    assert rotated_segments(path) == [path + ".1"]
+    assert list(query_log(path)) == ["session start at 20250101 08:00:00",
+                                     "session start at 20250102 08:00:00", "20250102 08:00:01 save"]
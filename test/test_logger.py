@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.logger import Logger, BufferedLogSink
+from core.workspace import Workspace
+from core.commands import AppendCommand, ReplaceCommand
+
+
+def test_buffered_sink_batches_until_flush(tmp_path):
+    sink = BufferedLogSink(flush_bytes=1 << 20, flush_interval=60)
+    path = str(tmp_path / ".a.log")
+    for i in range(100):
+        sink.write(path, "entry %d\n" % i, "a")
+    assert not os.path.exists(path)
+    sink.flush()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "".join("entry %d\n" % i for i in range(100))
+    sink.close()
+    # 关闭后退化为同步写入
+    sink.write(path, "late\n", "a")
+    with open(path, encoding="utf-8") as f:
+        assert f.read().endswith("entry 99\nlate\n")
+
+
+def test_buffered_sink_flushes_on_interval(tmp_path):
+    sink = BufferedLogSink(flush_interval=0.05)
+    path = str(tmp_path / ".b.log")
+    sink.write(path, "x\n", "b")
+    deadline = time.time() + 5
+    while not os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "x\n"
+    sink.close()
+
+
+def test_buffered_sink_survives_unexpected_write_errors(tmp_path, monkeypatch, capsys):
+    import core.logger
+    sink = BufferedLogSink(flush_interval=60)
+    path = str(tmp_path / ".c.log")
+    real = core.logger.append_entries
+
+    def broken(*args):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(core.logger, "append_entries", broken)
+    sink.write(path, "lost\n", "c")
+    sink.flush()
+    assert "disk on fire" in capsys.readouterr().out
+    # 写线程仍然存活，后续条目照常落盘
+    monkeypatch.setattr(core.logger, "append_entries", real)
+    sink.write(path, "kept\n", "c")
+    sink.flush()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "kept\n"
+    sink.close()
+
+
+def test_logger_format_matches_sync_writer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sync_ws, async_ws = Workspace(), Workspace()
+    sync_ws.attach(Logger())
+    logger = Logger(sink=BufferedLogSink(flush_interval=60))
+    async_ws.attach(logger)
+    for ws, name in ((sync_ws, "s.txt"), (async_ws, "a.txt")):
+        ws.init_file(name, with_log=True)
+        ws.notify("command", {"filename": name, "command_str": 'append "hi"'})
+        ws.save_file(name)
+    # save 之后日志已经落盘
+    read = lambda n: (tmp_path / (".%s.log" % n)).read_text(encoding="utf-8")
+    strip = lambda text: [line.split(" ", 2)[2] for line in text.splitlines()]
+    assert strip(read("a.txt")) == [line.replace("s.txt", "a.txt") for line in strip(read("s.txt"))]
+    assert read("a.txt").endswith(" save\n")
+    logger.close()
+
+
+def test_log_header_filter_compiled_once_and_refreshed_on_line_one_edits(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "f.txt").write_text("# log -e append -e bogus\nbody", encoding="utf-8")
+    ws = Workspace()
+    logger = Logger()
+    ws.attach(logger)
+    compiled = []
+    original = Logger._set_header
+    monkeypatch.setattr(Logger, "_set_header", lambda self, f, h: compiled.append(h) or original(self, f, h))
+    ws.load_file("f.txt")
+    assert logger.excluded_commands("f.txt") == {"append", "bogus"}
+    editor = ws.active_editor
+    for i in range(3):
+        editor.execute_command(AppendCommand(editor, "x%d" % i))
+        ws.notify("command", {"filename": "f.txt", "command_str": 'append "x%d"' % i})
+    editor.execute_command(ReplaceCommand(editor, 2, 1, 4, "BODY"))
+    ws.notify("command", {"filename": "f.txt", "command_str": 'replace 2:1 4 "BODY"'})
+    assert len(compiled) == 1
+    # 修改首行后重新编译：不再排除 append
+    editor.execute_command(ReplaceCommand(editor, 1, 7, 18, ""))
+    ws.notify("command", {"filename": "f.txt", "command_str": "replace 1:7 18"})
+    ws.notify("command", {"filename": "f.txt", "command_str": 'append "y"'})
+    assert len(compiled) == 2 and logger.excluded_commands("f.txt") == frozenset()
+    logged = [line.split(" ", 2)[2] for line in (tmp_path / ".f.txt.log").read_text(encoding="utf-8").splitlines()]
+    assert logged[1:] == ["load f.txt", 'replace 2:1 4 "BODY"', "replace 1:7 18", 'append "y"']
+    assert capsys.readouterr().out.count("unknown command 'bogus'") == 1
+
+
+def test_log_filter_accepts_xml_commands():
+    from core.log_filter import compile_log_filter
+    excluded, problems = compile_log_filter("# log -e insert-before -e append-child -e edit-id -e edit-text")
+    assert problems == []
+    assert excluded == {"insert-before", "append-child", "edit-id", "edit-text"}
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab_2"))
+import File
+import Memento
+
+
+def make_file(path, lines):
+    tf = File.TextFile(path, content=list(lines))
+    File.FileList.all_files[path] = tf
+    File.FileList.all_files_path.add(path)
+    return tf
+
+
+def test_journal_appends_and_recovers_last(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    File.FileList.all_files.clear()
+    a = make_file("a.txt", ["one"])
+    Memento.update("a.txt", {"a.txt": a})
+    size = os.path.getsize("memento.txt")
+    a.content.append("two")
+    Memento.update("a.txt", {"a.txt": a})
+    # 只追加，不重写之前的记录
+    with open("memento.txt", "rb") as f:
+        data = f.read()
+    assert len(data) > size
+    state = Memento.recover()
+    assert state["all_files"][0]["content"] == ["one", "two"]
+
+    # 最后一条写了一半：回退到上一条并截掉残缺部分
+    with open("memento.txt", "ab") as f:
+        f.write(Memento._encode_record({"current_workFile_path": "x"})[:-3])
+    assert Memento.recover()["all_files"][0]["content"] == ["one", "two"]
+    assert os.path.getsize("memento.txt") == len(data)
+
+
+def test_journal_compacts_and_migrates_legacy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    File.FileList.all_files.clear()
+    legacy = [{"current_workFile_path": "old%d" % i, "all_files": []} for i in range(3)]
+    with open("memento.txt", "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+    assert Memento.recover()["current_workFile_path"] == "old2"
+
+    monkeypatch.setattr(Memento, "COMPACT_MIN_BYTES", 0)
+    monkeypatch.setattr(Memento, "COMPACT_FACTOR", 4)
+    b = make_file("b.txt", ["x"])
+    for i in range(20):
+        Memento.update("b.txt" if i % 2 else "", {"b.txt": b})
+        record = len(Memento._encode_record(Memento._read_last_state()))
+        assert os.path.getsize("memento.txt") <= len(Memento.MAGIC) + record * 5
+    assert Memento.recover()["current_workFile_path"] == "b.txt"
+
+
+def test_snapshots_share_unchanged_contents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    File.FileList.all_files.clear()
+    big = make_file("big.txt", ["line %d" % i for i in range(5000)])
+    small = make_file("small.txt", ["a"])
+    Memento.update("small.txt", {"big.txt": big, "small.txt": small})
+    size = os.path.getsize("memento.txt")
+    for i in range(10):
+        small.content.append(str(i))
+        Memento.update("small.txt", {"big.txt": big, "small.txt": small})
+    # 大文件没有变化，每个快照只增加一条引用
+    assert os.path.getsize("memento.txt") - size < 10 * 1000
+    assert len(os.listdir(Memento.BLOB_DIR)) == 12
+    state = Memento.recover()
+    contents = {f["filePath"]: f["content"] for f in state["all_files"]}
+    assert contents["big.txt"] == big.content
+    assert contents["small.txt"] == ["a"] + [str(i) for i in range(10)]
+
+    # 压缩后只保留最后快照引用的两个 blob
+    Memento.compact()
+    assert len(os.listdir(Memento.BLOB_DIR)) == 2
+    assert Memento.recover()["all_files"][0]["content"] == big.content
+
+
+def test_unchanged_files_reuse_cached_digest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    File.FileList.all_files.clear()
+    a = make_file("a.txt", ["one"])
+    Memento.update("a.txt", {"a.txt": a})
+    hashed = []
+    real = Memento.hashlib.sha256
+    monkeypatch.setattr(Memento.hashlib, "sha256", lambda data: hashed.append(data) or real(data))
+    Memento.update("a.txt", {"a.txt": a})
+    assert hashed == []
+    a.content[0] = "ONE"
+    Memento.update("a.txt", {"a.txt": a})
+    assert len(hashed) == 1
+    assert Memento.recover()["all_files"][0]["content"] == ["ONE"]
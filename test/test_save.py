@@ -0,0 +1,227 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pytest
+from core.buffer import ListBuffer
+from core.writer import StreamingWriter, iter_line_chunks
+from core.workspace import Workspace
+from core.commands import AppendCommand, InsertCommand, ReplaceCommand, DeleteCommand
+
+
+def test_line_chunks_match_join():
+    lines = ["alpha", "", "βγδ", "x" * 100, "omega"]
+    chunks = list(iter_line_chunks(lines, chunk_size=16))
+    assert b"".join(chunks) == "\n".join(lines).encode("utf-8")
+    # 每块最多超出 chunk_size 一行的长度
+    assert all(len(c) < 16 + 101 for c in chunks)
+    assert len(chunks) > 1
+    assert list(iter_line_chunks([])) == []
+
+
+def test_buffer_iter_encoded_roundtrip():
+    buf = ListBuffer(["a", "b", ""])
+    assert b"".join(buf.iter_encoded(chunk_size=1)) == b"a\nb\n"
+
+
+def test_atomic_write_keeps_original_on_failure(tmp_path):
+    target = tmp_path / "doc.txt"
+    target.write_text("original", encoding="utf-8")
+
+    def broken_chunks():
+        yield b"partial"
+        raise IOError("disk full")
+
+    writer = StreamingWriter(fsync=False)
+    with pytest.raises(IOError):
+        writer.write_atomic(str(target), broken_chunks())
+    assert target.read_text(encoding="utf-8") == "original"
+    assert os.listdir(tmp_path) == ["doc.txt"]
+    assert writer.write_atomic(str(target), [b"new ", b"content"]) == 11
+    assert target.read_text(encoding="utf-8") == "new content"
+
+
+def test_workspace_save_streams_buffer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.save_chunk_size = 8
+    ws.load_file("notes.txt", "piece")
+    editor = ws.editors["notes.txt"]
+    for i in range(50):
+        editor.execute_command(AppendCommand(editor, "row %d" % i))
+    ws.save_file()
+    assert (tmp_path / "notes.txt").read_text(encoding="utf-8") == "\n".join("row %d" % i for i in range(50))
+    ws.atomic_save = False
+    editor.execute_command(AppendCommand(editor, "tail"))
+    ws.save_file()
+    assert (tmp_path / "notes.txt").read_text(encoding="utf-8").endswith("row 49\ntail")
+
+
+def test_incremental_save_writes_only_dirty_region(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    rows = ["line %04d" % i for i in range(1000)]
+    (tmp_path / "big.txt").write_text("\n".join(rows) + "\n", encoding="utf-8")
+    ws = Workspace()
+    ws.writer.fsync = False
+    ws.atomic_save = False
+    ws.load_file("big.txt")
+    editor = ws.editors["big.txt"]
+
+    # 行长度不变：原地覆盖
+    editor.execute_command(ReplaceCommand(editor, 3, 1, 4, "LINE"))
+    rows[2] = "LINE 0002"
+    ws.save_file()
+    assert "(9 bytes written)" in capsys.readouterr().out
+    assert (tmp_path / "big.txt").read_text(encoding="utf-8") == "\n".join(rows) + "\n"
+
+    # 行长度变化：只从第一处修改开始重写
+    editor.execute_command(InsertCommand(editor, 990, 1, ">>"))
+    rows[989] = ">>" + rows[989]
+    ws.save_file()
+    out = capsys.readouterr().out
+    assert (tmp_path / "big.txt").read_text(encoding="utf-8") == "\n".join(rows) + "\n"
+    written = int(out.split("(")[1].split()[0])
+    assert written < 200
+
+    # 结构变化 + 撤销，仍与整体保存的结果一致
+    editor.execute_command(AppendCommand(editor, "appended"))
+    editor.execute_command(DeleteCommand(editor, 1, 1, 4))
+    editor.undo()
+    ws.save_file()
+    rows.append("appended")
+    assert (tmp_path / "big.txt").read_text(encoding="utf-8") == "\n".join(rows) + "\n"
+
+    # 没有修改时不写任何字节
+    ws.save_file()
+    assert "(0 bytes written)" in capsys.readouterr().out
+
+
+def test_atomic_save_never_rewrites_in_place(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("one\ntwo\n", encoding="utf-8")
+    ws = Workspace()
+    ws.load_file("a.txt")
+    editor = ws.editors["a.txt"]
+    inode = os.stat("a.txt").st_ino
+    editor.execute_command(ReplaceCommand(editor, 1, 1, 3, "ONE"))
+    ws.save_file()
+    assert os.stat("a.txt").st_ino != inode
+    assert (tmp_path / "a.txt").read_bytes() == b"ONE\ntwo\n"
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+@pytest.mark.parametrize("backend", ["list", "piece", "lazy"])
+def test_crlf_and_final_newline_survive_save(tmp_path, monkeypatch, backend, incremental):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_bytes(b"ab\r\ncd\r\nef\r\n")
+    ws = Workspace()
+    ws.atomic_save = not incremental
+    ws.load_file("a.txt", backend)
+    editor = ws.editors["a.txt"]
+    # 行内容不含 '\r'，列号按可见字符计算
+    assert editor.newline == "\r\n"
+    assert list(editor.lines) == ["ab", "cd", "ef"]
+    editor.execute_command(ReplaceCommand(editor, 2, 1, 1, "C"))
+    ws.save_file()
+    assert (tmp_path / "a.txt").read_bytes() == b"ab\r\nCd\r\nef\r\n"
+    editor.execute_command(InsertCommand(editor, 2, 3, "X"))
+    ws.save_file()
+    assert (tmp_path / "a.txt").read_bytes() == b"ab\r\nCdX\r\nef\r\n"
+    # 追加的行同样以 CRLF 结尾，不会混入单独的 LF
+    editor.execute_command(AppendCommand(editor, "gh"))
+    ws.save_file()
+    assert (tmp_path / "a.txt").read_bytes() == b"ab\r\nCdX\r\nef\r\ngh\r\n"
+    assert editor.get_lines_view(3, 4) == ["3: ef", "4: gh"]
+
+
+def test_crlf_append_after_unterminated_last_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_bytes(b"ab\r\ncd")
+    ws = Workspace()
+    ws.atomic_save = False
+    ws.load_file("a.txt")
+    editor = ws.editors["a.txt"]
+    editor.execute_command(AppendCommand(editor, "ef"))
+    ws.save_file()
+    editor.execute_command(AppendCommand(editor, "gh"))
+    ws.save_file()
+    assert (tmp_path / "a.txt").read_bytes() == b"ab\r\ncd\r\nef\r\ngh"
+
+
+def test_incremental_save_falls_back_when_file_changed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("one\ntwo", encoding="utf-8")
+    ws = Workspace()
+    ws.load_file("a.txt")
+    editor = ws.editors["a.txt"]
+    editor.execute_command(ReplaceCommand(editor, 1, 1, 3, "ONE"))
+    (tmp_path / "a.txt").write_text("externally rewritten", encoding="utf-8")
+    ws.save_file()
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "ONE\ntwo"
+
+
+def test_parallel_save_all_skips_unmodified(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "clean.txt").write_text("clean", encoding="utf-8")
+    ws = Workspace()
+    ws.writer.fsync = False
+    ws.load_file("clean.txt")
+    names = ["f%d.txt" % i for i in range(6)]
+    for name in names:
+        ws.init_file(name)
+        editor = ws.editors[name]
+        editor.execute_command(AppendCommand(editor, name))
+    ws.init_file(os.path.join("missing", "x.txt"))
+    events = []
+    monkeypatch.setattr(ws, "notify", lambda event, data: events.append(data["filename"]))
+    capsys.readouterr()
+    ws.save_file("all")
+    out = capsys.readouterr().out
+    for name in names:
+        assert (tmp_path / name).read_text(encoding="utf-8") == name
+        assert not ws.editors[name].is_modified
+    assert "[failed] " + os.path.join("missing", "x.txt") in out
+    assert "6 saved, 1 failed, 1 unchanged." in out
+    # 通知在主线程按打开顺序发出，且跳过失败和未修改的文件
+    assert events == names
+    assert ws.editors[os.path.join("missing", "x.txt")].is_modified
+
+
+def test_parallel_save_all_survives_unexpected_errors(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    for name in ("a.txt", "b.txt"):
+        ws.init_file(name)
+        editor = ws.editors[name]
+        editor.execute_command(AppendCommand(editor, name))
+    original = ws._save_editor
+
+    def flaky(filename):
+        if filename == "a.txt":
+            raise ValueError("boom")
+        return original(filename)
+
+    monkeypatch.setattr(ws, "_save_editor", flaky)
+    capsys.readouterr()
+    ws.save_file("all")
+    out = capsys.readouterr().out
+    assert "[failed] a.txt: boom" in out
+    assert "1 saved, 1 failed, 0 unchanged." in out
+    assert ws.editors["a.txt"].is_modified and not ws.editors["b.txt"].is_modified
+
+
+def test_atomic_save_skips_line_index(tmp_path, monkeypatch):
+    import core.workspace
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("one\ntwo\n", encoding="utf-8")
+
+    def no_scan(filename):
+        raise AssertionError("line index is only needed for incremental saves")
+
+    monkeypatch.setattr(core.workspace, "scan_line_index", no_scan)
+    ws = Workspace()
+    ws.load_file("a.txt")
+    editor = ws.editors["a.txt"]
+    editor.execute_command(AppendCommand(editor, "three"))
+    ws.save_file()
+    assert editor.disk_index is None
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "one\ntwo\nthree\n"
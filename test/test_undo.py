@@ -0,0 +1,163 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.editor import TextEditor
+from core.commands import AppendCommand, InsertCommand, ReplaceCommand
+from core.workspace import Workspace
+from core.interfaces import Subject
+
+
+def test_undo_entries_store_deltas_only():
+    editor = TextEditor("t.txt", ["x" * 100000])
+    editor.execute_command(InsertCommand(editor, 1, 5, "ab"))
+    editor.execute_command(ReplaceCommand(editor, 1, 1, 3, "yyy"))
+    # 长行本身不进入撤销历史
+    assert editor.undo_memory < 2000
+    editor.undo()
+    editor.undo()
+    assert editor.get_content_str() == "x" * 100000
+    assert editor.undo_depth == 0 and editor.undo_memory > 0
+    editor.execute_command(AppendCommand(editor, "new"))
+    assert editor.undo_memory == editor._undo_stack[0][1]
+
+
+def test_per_editor_budget_evicts_oldest():
+    editor = TextEditor("t.txt")
+    editor.undo_budget = 5000
+    editor.coalesce_window = None
+    for i in range(100):
+        editor.execute_command(AppendCommand(editor, "%03d" % i + "z" * 100))
+    assert editor.undo_memory <= 5000
+    depth = editor.undo_depth
+    assert 0 < depth < 100
+    for _ in range(depth):
+        editor.undo()
+    # 只能撤销到被回收的位置为止
+    assert len(editor.lines) == 100 - depth
+    assert editor.lines[-1].startswith("%03d" % (99 - depth))
+
+
+def test_workspace_budget_evicts_across_editors(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.undo_pool.budget = 8000
+    ws.init_file("a.txt")
+    ws.init_file("b.txt")
+    a, b = ws.editors["a.txt"], ws.editors["b.txt"]
+    a.coalesce_window = b.coalesce_window = None
+    for i in range(20):
+        a.execute_command(AppendCommand(a, "a" * 200))
+    for i in range(20):
+        b.execute_command(AppendCommand(b, "b" * 200))
+    assert ws.undo_pool.used <= 8000
+    # a 的记录更旧，先被回收
+    assert a.undo_depth < b.undo_depth
+    ws.report_undo_memory()
+    out = capsys.readouterr().out
+    assert "a.txt: %d undo steps" % a.undo_depth in out
+    assert "/ 7.8 KB" in out
+    ws.undo_pool.unregister(b)
+    assert ws.undo_pool.used == a.undo_memory
+
+
+def test_workspace_budget_tracks_undo_stacks_incrementally(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.undo_pool.budget = 3000
+    ws.init_file("a.txt")
+    ws.init_file("b.txt")
+    a, b = ws.editors["a.txt"], ws.editors["b.txt"]
+    a.coalesce_window = b.coalesce_window = None
+    for i in range(10):
+        a.execute_command(AppendCommand(a, "a" * 200))
+    for _ in range(a.undo_depth - 1):
+        a.undo()
+    # 重做栈不计入预算，也不会因为 b 的新记录被回收
+    assert ws.undo_pool.used == a.undo_bytes + b.undo_bytes
+    redo_bytes = a.undo_memory - a.undo_bytes
+    for i in range(10):
+        b.execute_command(AppendCommand(b, "b" * 200))
+        assert ws.undo_pool.used == a.undo_bytes + b.undo_bytes <= 3000
+    assert a.undo_memory - a.undo_bytes == redo_bytes
+
+
+def test_adjacent_commands_coalesce_into_one_undo_unit():
+    editor = TextEditor("t.txt", ["hello"])
+    editor.coalesce_window = 1.0
+    for ch in " world":
+        editor.execute_command(InsertCommand(editor, 1, len(editor.lines[0]) + 1, ch))
+    for i in range(3):
+        editor.execute_command(AppendCommand(editor, "row %d" % i))
+    assert editor.undo_depth == 2
+    editor.undo()
+    assert editor.get_content_str() == "hello world"
+    editor.redo()
+    assert list(editor.lines)[-3:] == ["row 0", "row 1", "row 2"]
+    editor.undo()
+    editor.undo()
+    assert editor.get_content_str() == "hello"
+
+    # 撤销之后重新开始一个撤销单元；不相邻的插入不合并
+    editor.execute_command(InsertCommand(editor, 1, 1, ">"))
+    editor.execute_command(InsertCommand(editor, 1, 6, "!"))
+    assert editor.undo_depth == 2
+    editor.break_coalescing()
+    editor.execute_command(InsertCommand(editor, 1, 7, "?"))
+    assert editor.undo_depth == 3
+
+    # 超出大小窗口后另起一个单元
+    editor.coalesce_max_bytes = 400
+    for _ in range(20):
+        editor.execute_command(AppendCommand(editor, "x" * 40))
+    assert editor.undo_depth > 4
+    assert all(size <= 400 for _, size, _ in editor._undo_stack)
+    editor.coalesce_window = None
+    editor.execute_command(AppendCommand(editor, "y"))
+    editor.execute_command(AppendCommand(editor, "z"))
+    editor.undo()
+    assert editor.lines[-1] == "y"
+
+
+def test_transaction_commits_as_single_undo_step(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    events = []
+    monkeypatch.setattr(Subject, "notify",
+                        lambda self, event, data: event == "command" and events.append(data["command_str"]))
+    ws.init_file("t.txt")
+    editor = ws.editors["t.txt"]
+    editor.execute_command(AppendCommand(editor, "aaaa bbbb"))
+    editor.is_modified = False
+    events.clear()
+
+    assert ws.begin_transaction()
+    for col in (1, 6):
+        assert editor.execute_command(ReplaceCommand(editor, 1, col, 4, "XXXX"))
+        ws.notify("command", {"filename": "t.txt", "command_str": "replace %d" % col})
+    # 提交前不通知、不标记修改
+    assert events == [] and not editor.is_modified
+    ws.save_file()
+    assert not (tmp_path / "t.txt").exists()
+    assert ws.commit_transaction()
+    assert events == ["replace 1", "replace 6"] and editor.is_modified
+    assert editor.get_content_str() == "XXXX XXXX"
+    editor.undo()
+    assert editor.get_content_str() == "aaaa bbbb"
+    editor.redo()
+    assert editor.get_content_str() == "XXXX XXXX"
+
+
+def test_transaction_rolls_back_on_first_failure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    ws.init_file("t.txt")
+    editor = ws.editors["t.txt"]
+    editor.execute_command(AppendCommand(editor, "hello"))
+    depth = editor.undo_depth
+    ws.begin_transaction()
+    editor.execute_command(InsertCommand(editor, 1, 1, ">>"))
+    editor.execute_command(AppendCommand(editor, "more"))
+    assert not editor.execute_command(InsertCommand(editor, 9, 1, "x"))
+    assert not editor.in_transaction
+    assert editor.get_content_str() == "hello" and editor.undo_depth == depth
+    assert not ws.rollback_transaction()
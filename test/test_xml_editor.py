@@ -0,0 +1,307 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pytest
+from core.xml_editor import XmlEditor, XmlElement
+from core.xml_loader import parse_xml
+from core.xml_commands import (InsertBeforeCommand, AppendChildCommand, EditIdCommand, EditTextCommand,
+                               DeleteElementCommand)
+from core.workspace import Workspace
+
+SAMPLE = """<?xml version="1.0" encoding="UTF-8"?>
+<bookstore id="root">
+    <book id="book1" category="COOKING">
+        <title id="title1" lang="en">Everyday Italian</title>
+        <author id="author1">Giada De Laurentiis</author>
+        <year id="year1">2005</year>
+        <price id="price1">30.00</price>
+    </book>
+    <book id="book2" category="CHILDREN">
+        <title id="title2" lang="en">Harry Potter</title>
+        <author id="author2">J K. Rowling</author>
+    </book>
+</bookstore>
+"""
+
+
+def test_parse_roundtrip_and_errors():
+    editor = parse_xml(SAMPLE)
+    assert editor.get_content_str() == SAMPLE
+    assert editor.find("title2").text == "Harry Potter"
+    assert editor.find("book2").parent is editor.root
+    with pytest.raises(ValueError, match="duplicate id"):
+        parse_xml('<a id="x"><b id="x"/></a>')
+    with pytest.raises(ValueError, match="no id"):
+        parse_xml('<a id="x"><b/></a>')
+    with pytest.raises(ValueError, match="malformed"):
+        parse_xml('<a id="x"><b id="y"></a>')
+
+
+def test_commands_keep_index_in_sync(capsys):
+    editor = parse_xml(SAMPLE)
+    assert editor.execute_command(AppendChildCommand(editor, "price", "price2", "book2", "29.99"))
+    assert editor.execute_command(InsertBeforeCommand(editor, "book", "book0", "book1"))
+    assert editor.execute_command(EditIdCommand(editor, "book0", "first"))
+    assert editor.execute_command(EditTextCommand(editor, "title1", "Italian & Co"))
+    assert editor.execute_command(DeleteElementCommand(editor, "book2"))
+    assert "first" in editor and "book0" not in editor
+    # 删除的子树连同其中的 id 一起移出索引
+    assert "title2" not in editor and "price2" not in editor
+    assert [c.id for c in editor.root.children] == ["first", "book1"]
+    assert "<title id=\"title1\" lang=\"en\">Italian &amp; Co</title>" in editor.get_content_str()
+
+    for _ in range(5):
+        editor.undo()
+    assert editor.get_content_str() == SAMPLE
+    assert set(editor.index) == {n.id for n in editor.root.iter_subtree()}
+    for _ in range(5):
+        editor.redo()
+    assert [c.id for c in editor.root.children] == ["first", "book1"]
+    assert editor.find("title1").text == "Italian & Co"
+
+    assert not editor.execute_command(AppendChildCommand(editor, "x", "book1", "root"))
+    assert not editor.execute_command(InsertBeforeCommand(editor, "x", "y", "root"))
+    assert not editor.execute_command(EditIdCommand(editor, "root", "top"))
+    assert not editor.execute_command(DeleteElementCommand(editor, "root"))
+    assert not editor.execute_command(EditTextCommand(editor, "missing", "x"))
+    out = capsys.readouterr().out
+    assert "Error: 元素ID已存在: book1" in out
+    assert "Error: 不能在根元素前插入元素" in out
+    assert "Error: 不能删除根元素" in out
+    assert "Error: 元素不存在: missing" in out
+
+
+def test_edit_only_invalidates_dirty_path():
+    editor = parse_xml(SAMPLE)
+    editor.get_content_str()
+    book1, book2 = editor.find("book1"), editor.find("book2")
+    cached = book2._cache
+    assert cached is not None and book1._cache is not None
+    editor.execute_command(EditTextCommand(editor, "year1", "2006"))
+    # 只有被改的元素和它的祖先失效，兄弟子树的缓存原样复用
+    assert editor.find("year1")._cache is None and book1._cache is None and editor.root._cache is None
+    assert book2._cache is cached and editor.find("title1")._cache is not None
+    assert "<year id=\"year1\">2006</year>" in editor.get_content_str()
+    assert book2._cache is cached
+
+
+def test_deep_and_wide_documents_do_not_recurse():
+    root = XmlElement("root", {"id": "root"})
+    node = root
+    for i in range(5000):
+        child = XmlElement("n", {"id": f"n{i}"})
+        child.parent = node
+        node.children.append(child)
+        node = child
+    editor = XmlEditor("deep.xml", root)
+    content = editor.get_content_str()
+    assert content.count("</n>") == 5000
+    assert parse_xml(content).find("n4999").depth() == 5000
+
+
+def test_workspace_xml_init_save_load(tmp_path, monkeypatch, capsys):
+    import main
+    monkeypatch.chdir(tmp_path)
+    ws = Workspace()
+    assert main.execute(ws, ["init", "doc.xml", "with-log"], "init doc.xml with-log")
+    assert main.execute(ws, ["append-child", "item", "a", "root", "first"], 'append-child item a root "first"')
+    assert main.execute(ws, ["insert-before", "item", "b", "a"], "insert-before item b a")
+    assert main.execute(ws, ["delete", "b"], "delete b")
+    assert not main.execute(ws, ["show"], "show")
+    assert "Error: 'show' is not supported for xml files" in capsys.readouterr().out
+    assert main.execute(ws, ["save"], "save")
+    text = (tmp_path / "doc.xml").read_text(encoding="utf-8")
+    assert text == ('# log\n<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<root id="root">\n    <item id="a">first</item>\n</root>\n')
+    assert main.execute(ws, ["close"], "close")
+
+    ws = Workspace()
+    ws.load_file("doc.xml")
+    editor = ws.active_editor
+    assert editor.kind == "xml" and editor.find("a").text == "first"
+    assert main.execute(ws, ["init", "notes.txt"], "init notes.txt")
+    assert main.execute(ws, ["append", "xy"], 'append "xy"')
+    # 同名的 delete 按活动文件类型分派到文本版本
+    assert main.execute(ws, ["delete", "1:1", "1"], "delete 1:1 1")
+    assert ws.active_editor.get_content_str() == "y"
+
+
+def test_streaming_loader_chunks_and_error_positions(tmp_path, monkeypatch):
+    from core import xml_loader
+    monkeypatch.setattr(xml_loader, "CHUNK_SIZE", 7)
+    path = tmp_path / "books.xml"
+    path.write_text("# log -e append-child\n" + SAMPLE, encoding="utf-8")
+    editor = xml_loader.load_xml(str(path))
+    assert editor.log_header == "# log -e append-child"
+    assert editor.get_content_str() == "# log -e append-child\n" + SAMPLE
+
+    deep = '<n id="r">' + "".join(f'<n id="n{i}">' for i in range(20000)) + "</n>" * 20001
+    assert xml_loader.parse_xml(deep).find("n19999").depth() == 20000
+
+    # 行号包含日志头那一行，列号从 1 开始
+    path.write_text('# log\n<a id="r">\n  <b id="x"/>\n  <c id="x"/>\n</a>\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"duplicate id 'x' \(line 4, column 3\)"):
+        xml_loader.load_xml(str(path))
+    path.write_text('<a id="r">\n  <b id="x">\n</a>\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"malformed XML: mismatched tag \(line 3, column 3\)"):
+        xml_loader.load_xml(str(path))
+
+
+def test_lazy_mode_materializes_on_demand_and_copies_untouched_bytes(tmp_path, monkeypatch, capsys):
+    import main
+    monkeypatch.chdir(tmp_path)
+    # 非规范的缩进：未触及的子树保存后应逐字节保持原样
+    books = "".join(f'\n  <book id="b{i}"><title id="t{i}">T{i}</title>  <price id="p{i}">{i}</price></book>'
+                    for i in range(200))
+    doc = f'<?xml version="1.0" encoding="UTF-8"?>\n<shelf id="root">{books}\n</shelf>\n'
+    (tmp_path / "big.xml").write_text(doc, encoding="utf-8")
+    ws = Workspace()
+    ws.xml_lazy_threshold = 1024
+    ws.load_file("big.xml")
+    editor = ws.active_editor
+    assert editor.source is not None and list(editor.index) == ["root"]
+    assert editor.get_content_str() == doc
+
+    assert main.execute(ws, ["edit-text", "t7", "Seven"], 'edit-text t7 "Seven"')
+    # 只解析了根的子元素和 b7 的子元素
+    assert len(editor.index) == 1 + 200 + 2
+    assert editor.has_id("p150") and "p150" not in editor.index
+    assert main.execute(ws, ["append-child", "note", "n1", "b150", "new"], 'append-child note n1 b150 "new"')
+    assert main.execute(ws, ["delete", "b3"], "delete b3")
+    assert main.execute(ws, ["save"], "save")
+    saved = (tmp_path / "big.xml").read_text(encoding="utf-8")
+    assert '  <book id="b9"><title id="t9">T9</title>  <price id="p9">9</price></book>' in saved
+    assert '<title id="t7">Seven</title>' in saved and '<note id="n1">new</note>' in saved
+    assert 'id="b3"' not in saved
+
+    # 保存后重新建立偏移表；撤销删除仍能找回原文件中的子树
+    editor.undo()
+    assert editor.find("p3").text == "3"
+    assert main.execute(ws, ["save"], "save")
+    reloaded = Workspace()
+    reloaded.load_file("big.xml")
+    assert reloaded.active_editor.find("p3").parent.id == "b3"
+    assert reloaded.active_editor.find("n1").text == "new"
+    main.execute(ws, ["load", "other.xml", "rope"], "load other.xml rope")
+    assert "can only be loaded with the 'lazy' backend" in capsys.readouterr().out
+
+
+def test_xml_tree_depth_limit_and_lazy_expansion(tmp_path, monkeypatch, capsys):
+    import main
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "books.xml").write_text(SAMPLE, encoding="utf-8")
+    ws = Workspace()
+    ws.load_file("books.xml", "lazy")
+    editor = ws.active_editor
+    capsys.readouterr()
+    assert main.execute(ws, ["xml-tree", "--depth", "1"], "xml-tree --depth 1") is not False
+    assert capsys.readouterr().out == (
+        'bookstore [id="root"]\n'
+        '├── book [id="book1", category="COOKING"]\n'
+        '│   └── ... (4 child elements)\n'
+        '└── book [id="book2", category="CHILDREN"]\n'
+        '    └── ... (2 child elements)\n')
+    # 深度限制之下的元素没有被解析
+    assert set(editor.index) == {"root", "book1", "book2"}
+
+    main.execute(ws, ["xml-tree", "books.xml", "--root", "book2"], "xml-tree books.xml --root book2")
+    assert capsys.readouterr().out == (
+        'book [id="book2", category="CHILDREN"]\n'
+        '├── title [id="title2", lang="en"]\n'
+        '│   └── "Harry Potter"\n'
+        '└── author [id="author2"]\n'
+        '    └── "J K. Rowling"\n')
+    main.execute(ws, ["xml-tree", "--limit", "3"], "xml-tree --limit 3")
+    out = capsys.readouterr().out.splitlines()
+    assert out[-1] == "│   ├── ... (stopped after 3 elements)" and len(out) == 5
+    assert not main.execute(ws, ["xml-tree", "--root", "nope"], "xml-tree --root nope")
+    assert "Error: 元素不存在: nope" in capsys.readouterr().out
+
+
+def test_xml_find_uses_incrementally_maintained_indexes(tmp_path, monkeypatch, capsys):
+    import main
+    from core.xml_query import compile_query, run_query
+
+    def ids(editor, query):
+        return [node.id for node in run_query(editor, compile_query(query))]
+
+    editor = parse_xml(SAMPLE)
+    assert ids(editor, "book[@category='COOKING']/title") == ["title1"]
+    assert ids(editor, "/bookstore/book") == ["book1", "book2"]
+    assert ids(editor, "bookstore//author") == ["author1", "author2"]
+    assert ids(editor, "*[@lang]") == ["title1", "title2"]
+    assert ids(editor, "title[text()='Harry Potter']") == ["title2"]
+    assert ids(editor, "/book") == []
+
+    editor.execute_command(InsertBeforeCommand(editor, "book", "book0", "book1"))
+    editor.execute_command(AppendChildCommand(editor, "title", "title0", "book0", "New"))
+    editor.execute_command(DeleteElementCommand(editor, "book2"))
+    editor.execute_command(EditIdCommand(editor, "title1", "t1"))
+    # 删除的子树从标签/属性索引中移除，新元素按文档顺序出现在结果里
+    assert ids(editor, "//title") == ["title0", "t1"]
+    assert editor.tag_index["author"] == {editor.find("author1")}
+    assert "CHILDREN" not in editor.attr_index["category"]
+    for _ in range(4):
+        editor.undo()
+    assert ids(editor, "//title") == ["title1", "title2"]
+    assert ids(editor, "book[@category='CHILDREN']") == ["book2"]
+
+    with pytest.raises(ValueError, match="unsupported predicate"):
+        compile_query("book[@category=COOKING]")
+    with pytest.raises(ValueError, match="expected an element name"):
+        compile_query("book/")
+
+    # 惰性模式：只解析偏移表中同标签的元素
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "books.xml").write_text(SAMPLE, encoding="utf-8")
+    ws = Workspace()
+    ws.load_file("books.xml", "lazy")
+    capsys.readouterr()
+    assert main.execute(ws, ["xml-find", "//year"], "xml-find //year") is not False
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == 'year [id="year1"] "2005"' and out[1].startswith("1 match(es) in ")
+    assert "title2" not in ws.active_editor.index
+    assert not main.execute(ws, ["xml-find", "a b"], "xml-find a b")
+    assert "Error: invalid query" in capsys.readouterr().out
+
+
+COMMENTED = """<?xml version="1.0" encoding="UTF-8"?>
+<!-- prologue -->
+<?xml-stylesheet type="text/xsl" href="s.xsl"?>
+<shelf id="root">
+    <!-- first -->
+    <book id="b1">
+        <title id="t1">One</title>
+        <!-- inside b1 -->
+    </book>
+    <?tidy keep?>
+    <book id="b2">
+        <title id="t2">Two</title>
+    </book>
+    <note id="n1">
+        text
+        <!-- leaf trail -->
+    </note>
+    <!-- closing -->
+</shelf>
+<!-- epilogue -->
+"""
+
+
+@pytest.mark.parametrize("mode", [None, "lazy"])
+def test_comments_and_processing_instructions_survive_save(tmp_path, monkeypatch, mode):
+    import main
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.xml").write_text(COMMENTED, encoding="utf-8")
+    ws = Workspace()
+    ws.load_file("doc.xml", mode)
+    editor = ws.active_editor
+    assert editor.get_content_str() == COMMENTED
+    assert main.execute(ws, ["edit-text", "t2", "Deux"], 'edit-text t2 "Deux"')
+    expected = COMMENTED.replace(">Two<", ">Deux<")
+    assert editor.get_content_str() == expected
+    # 整个文档展开后 (惰性模式下每一层都从原文件重新取出注释) 输出不变
+    editor.load_tag(None)
+    assert editor.get_content_str() == expected
+    assert main.execute(ws, ["save"], "save")
+    assert (tmp_path / "doc.xml").read_text(encoding="utf-8") == expected
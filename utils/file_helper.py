@@ -1,4 +1,5 @@
 import os
+import sys
 
 def print_dir_tree(startpath: str):
     """
@@ -56,6 +57,24 @@ def _print_tree_recursive(path: str, prefix: str):
             extension = "    " if is_last else "│   "
             _print_tree_recursive(full_path, prefix + extension)
 
+def write_lines(lines, batch_chars: int = 64 * 1024):
+    """
+    把逐行产生的输出攒成大块再写到标准输出
+    大量短行 (例如树形显示) 时避免每行一次 print 的开销
+    """
+    out = sys.stdout
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line) + 1
+        if size >= batch_chars:
+            pending.append("")
+            out.write("\n".join(pending))
+            pending, size = [], 0
+    if pending:
+        pending.append("")
+        out.write("\n".join(pending))
+
 def print_file_helper():
     """
     打印文件帮助信息
@@ -64,15 +83,19 @@ def print_file_helper():
 Available commands:
 
   Workspace:
-    load <file>                         - Load file into workspace
+    load <file> [list|piece|rope|lazy]  - Load file into workspace (optional: line storage backend)
+                                        (.xml files: lazy parses subtrees only when a command touches them)
     save [file|all]                     - Save current file or all files
-    init <file> [with-log]              - Create new buffer (optional: enable log)
+    init <file> [with-log]              - Create new buffer, .txt or .xml (optional: enable log)
     close [file]                        - Close current or specified file
     edit <file>                         - Switch active file
     editor-list                         - List all loaded files
     dir-tree [path]                     - Display directory tree
     undo                                - Undo last action
     redo                                - Redo last undone action
+    undo-mem                            - Show undo history memory usage
+    event-stats                         - Show event bus queue/drop counters (with --event-bus)
+    stats [reset]                       - Show hot-path call counts, p50/p95/p99 latency and I/O bytes (with --stats)
     exit                                - Exit the program
 
   Text Editing (only for .txt files):
@@ -81,11 +104,28 @@ Available commands:
     delete <line:col> <len>             - Delete characters starting from position
     replace <line:col> <len> "text"     - Replace characters with provided text
     show [start:end]                    - Show full or partial file content
+    begin                               - Start a transaction on the active file
+    commit                              - Apply the transaction as a single undo step
+    rollback                            - Undo every command of the open transaction
+
+  XML Editing (only for .xml files):
+    insert-before <tag> <newId> <targetId> ["text"]
+                                        - Insert a new element before the target element
+    append-child <tag> <newId> <parentId> ["text"]
+                                        - Append a new element as the last child of the parent
+    edit-id <oldId> <newId>             - Change an element's id
+    edit-text <elementId> ["text"]      - Change (or clear) an element's text
+    delete <elementId>                  - Delete an element and its subtree
+    xml-tree [file] [--root ID] [--depth N] [--limit N]
+                                        - Show the element tree (from an element / N levels deep / first N elements)
+    xml-find "QUERY"                    - Find elements, e.g. book[@category='COOKING']/title, //price, *[@lang]
 
   Logging:
     log-on [file]                       - Enable logging (optionally for specific file)
     log-off [file]                      - Disable logging
-    log-show [file]                     - Display log for file
+    log-show [file] [--tail N] [--since TIMESTAMP] [--grep CMD]
+                                        - Display log for file (last N entries / since a time / matching a command)
+    First line "# log -e CMD ..."       - Auto-enable logging on load, excluding the listed commands
 
   Tips: [] indicates optional parameters, while <> indicates required parameters.
 """